@@ -0,0 +1,199 @@
+"""
+Checks that the client's memory stays bounded while the network is slower than the
+sessions producing output.
+
+Runs a stand-in Ganglion server which reads one frame every `READ_INTERVAL` seconds
+(so the socket backs up), and a client with an app session and a terminal session
+which both write output as fast as they can. Samples the resident set size (RSS) of
+the process once a second, and fails if it grows by more than `MAX_GROWTH` after the
+warm up, or if the sessions were never paused at the writer's high watermark.
+
+Linux only (RSS is read from /proc).
+
+Run with:
+
+    python benchmarks/backpressure.py
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import os
+from pathlib import Path
+import socket
+import sys
+import tempfile
+
+from aiohttp import web
+import msgpack
+
+from textual_web.config import default_config
+from textual_web.environment import Environment
+from textual_web.ganglion_client import GanglionClient
+from textual_web.packets import PacketType
+
+PORT = 8791
+"""Port for the stand-in server."""
+READ_INTERVAL = 0.01
+"""Time (in seconds) the server waits between reading frames."""
+DURATION = 10
+"""Time (in seconds) to run for."""
+WARM_UP = 3
+"""Time (in seconds) before the baseline RSS is taken."""
+MAX_GROWTH = 16 * 1024 * 1024
+"""Maximum growth in RSS (in bytes) after the warm up."""
+RECEIVE_BUFFER = 64 * 1024
+"""Socket receive buffer (in bytes) for the server. Keeps the kernel from buffering
+several seconds of data on loopback, which would delay pings."""
+
+APP = """\
+import os
+import sys
+
+output = sys.stdout.buffer
+output.write(b"__GANGLION__\\n")
+chunk = os.urandom(16 * 1024).hex().encode()
+while True:
+    output.write(b"D" + len(chunk).to_bytes(4, "big") + chunk)
+    output.flush()
+"""
+"""An app which writes 32KB of output at a time, as fast as it can."""
+
+TERMINAL = """\
+#!/bin/sh
+exec yes "$(head -c 1024 /dev/zero | tr '\\0' x)"
+"""
+"""A terminal command which writes 1KB lines as fast as it can."""
+
+
+def get_rss() -> int:
+    """Get the resident set size of this process.
+
+    Returns:
+        RSS in bytes.
+    """
+    pages = int(Path("/proc/self/statm").read_text().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class SlowServer:
+    """A stand-in Ganglion server, which reads slowly."""
+
+    def __init__(self) -> None:
+        self.declared = asyncio.Event()
+        self.websocket: web.WebSocketResponse | None = None
+        self.route_bytes: Counter[str] = Counter()
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        websocket = web.WebSocketResponse(protocols=("ganglion.batch",))
+        await websocket.prepare(request)
+        self.websocket = websocket
+        async for message in websocket:
+            if message.type != web.WSMsgType.BINARY:
+                break
+            envelopes = msgpack.unpackb(message.data, raw=False)
+            if envelopes and not isinstance(envelopes[0], list):
+                envelopes = [envelopes]
+            for envelope in envelopes:
+                if envelope[0] == PacketType.DECLARE_APPS:
+                    self.declared.set()
+                elif envelope[0] == PacketType.PING:
+                    await websocket.send_bytes(
+                        msgpack.packb([PacketType.PONG, envelope[1]])
+                    )
+                elif envelope[0] == PacketType.SESSION_DATA:
+                    self.route_bytes[envelope[1]] += len(envelope[2])
+            await asyncio.sleep(READ_INTERVAL)
+        return websocket
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.add_routes([web.get("/app-service/", self.handle)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        server_socket.bind(("127.0.0.1", port))
+        await web.SockSite(runner, server_socket).start()
+        return runner
+
+    async def open_session(self, session_id: str, slug: str, route_key: str) -> None:
+        assert self.websocket is not None
+        await self.websocket.send_bytes(
+            msgpack.packb(
+                [PacketType.SESSION_OPEN, session_id, slug, slug, route_key, 80, 24]
+            )
+        )
+
+
+async def run(port: int, duration: int) -> bool:
+    server = SlowServer()
+    runner = await server.start(port)
+    with tempfile.TemporaryDirectory() as temp_path:
+        app_path = Path(temp_path) / "app.py"
+        app_path.write_text(APP)
+        terminal_path = Path(temp_path) / "terminal.sh"
+        terminal_path.write_text(TERMINAL)
+        terminal_path.chmod(0o755)
+
+        environment = Environment(
+            "benchmark", "", f"ws://127.0.0.1:{port}/app-service/"
+        )
+        client = GanglionClient("./", default_config(), environment, None)
+        client.add_app("app", f"{sys.executable} {app_path}", "app")
+        client.add_terminal("terminal", str(terminal_path), "terminal")
+        client_task = asyncio.create_task(client.run())
+        try:
+            await server.declared.wait()
+            await server.open_session("session-app", "app", "route-app")
+            await server.open_session("session-terminal", "terminal", "route-terminal")
+
+            print(f"{'time':>5} {'rss':>8} {'app':>9} {'terminal':>9} {'pauses':>7}")
+            baseline = 0
+            max_rss = 0
+            for second in range(1, duration + 1):
+                await asyncio.sleep(1)
+                rss = get_rss()
+                if second == WARM_UP:
+                    baseline = rss
+                elif second > WARM_UP:
+                    max_rss = max(max_rss, rss)
+                writer = client.connections[0].writer.get_metrics()
+                print(
+                    f"{second:>4}s {rss / 1024 / 1024:>6.1f}MB"
+                    f" {server.route_bytes['route-app'] // 1024:>7}KB"
+                    f" {server.route_bytes['route-terminal'] // 1024:>7}KB"
+                    f" {writer['pauses']:>7}"
+                )
+        finally:
+            client.force_exit()
+            client_task.cancel()
+            await runner.cleanup()
+
+    growth = max_rss - baseline
+    print(f"\nRSS growth after warm up: {growth / 1024 / 1024:.1f}MB")
+    ok = True
+    if growth > MAX_GROWTH:
+        print(f"FAIL: RSS grew by more than {MAX_GROWTH // 1024 // 1024}MB")
+        ok = False
+    if not writer["pauses"]:
+        print("FAIL: sessions were never paused")
+        ok = False
+    for route_key in ("route-app", "route-terminal"):
+        if not server.route_bytes[route_key]:
+            print(f"FAIL: no data received for {route_key}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--duration", type=int, default=DURATION)
+    args = parser.parse_args()
+    if not asyncio.run(run(args.port, max(args.duration, WARM_UP + 1))):
+        sys.exit(1)
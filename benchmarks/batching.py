@@ -0,0 +1,186 @@
+"""
+Measures the frames per second, and the client CPU time, of sending session data with
+and without multi-envelope frames.
+
+Runs a stand-in Ganglion server in a separate process (so that only the client's CPU
+time is measured), which selects the `ganglion.batch` subprotocol or no subprotocol.
+Many routes each send a frame of output at 60 fps through a `GanglionClient`, as a busy
+client with many sessions would. Reports:
+
+- websocket frames per second, and packets per frame
+- client CPU time, as a percentage of one core and per MB of session data
+
+Run with:
+
+    python benchmarks/batching.py
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.synchronize import Event
+import os
+from time import perf_counter, process_time
+from typing import Awaitable, Callable
+
+from aiohttp import web
+
+from textual_web.config import default_config
+from textual_web.environment import Environment
+from textual_web.ganglion_client import GanglionClient
+from textual_web.ganglion_connection import BATCH_PROTOCOL
+from textual_web.packets import SessionData
+
+PORT = 8792
+"""Port for the stand-in server."""
+ROUTES = 300
+"""Number of routes sending data."""
+FRAMES = 300
+"""Number of frames of output sent by each route."""
+FRAME_RATE = 60
+"""Frames of output per second, per route."""
+PAYLOAD_SIZE = 300
+"""Size (in bytes) of each frame of output."""
+
+
+async def serve(port: int, ready: Event) -> None:
+    """Run a stand-in server, which reads every frame.
+
+    Args:
+        port: Port to listen on.
+        ready: Event to set when the server is listening.
+    """
+
+    def make_handler(
+        protocols: tuple[str, ...],
+    ) -> Callable[[web.Request], Awaitable[web.WebSocketResponse]]:
+        async def handle(request: web.Request) -> web.WebSocketResponse:
+            websocket = web.WebSocketResponse(protocols=protocols)
+            await websocket.prepare(request)
+            async for _message in websocket:
+                pass
+            return websocket
+
+        return handle
+
+    app = web.Application()
+    app.add_routes(
+        [
+            web.get("/batch/app-service/", make_handler((BATCH_PROTOCOL,))),
+            web.get("/app-service/", make_handler(())),
+        ]
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    ready.set()
+    await asyncio.Event().wait()
+
+
+def run_server(port: int, ready: Event) -> None:
+    """Run the stand-in server (in a separate process)."""
+    # Don't warn that the client's subprotocols weren't selected
+    logging.getLogger("aiohttp.websocket").setLevel(logging.ERROR)
+    asyncio.run(serve(port, ready))
+
+
+async def send_route(client: GanglionClient, route_key: str, payload: bytes) -> None:
+    """Send frames of output for a route, at the frame rate.
+
+    Args:
+        client: Client to send with.
+        route_key: Route key.
+        payload: Output to send in each frame.
+    """
+    send = client.send
+    interval = 1 / FRAME_RATE
+    loop = asyncio.get_running_loop()
+    next_time = loop.time()
+    for _ in range(FRAMES):
+        await send(SessionData(route_key, payload))
+        next_time += interval
+        await asyncio.sleep(max(0, next_time - loop.time()))
+
+
+async def measure(url: str) -> dict[str, float]:
+    """Send the workload through a client connected to the given url.
+
+    Args:
+        url: Websocket url of the stand-in server.
+
+    Returns:
+        Results.
+    """
+    client = GanglionClient("./", default_config(), Environment("bench", "", url), None)
+    client_task = asyncio.create_task(client.run())
+    connection = client.connections[0]
+    while not connection.connected:
+        await asyncio.sleep(0.01)
+
+    payload = os.urandom(PAYLOAD_SIZE // 2).hex().encode()
+    start_metrics = connection.writer.get_metrics()
+    start_time = perf_counter()
+    start_cpu = process_time()
+    await asyncio.gather(
+        *[send_route(client, f"route{route}", payload) for route in range(ROUTES)]
+    )
+    await connection.writer.flush()
+    elapsed = perf_counter() - start_time
+    cpu = process_time() - start_cpu
+    metrics = connection.writer.get_metrics()
+
+    client.force_exit()
+    await asyncio.gather(client_task, return_exceptions=True)
+
+    frames = metrics["frames"] - start_metrics["frames"]
+    packets = metrics["packets"] - start_metrics["packets"]
+    megabytes = ROUTES * FRAMES * PAYLOAD_SIZE / 1_000_000
+    return {
+        "frames_per_second": frames / elapsed,
+        "packets_per_frame": packets / frames if frames else 0.0,
+        "cpu_percent": cpu / elapsed * 100,
+        "cpu_ms_per_mb": cpu * 1000 / megabytes,
+    }
+
+
+async def run(port: int) -> None:
+    print(
+        f"{ROUTES} routes at {FRAME_RATE} fps, {PAYLOAD_SIZE} byte payloads, "
+        f"{ROUTES * FRAMES} packets\n"
+    )
+    print(
+        f"{'frames':<10} {'frames/s':>9} {'packets/frame':>14}"
+        f" {'cpu':>6} {'cpu/MB':>8}"
+    )
+    for name, path in [
+        ("single", "/app-service/"),
+        ("batched", "/batch/app-service/"),
+    ]:
+        result = await measure(f"ws://127.0.0.1:{port}{path}")
+        print(
+            f"{name:<10} {result['frames_per_second']:>9.0f}"
+            f" {result['packets_per_frame']:>14.1f}"
+            f" {result['cpu_percent']:>5.0f}%"
+            f" {result['cpu_ms_per_mb']:>6.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=run_server, args=(args.port, ready), daemon=True
+    )
+    server.start()
+    ready.wait()
+    try:
+        asyncio.run(run(args.port))
+    finally:
+        server.terminate()
@@ -0,0 +1,514 @@
+"""
+Measures the cost of encoding and decoding packets, for each packet type and for mixed
+workloads (keystroke-heavy, render-heavy, and file delivery).
+
+Packets are encoded with a `PacketEncoder` (as the writer does), and decoded with a
+`PacketDecoder`, both strict (as for a direct peer) and trusted (as for the Ganglion
+server). Reports:
+
+- ns per encode and per decode (best of several runs)
+- memory blocks (and bytes) allocated per encode and decode, which are kept by the
+  result; temporary allocations which are freed aren't counted
+- bytes on the wire (the size of each encoded envelope)
+
+Each workload is also measured with route handles ("_handles"), where session data is
+addressed by a small integer handle in place of the route key.
+
+Results are written as JSON, so runs may be compared. A summary is written to stderr.
+
+Run with:
+
+    python benchmarks/codec.py --output before.json
+    python benchmarks/codec.py --compare before.json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+import gc
+import json
+import platform
+import random
+import sys
+from time import perf_counter
+import tracemalloc
+from typing import Callable, Iterable
+import zlib
+
+import msgpack
+
+from textual_web import packets
+from textual_web.identity import IDENTITY_ALPHABET, IDENTITY_SIZE
+from textual_web.packet_decoder import PacketDecoder
+from textual_web.packet_encoder import PacketEncoder
+from textual_web.packets import PACKET_MAP, Packet, PacketType
+
+PACKET_COUNT = 2_000
+"""Number of packets of each type, and in each workload."""
+REPEAT = 20
+"""Number of times to encode and decode the packets (the best time is reported)."""
+ALLOCATION_COUNT = 500
+"""Number of packets to trace allocations for."""
+ROUTE_COUNT = 8
+"""Number of routes in the mixed workloads."""
+DELIVERY_CHUNK_SIZE = 64 * 1024
+"""Size of each chunk of a file delivery."""
+METRICS = (
+    "encode_ns",
+    "decode_ns",
+    "decode_trusted_ns",
+    "encode_allocs",
+    "decode_allocs",
+    "wire_bytes",
+)
+"""Metrics shown in the summary."""
+
+KEYS = [b"a", b"e", b"\r", b"\x7f", b"\x1b[A", b"\x1b[B", b"\t", b" "]
+
+WORDS = [
+    b"Header",
+    b"Footer",
+    b"Button",
+    b"0.25",
+    b"Label",
+    b"\xe2\x94\x80" * 8,
+    b"\xe2\x96\x8a",
+]
+
+PacketFactory = Callable[[random.Random], Packet]
+
+
+def make_key(rng: random.Random) -> str:
+    """Make an identifier, like a route key or session ID."""
+    return "".join(rng.choice(IDENTITY_ALPHABET) for _ in range(IDENTITY_SIZE))
+
+
+def make_output(rng: random.Random, size: int) -> bytes:
+    """Make output which resembles a Textual app (styled text, with some repetition).
+
+    Args:
+        rng: Random number generator.
+        size: Size in bytes.
+
+    Returns:
+        Session data.
+    """
+    output = bytearray()
+    while len(output) < size:
+        output += b"\x1b[%d;%dH\x1b[38;2;%d;%d;%dm" % (
+            rng.randrange(50),
+            rng.randrange(200),
+            rng.randrange(256),
+            rng.randrange(256),
+            rng.randrange(256),
+        )
+        output += b" ".join(rng.choice(WORDS) for _ in range(rng.randrange(1, 12)))
+    return bytes(output[:size])
+
+
+def make_render(rng: random.Random) -> bytes:
+    """Make the output of a screen update, from a small change to a full repaint."""
+    return make_output(rng, int(rng.lognormvariate(7.5, 1.2)) + 16)
+
+
+def make_chunk(rng: random.Random) -> bytes:
+    """Make a binary encoded file delivery chunk, as sent by a Textual app."""
+    return msgpack.packb(
+        {
+            "type": "deliver_chunk",
+            "key": make_key(rng),
+            "data": rng.randbytes(DELIVERY_CHUNK_SIZE),
+        },
+        use_bin_type=True,
+    )
+
+
+PACKET_FACTORIES: dict[type[Packet], PacketFactory] = {
+    packets.Ping: lambda rng: packets.Ping(rng.randbytes(16)),
+    packets.Pong: lambda rng: packets.Pong(rng.randbytes(16)),
+    packets.Log: lambda rng: packets.Log(f"log message {rng.random()}"),
+    packets.Info: lambda rng: packets.Info(f"Retry-After: {rng.randrange(60)}"),
+    packets.DeclareApps: lambda rng: packets.DeclareApps(
+        [
+            {
+                "name": f"App {index}",
+                "slug": f"app-{index}",
+                "color": "#ffaa00",
+                "terminal": index % 2 == 0,
+            }
+            for index in range(rng.randrange(1, 6))
+        ]
+    ),
+    packets.SessionOpen: lambda rng: packets.SessionOpen(
+        make_key(rng), make_key(rng), "calculator", make_key(rng), 120, 40
+    ),
+    packets.SessionClose: lambda rng: packets.SessionClose(
+        make_key(rng), make_key(rng)
+    ),
+    packets.SessionData: lambda rng: packets.SessionData(
+        make_key(rng), make_render(rng)
+    ),
+    packets.RoutePing: lambda rng: packets.RoutePing(make_key(rng), f"{rng.random()}"),
+    packets.RoutePong: lambda rng: packets.RoutePong(make_key(rng), f"{rng.random()}"),
+    packets.NotifyTerminalSize: lambda rng: packets.NotifyTerminalSize(
+        make_key(rng), rng.randrange(80, 240), rng.randrange(24, 80)
+    ),
+    packets.Focus: lambda rng: packets.Focus(make_key(rng)),
+    packets.Blur: lambda rng: packets.Blur(make_key(rng)),
+    packets.OpenUrl: lambda rng: packets.OpenUrl(
+        make_key(rng), f"https://textual.textualize.io/{rng.randrange(1000)}", True
+    ),
+    packets.BinaryEncodedMessage: lambda rng: packets.BinaryEncodedMessage(
+        make_key(rng), make_chunk(rng)
+    ),
+    packets.DeliverFileStart: lambda rng: packets.DeliverFileStart(
+        make_key(rng),
+        make_key(rng),
+        f"report-{rng.randrange(1000)}.csv",
+        "download",
+        "text/csv",
+        "utf-8",
+    ),
+    packets.RequestDeliverChunk: lambda rng: packets.RequestDeliverChunk(
+        make_key(rng), make_key(rng), DELIVERY_CHUNK_SIZE
+    ),
+    packets.Compressed: lambda rng: packets.Compressed(
+        "zlib",
+        zlib.compress(
+            msgpack.packb(packets.SessionData(make_key(rng), make_render(rng)))
+        ),
+    ),
+    packets.CompressionDictionary: lambda rng: packets.CompressionDictionary(
+        "calculator", rng.randrange(1000), make_output(rng, 16 * 1024)
+    ),
+    packets.AcceptCompressionDictionary: lambda rng: packets.AcceptCompressionDictionary(
+        "calculator", rng.randrange(1000)
+    ),
+    packets.CompressedSessionData: lambda rng: packets.CompressedSessionData(
+        make_key(rng), zlib.compress(make_render(rng))
+    ),
+    packets.Reconnect: lambda rng: packets.Reconnect("draining"),
+    packets.SessionInventory: lambda rng: packets.SessionInventory(
+        [[make_key(rng), make_key(rng)] for _ in range(rng.randrange(1, 8))]
+    ),
+    packets.OrphanedSessions: lambda rng: packets.OrphanedSessions(
+        [make_key(rng) for _ in range(rng.randrange(0, 3))]
+    ),
+    packets.DeclareFeatures: lambda rng: packets.DeclareFeatures(
+        ["batch", "compression_dictionaries", "replay", "session_inventory"]
+    ),
+    packets.AcceptFeatures: lambda rng: packets.AcceptFeatures(["batch", "replay"]),
+    packets.BindRoute: lambda rng: packets.BindRoute(make_key(rng), rng.randrange(64)),
+    packets.CompactSessionData: lambda rng: packets.CompactSessionData(
+        rng.randrange(64), make_render(rng)
+    ),
+}
+"""Factories for a typical packet of each type."""
+
+
+def make_keystrokes(rng: random.Random, route_keys: list[str]) -> Iterable[Packet]:
+    """Make the packets for a keystroke, or mouse movement, and the app's response.
+
+    Args:
+        rng: Random number generator.
+        route_keys: Route keys to choose from.
+
+    Returns:
+        Packets (in both directions).
+    """
+    route_key = rng.choice(route_keys)
+    choice = rng.random()
+    if choice < 0.6:
+        yield packets.SessionData(route_key, rng.choice(KEYS))
+    elif choice < 0.9:
+        x, y = rng.randrange(200), rng.randrange(50)
+        yield packets.SessionData(route_key, b"\x1b[<35;%d;%dM" % (x, y))
+    else:
+        data = f"{rng.random():.6f}"
+        yield packets.RoutePing(route_key, data)
+        yield packets.RoutePong(route_key, data)
+        return
+    # Most input causes a small update
+    if rng.random() < 0.7:
+        yield packets.SessionData(route_key, make_output(rng, rng.randrange(16, 400)))
+
+
+def make_renders(rng: random.Random, route_keys: list[str]) -> Iterable[Packet]:
+    """Make the packets for apps which update continuously (such as a dashboard).
+
+    Args:
+        rng: Random number generator.
+        route_keys: Route keys to choose from.
+
+    Returns:
+        Packets (in both directions).
+    """
+    route_key = rng.choice(route_keys)
+    choice = rng.random()
+    if choice < 0.8:
+        yield packets.SessionData(route_key, make_render(rng))
+    elif choice < 0.9:
+        yield packets.CompressedSessionData(route_key, zlib.compress(make_render(rng)))
+    elif choice < 0.95:
+        yield packets.NotifyTerminalSize(
+            make_key(rng), rng.randrange(80, 240), rng.randrange(24, 80)
+        )
+        yield packets.SessionData(route_key, make_output(rng, 32 * 1024))
+    else:
+        yield packets.Ping(rng.randbytes(16))
+        yield packets.Pong(rng.randbytes(16))
+
+
+def make_file_delivery(rng: random.Random, route_keys: list[str]) -> Iterable[Packet]:
+    """Make the packets to deliver a file, while the app continues to update.
+
+    Args:
+        rng: Random number generator.
+        route_keys: Route keys to choose from.
+
+    Returns:
+        Packets (in both directions).
+    """
+    route_key = rng.choice(route_keys)
+    delivery_key = make_key(rng)
+    yield packets.DeliverFileStart(
+        route_key, delivery_key, "report.csv", "download", "text/csv", "utf-8"
+    )
+    for _ in range(rng.randrange(1, 16)):
+        yield packets.RequestDeliverChunk(route_key, delivery_key, DELIVERY_CHUNK_SIZE)
+        yield packets.BinaryEncodedMessage(route_key, make_chunk(rng))
+        if rng.random() < 0.5:
+            yield packets.SessionData(route_key, make_output(rng, 200))
+
+
+WORKLOADS: dict[str, Callable[[random.Random, list[str]], Iterable[Packet]]] = {
+    "keystroke": make_keystrokes,
+    "render": make_renders,
+    "file_delivery": make_file_delivery,
+}
+"""Mixed workloads, which generate a sequence of packets."""
+
+
+def make_workload(
+    make_packets: Callable[[random.Random, list[str]], Iterable[Packet]],
+) -> list[Packet]:
+    """Make the packets for a mixed workload.
+
+    Args:
+        make_packets: Callable to generate the next few packets.
+
+    Returns:
+        A list of packets.
+    """
+    rng = random.Random(1)
+    route_keys = [make_key(rng) for _ in range(ROUTE_COUNT)]
+    workload: list[Packet] = []
+    while len(workload) < PACKET_COUNT:
+        workload.extend(make_packets(rng, route_keys))
+    return workload[:PACKET_COUNT]
+
+
+def time_operation(operation: Callable[[object], object], items: list) -> float:
+    """Time an operation on each item.
+
+    Args:
+        operation: Operation to time.
+        items: Items to pass to the operation.
+
+    Returns:
+        Best time per item, in nanoseconds.
+    """
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = perf_counter()
+        for item in items:
+            operation(item)
+        best = min(best, perf_counter() - start)
+    return best / len(items) * 1e9
+
+
+def trace_allocations(
+    operation: Callable[[object], object], items: list
+) -> tuple[float, float]:
+    """Count the memory blocks allocated by an operation, and kept by its result.
+
+    Args:
+        operation: Operation to trace.
+        items: Items to pass to the operation.
+
+    Returns:
+        A tuple of blocks and bytes allocated, per item.
+    """
+    items = items[:ALLOCATION_COUNT]
+    results: list[object] = [None] * len(items)
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for index, item in enumerate(items):
+            results[index] = operation(item)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    differences = after.compare_to(before, "filename")
+    blocks = sum(difference.count_diff for difference in differences)
+    size = sum(difference.size_diff for difference in differences)
+    del results
+    return blocks / len(items), size / len(items)
+
+
+def measure(packet_list: list[Packet], route_handles: bool = False) -> dict[str, float]:
+    """Measure encoding and decoding a list of packets.
+
+    Args:
+        packet_list: Packets to encode and decode.
+        route_handles: Bind routes to handles, before encoding.
+
+    Returns:
+        A dict of results.
+    """
+    encoder = PacketEncoder()
+    if route_handles:
+        route_keys = {
+            packet[1]
+            for packet in packet_list
+            if packet.type == PacketType.SESSION_DATA
+        }
+        for handle, route_key in enumerate(sorted(route_keys)):
+            encoder.encode(packets.BindRoute(route_key, handle))
+    encode = encoder.encode
+    frames = [bytes(encode(packet)) for packet in packet_list]
+    decode = PacketDecoder(strict=True).decode
+    decode_trusted = PacketDecoder(strict=False).decode
+    for frame, packet in zip(frames, packet_list):
+        (decoded,) = decode(frame)
+        assert route_handles or decoded == packet
+    encode_allocs, encode_alloc_bytes = trace_allocations(encode, packet_list)
+    decode_allocs, decode_alloc_bytes = trace_allocations(decode, frames)
+    wire_bytes = sum(len(frame) for frame in frames)
+    return {
+        "packets": len(packet_list),
+        "encode_ns": time_operation(encode, packet_list),
+        "decode_ns": time_operation(decode, frames),
+        "decode_trusted_ns": time_operation(decode_trusted, frames),
+        "encode_allocs": encode_allocs,
+        "encode_alloc_bytes": encode_alloc_bytes,
+        "decode_allocs": decode_allocs,
+        "decode_alloc_bytes": decode_alloc_bytes,
+        "wire_bytes": wire_bytes / len(frames),
+        "wire_bytes_total": wire_bytes,
+    }
+
+
+def run_benchmarks(packet_types: set[str] | None = None) -> dict[str, object]:
+    """Run the benchmarks.
+
+    Args:
+        packet_types: Names of packet types to measure, or `None` for all.
+
+    Returns:
+        Results, which may be serialized as JSON.
+    """
+    results: dict[str, object] = {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "msgpack": ".".join(str(part) for part in msgpack.version),
+            "platform": platform.platform(),
+            "packet_count": PACKET_COUNT,
+            "repeat": REPEAT,
+        },
+        "packet_types": {},
+        "workloads": {},
+    }
+    for packet_class in PACKET_MAP.values():
+        name = packet_class.__name__
+        if packet_types is not None and name not in packet_types:
+            continue
+        rng = random.Random(1)
+        make_packet = PACKET_FACTORIES[packet_class]
+        packet_list = [make_packet(rng) for _ in range(PACKET_COUNT)]
+        print(f"measuring {name}", file=sys.stderr)
+        results["packet_types"][name] = measure(packet_list)
+    if packet_types is None:
+        for name, make_packets in WORKLOADS.items():
+            print(f"measuring {name} workload", file=sys.stderr)
+            workload = make_workload(make_packets)
+            results["workloads"][name] = measure(workload)
+            results["workloads"][f"{name}_handles"] = measure(
+                workload, route_handles=True
+            )
+    return results
+
+
+def print_summary(
+    results: dict[str, object], previous: dict[str, object] | None = None
+) -> None:
+    """Print a summary of the results to stderr.
+
+    Args:
+        results: Results of this run.
+        previous: Results of a previous run, to compare with.
+    """
+
+    def print_row(name: str, values: dict[str, float], group: str) -> None:
+        previous_values = (
+            None if previous is None else previous.get(group, {}).get(name)
+        )
+        columns = []
+        for metric in METRICS:
+            column = (
+                f"{values[metric]:.0f}"
+                if values[metric] >= 10
+                else f"{values[metric]:.1f}"
+            )
+            if previous_values is not None and previous_values.get(metric):
+                change = values[metric] / previous_values[metric] - 1
+                column += f" ({change:+.0%})"
+            columns.append(f"{column:>18}")
+        print(f"{name:<28}{''.join(columns)}", file=sys.stderr)
+
+    print(
+        f"\n{'':<28}{''.join(f'{metric:>18}' for metric in METRICS)}", file=sys.stderr
+    )
+    for group in ("packet_types", "workloads"):
+        for name, values in results[group].items():
+            print_row(name, values, group)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the packet codec.")
+    parser.add_argument(
+        "--output", help="File to write the results to (default stdout)."
+    )
+    parser.add_argument("--compare", help="Results of a previous run, to compare with.")
+    parser.add_argument(
+        "--packet",
+        action="append",
+        help="Measure only this packet type (may be repeated).",
+    )
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as compare_file:
+            previous = json.load(compare_file)
+
+    results = run_benchmarks(None if args.packet is None else set(args.packet))
+    print_summary(results, previous)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,135 @@
+"""
+Measures the throughput of decoding packets received from the Ganglion server.
+
+Run with:
+
+    python benchmarks/decode.py
+
+"""
+
+from __future__ import annotations
+
+import random
+from time import perf_counter
+
+import msgpack
+
+from textual_web.ganglion_client import GanglionClient
+from textual_web.packet_decoder import PacketDecoder
+from textual_web.packets import (
+    Blur,
+    Focus,
+    NotifyTerminalSize,
+    Packet,
+    Ping,
+    RoutePing,
+    SessionData,
+)
+
+FRAME_COUNT = 20_000
+"""Number of frames in the workload."""
+REPEAT = 10
+"""Number of times to decode the workload (the best time is reported)."""
+ROUTE_COUNT = 16
+"""Number of routes in the workload."""
+
+KEYS = [b"a", b"\r", b"\x7f", b"\x1b[A", b"\x1b[B", b"\t"]
+
+
+def make_packet(rng: random.Random, route_keys: list[str]) -> Packet:
+    """Make a packet from a mix typical of interactive sessions.
+
+    Mostly keystrokes and mouse events, with pings, resizes, focus changes and pastes.
+
+    Args:
+        rng: Random number generator.
+        route_keys: Route keys to choose from.
+
+    Returns:
+        A packet.
+    """
+    route_key = rng.choice(route_keys)
+    choice = rng.random()
+    if choice < 0.6:
+        return SessionData(route_key, rng.choice(KEYS))
+    if choice < 0.8:
+        x, y = rng.randrange(200), rng.randrange(50)
+        return SessionData(route_key, f"\x1b[<35;{x};{y}M".encode())
+    if choice < 0.9:
+        return RoutePing(route_key, f"{rng.random():.6f}")
+    if choice < 0.93:
+        return Ping(rng.randbytes(8))
+    if choice < 0.95:
+        return NotifyTerminalSize("session", rng.randrange(200), rng.randrange(50))
+    if choice < 0.97:
+        return (Focus if rng.random() < 0.5 else Blur)(route_key)
+    return SessionData(route_key, rng.randbytes(rng.randrange(256, 4096)))
+
+
+def make_frames(batched: bool) -> list[bytes]:
+    """Make the encoded frames for a workload.
+
+    Args:
+        batched: Make multi-envelope frames.
+
+    Returns:
+        A list of frames.
+    """
+    rng = random.Random(1)
+    route_keys = [f"{route:06x}" for route in range(ROUTE_COUNT)]
+    frames: list[bytes] = []
+    while len(frames) < FRAME_COUNT:
+        if batched:
+            batch = [make_packet(rng, route_keys) for _ in range(rng.randrange(1, 8))]
+            frames.append(msgpack.packb(batch, use_bin_type=True))
+        else:
+            packet = make_packet(rng, route_keys)
+            frames.append(msgpack.packb(packet, use_bin_type=True))
+    return frames
+
+
+def decode_unpackb(frames: list[bytes]) -> int:
+    """Decode frames with a new unpacker per frame, and validated packets."""
+    count = 0
+    decode_frame = GanglionClient.decode_frame
+    for frame in frames:
+        count += len(decode_frame(msgpack.unpackb(frame, use_list=True, raw=False)))
+    return count
+
+
+def make_decoder(strict: bool):
+    """Make a function to decode frames with a PacketDecoder."""
+
+    def decode_frames(frames: list[bytes]) -> int:
+        count = 0
+        decode = PacketDecoder(strict=strict).decode
+        for frame in frames:
+            count += len(decode(frame))
+        return count
+
+    return decode_frames
+
+
+def run() -> None:
+    decoders = [
+        ("unpackb + strict", decode_unpackb),
+        ("decoder (strict)", make_decoder(strict=True)),
+        ("decoder (trusted)", make_decoder(strict=False)),
+    ]
+    for batched in (False, True):
+        frames = make_frames(batched)
+        print(f"{'batched' if batched else 'single'} frames ({len(frames)} frames)")
+        for name, decode_frames in decoders:
+            best = float("inf")
+            for _ in range(REPEAT):
+                start = perf_counter()
+                packet_count = decode_frames(frames)
+                best = min(best, perf_counter() - start)
+            print(
+                f"  {name:<20} {packet_count / best / 1000:8.0f}k packets/s"
+                f" {best / packet_count * 1e9:6.0f} ns/packet"
+            )
+
+
+if __name__ == "__main__":
+    run()
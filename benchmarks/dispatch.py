@@ -0,0 +1,103 @@
+"""
+Measures the overhead of dispatching packets to their handlers.
+
+Compares looking up the handler for every packet (as the generated
+`Handlers.dispatch_packet` does) with the dispatch table of `PacketHandlers`, on a mix of
+SessionData and Ping packets. Also reports the cost of the (optional) handler timing hook.
+
+Run with:
+
+    python benchmarks/dispatch.py
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from time import perf_counter
+
+from textual_web.packet_handlers import PacketHandlers
+from textual_web.packets import Handlers, Packet, Ping, Pong, SessionData
+
+PACKET_COUNT = 100_000
+"""Number of packets in the workload."""
+REPEAT = 30
+"""Number of times to dispatch the workload (the best time is reported)."""
+
+
+class LookupHandlers(Handlers):
+    """Handles SessionData and Ping, as the client does. Pong is unhandled."""
+
+    async def on_session_data(self, packet: SessionData) -> None:
+        pass
+
+    async def on_ping(self, packet: Ping) -> None:
+        pass
+
+
+class BenchmarkHandlers(LookupHandlers, PacketHandlers):
+    """The same handlers, dispatched with a table."""
+
+
+def make_packets() -> list[Packet]:
+    """Make a workload of mostly session data, with pings and a few pongs.
+
+    Returns:
+        A list of packets.
+    """
+    rng = random.Random(1)
+    packets: list[Packet] = []
+    for _ in range(PACKET_COUNT):
+        choice = rng.random()
+        if choice < 0.9:
+            packets.append(SessionData("route", b"a"))
+        elif choice < 0.98:
+            packets.append(Ping(b"ping"))
+        else:
+            packets.append(Pong(b"pong"))
+    return packets
+
+
+async def dispatch(handlers: Handlers, packets: list[Packet]) -> None:
+    """Dispatch packets with `dispatch_packet`."""
+    dispatch_packet = handlers.dispatch_packet
+    for packet in packets:
+        await dispatch_packet(packet)
+
+
+async def dispatch_get_handler(handlers: PacketHandlers, packets: list[Packet]) -> None:
+    """Dispatch packets with `PacketHandlers.get_handler`, as the connection does."""
+    get_handler = handlers.get_handler
+    for packet in packets:
+        handler = get_handler(packet)
+        if handler is not None:
+            await handler(packet)
+
+
+async def run() -> None:
+    packets = make_packets()
+    timed_handlers = BenchmarkHandlers()
+    handler_times: list[float] = []
+    timed_handlers.set_handler_timer(
+        lambda packet, elapsed: handler_times.append(elapsed)
+    )
+    benchmarks = [
+        ("Handlers.dispatch_packet", dispatch, LookupHandlers()),
+        ("PacketHandlers.dispatch_packet", dispatch, BenchmarkHandlers()),
+        ("get_handler", dispatch_get_handler, BenchmarkHandlers()),
+        ("get_handler + timer", dispatch_get_handler, timed_handlers),
+    ]
+    print(f"{PACKET_COUNT} packets (90% SessionData, 8% Ping, 2% unhandled Pong)\n")
+    for name, run_dispatch, handlers in benchmarks:
+        best = float("inf")
+        for _ in range(REPEAT):
+            handler_times.clear()
+            start = perf_counter()
+            await run_dispatch(handlers, packets)
+            best = min(best, perf_counter() - start)
+        print(f"{name:<32} {best / PACKET_COUNT * 1e9:7.0f} ns/packet")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
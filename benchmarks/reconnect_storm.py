@@ -0,0 +1,250 @@
+"""
+Simulates a fleet of clients reconnecting to a Ganglion node which has restarted.
+
+Every client loses its connection at the same moment, and retries with the backoff
+in `textual_web.retry`. The node is down for a few seconds, then accepts a limited
+number of handshakes per second. If it is flooded with attempts it falls over again,
+and restarts.
+
+Time is simulated, so this runs in a moment. Compares the previous (quadratic) backoff,
+decorrelated jitter, and decorrelated jitter with the node sending retry-after hints.
+
+Exits with an error if the jittered schedules flood the node, if every client doesn't
+connect within `MAX_CONNECT_TIME`, if retry-after hints don't shorten the time for the
+slowest clients, or if any delay is shorter than a retry-after hint.
+
+Run with:
+
+    python benchmarks/reconnect_storm.py
+
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+import heapq
+import math
+import random
+import statistics
+import sys
+from typing import Callable
+
+from textual_web.retry import Retry
+
+CLIENTS = 1000
+"""Number of virtual clients."""
+RESTART_TIME = 5.0
+"""Time (in seconds) for the node to restart."""
+CAPACITY = 100
+"""Handshakes the node accepts per second."""
+OVERLOAD = 300
+"""Attempts in one second which cause the node to fall over."""
+MAX_TIME = 600.0
+"""Time (in seconds) to give up the simulation."""
+IDEAL_CONNECT_TIME = RESTART_TIME + CLIENTS / CAPACITY
+"""Time (in seconds) for every client to connect, if the node was never idle."""
+MAX_CONNECT_TIME = {
+    "decorrelated jitter": IDEAL_CONNECT_TIME * 2,
+    "decorrelated + retry-after": IDEAL_CONNECT_TIME * 1.5,
+}
+"""Maximum time (in seconds) for every client to connect, for the jittered schedules."""
+
+
+def quadratic_delay(retry: Retry) -> float:
+    """The previous backoff; a random delay up to the retry count squared (2 to 16 seconds).
+
+    Args:
+        retry: Retry state.
+
+    Returns:
+        Delay in seconds.
+    """
+    return random.random() * max(
+        retry.min_wait, min(retry.max_wait, retry.retry_count**2)
+    )
+
+
+def simulate(
+    get_delay: Callable[[Retry], float], retry_after: bool
+) -> dict[str, object]:
+    """Simulate every client reconnecting.
+
+    Args:
+        get_delay: Callable to get the delay before the next attempt.
+        retry_after: The node sends retry-after hints when it is busy.
+
+    Returns:
+        Results of the simulation.
+    """
+    random.seed(1)
+    retries = [Retry() for _ in range(CLIENTS)]
+    events: list[tuple[float, int]] = []
+    for client, retry in enumerate(retries):
+        retry.retry_count = 1
+        heapq.heappush(events, (0.0, client))
+
+    up_time = RESTART_TIME
+    crashes = 0
+    attempts = 0
+    peak_attempts = 0
+    attempts_per_second: Counter[int] = Counter()
+    accepted_per_second: Counter[int] = Counter()
+    connect_times: list[float] = []
+    short_delays = 0
+
+    while events:
+        time, client = heapq.heappop(events)
+        if time > MAX_TIME:
+            break
+        second = int(time)
+        attempts += 1
+        attempts_per_second[second] += 1
+        if time >= up_time:
+            peak_attempts = max(peak_attempts, attempts_per_second[second])
+        retry = retries[client]
+        if time >= up_time and attempts_per_second[second] > OVERLOAD:
+            # Flooded; the node falls over, and every connected client must reconnect
+            crashes += 1
+            up_time = time + RESTART_TIME
+            for connected_client in range(CLIENTS):
+                if retries[connected_client].retry_count == 0:
+                    retries[connected_client].retry_count = 1
+                    heapq.heappush(events, (time, connected_client))
+            connect_times = [
+                connect_time for connect_time in connect_times if connect_time > time
+            ]
+        if time >= up_time and accepted_per_second[second] < CAPACITY:
+            accepted_per_second[second] += 1
+            retry.success()
+            connect_times.append(time)
+            continue
+        hint = 0
+        if retry_after and time >= up_time:
+            # Busy; estimate the time to work through the recent attempts
+            hint = math.ceil(attempts_per_second[second] / CAPACITY)
+            retry.retry_after(hint)
+        delay = get_delay(retry)
+        if delay < hint:
+            short_delays += 1
+        heapq.heappush(events, (time + delay, client))
+        retry.retry_count += 1
+
+    connect_times.sort()
+    connected = len(connect_times)
+    return {
+        "connected": connected,
+        "attempts": attempts,
+        "crashes": crashes,
+        "peak_attempts_per_second": peak_attempts,
+        "p50": connect_times[connected // 2] if connected else None,
+        "p99": connect_times[int(connected * 0.99)] if connected else None,
+        "all_connected": connect_times[-1] if connected == CLIENTS else None,
+        "spread": statistics.pstdev(connect_times) if connected else None,
+        "short_delays": short_delays,
+    }
+
+
+def check_retry_after_floor() -> list[str]:
+    """Check that a delay is never shorter than the server's retry-after hint, including
+    hints longer than the maximum delay.
+
+    Returns:
+        A list of failures.
+    """
+    random.seed(1)
+    failures: list[str] = []
+    for hint in (0.5, 1.0, 5.0, 30.0, 120.0):
+        for _ in range(1000):
+            retry = Retry()
+            retry.retry_count = 1
+            retry.get_delay()
+            retry.retry_after(hint)
+            delay = retry.get_delay()
+            if delay < hint:
+                failures.append(f"delay {delay:.2f}s is shorter than hint {hint}s")
+                break
+            # The hint only applies to the next attempt
+            if retry.get_delay() > retry.max_wait:
+                failures.append(f"hint {hint}s applied to more than one attempt")
+                break
+    return failures
+
+
+def check(results: dict[str, dict[str, object]]) -> list[str]:
+    """Check the results of the simulations.
+
+    Args:
+        results: Results for each schedule.
+
+    Returns:
+        A list of failures.
+    """
+    failures: list[str] = []
+    for name, max_connect_time in MAX_CONNECT_TIME.items():
+        result = results[name]
+        if result["crashes"]:
+            failures.append(f"{name}: node fell over {result['crashes']} time(s)")
+        if result["peak_attempts_per_second"] > OVERLOAD:
+            failures.append(f"{name}: peak attempts per second over {OVERLOAD}")
+        all_connected = result["all_connected"]
+        if all_connected is None:
+            failures.append(f"{name}: {result['connected']} of {CLIENTS} connected")
+        elif all_connected > max_connect_time:
+            failures.append(
+                f"{name}: all connected after {all_connected:.1f}s,"
+                f" expected {max_connect_time:.1f}s or less"
+            )
+    jitter = results["decorrelated jitter"]
+    retry_after = results["decorrelated + retry-after"]
+    if None not in (jitter["p99"], retry_after["p99"]):
+        if retry_after["p99"] > jitter["p99"]:
+            failures.append("retry-after hints didn't reduce the p99 connect time")
+        if retry_after["spread"] > jitter["spread"]:
+            failures.append("retry-after hints didn't reduce the connect time spread")
+    if retry_after["short_delays"]:
+        failures.append(
+            f"{retry_after['short_delays']} delay(s) shorter than the retry-after hint"
+        )
+    return failures + check_retry_after_floor()
+
+
+def run() -> bool:
+    schedules: list[tuple[str, Callable[[Retry], float], bool]] = [
+        ("quadratic (previous)", quadratic_delay, False),
+        ("decorrelated jitter", Retry.get_delay, False),
+        ("decorrelated + retry-after", Retry.get_delay, True),
+    ]
+    print(
+        f"{CLIENTS} clients; node restarts in {RESTART_TIME:.0f}s, "
+        f"accepts {CAPACITY}/s, falls over at {OVERLOAD} attempts/s\n"
+    )
+    print(
+        f"{'schedule':<28} {'attempts':>8} {'peak/s':>7} {'crashes':>7}"
+        f" {'p50':>7} {'p99':>7} {'all':>7} {'spread':>7}"
+    )
+
+    def seconds(value: object) -> str:
+        return "-" if value is None else f"{value:.1f}s"
+
+    results: dict[str, dict[str, object]] = {}
+    for name, get_delay, retry_after in schedules:
+        result = results[name] = simulate(get_delay, retry_after)
+        print(
+            f"{name:<28} {result['attempts']:>8} {result['peak_attempts_per_second']:>7}"
+            f" {result['crashes']:>7} {seconds(result['p50']):>7}"
+            f" {seconds(result['p99']):>7} {seconds(result['all_connected']):>7}"
+            f" {seconds(result['spread']):>7}"
+        )
+
+    failures = check(results)
+    print()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return not failures
+
+
+if __name__ == "__main__":
+    if not run():
+        sys.exit(1)
@@ -0,0 +1,178 @@
+"""
+Compares the throughput and latency of the transports to a Ganglion server on the same host.
+
+Runs a stand-in Ganglion server listening on loopback TCP and on a Unix domain socket,
+and connects a client to each in turn.
+
+Run with:
+
+    python benchmarks/transport.py
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+from time import perf_counter
+
+import msgpack
+from aiohttp import web
+
+from textual_web import constants
+from textual_web.config import default_config
+from textual_web.environment import Environment
+from textual_web.ganglion_client import GanglionClient
+from textual_web.packets import PacketType, SessionData
+
+PING_COUNT = 500
+"""Number of ping / pongs to measure latency."""
+CHUNK_SIZE = 16 * 1024
+"""Size of each session data packet."""
+TOTAL_BYTES = 64 * 1024 * 1024
+"""Bytes of session data to send, to measure throughput."""
+PORT = 8771
+"""Port for the loopback TCP server."""
+
+
+def make_output(size: int) -> bytes:
+    """Make output which resembles a Textual app (styled text, with some repetition).
+
+    Args:
+        size: Size in bytes.
+
+    Returns:
+        Session data.
+    """
+    rng = random.Random(1)
+    words = [
+        b"\x1b[38;2;%d;%d;%dm%s" % (*(rng.randrange(256) for _ in range(3)), word)
+        for word in (
+            b"Header",
+            b"Footer",
+            b"Button",
+            b"0.25",
+            b"Label",
+            b"\xe2\x94\x80",
+        )
+    ]
+    output = bytearray()
+    while len(output) < size:
+        output += b"\x1b[%d;%dH" % (rng.randrange(50), rng.randrange(200))
+        output += b" ".join(rng.choice(words) for _ in range(rng.randrange(1, 12)))
+    return bytes(output[:size])
+
+
+class StandIn:
+    """A stand-in Ganglion server, which counts session data and measures ping times."""
+
+    def __init__(self) -> None:
+        self.websocket: web.WebSocketResponse | None = None
+        self.connected = asyncio.Event()
+        self.received = 0
+        self.received_all = asyncio.Event()
+        self.expected = TOTAL_BYTES
+        self.pong: asyncio.Future[None] | None = None
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        websocket = web.WebSocketResponse(protocols=("ganglion.batch",), compress=True)
+        await websocket.prepare(request)
+        self.websocket = websocket
+        async for message in websocket:
+            if message.type != web.WSMsgType.BINARY:
+                continue
+            frame = msgpack.unpackb(message.data, raw=False)
+            for envelope in frame if frame and isinstance(frame[0], list) else [frame]:
+                packet_type = envelope[0]
+                if packet_type == PacketType.DECLARE_APPS:
+                    self.connected.set()
+                elif packet_type == PacketType.SESSION_DATA:
+                    self.received += len(envelope[2])
+                    if self.received >= self.expected:
+                        self.received_all.set()
+                elif packet_type == PacketType.PONG:
+                    if self.pong is not None and not self.pong.done():
+                        self.pong.set_result(None)
+        return websocket
+
+    async def ping(self) -> float:
+        """Send a Ping, and wait for the Pong.
+
+        Returns:
+            Round trip time (in seconds).
+        """
+        assert self.websocket is not None
+        self.pong = asyncio.get_running_loop().create_future()
+        start = perf_counter()
+        await self.websocket.send_bytes(msgpack.packb([PacketType.PING, "ping"]))
+        await self.pong
+        return perf_counter() - start
+
+
+async def measure(name: str, url: str, compression: str, stand_in: StandIn) -> None:
+    """Connect a client to the stand-in server, and measure latency and throughput.
+
+    Args:
+        name: Name of the transport.
+        url: Websocket URL.
+        compression: Compression setting.
+        stand_in: Stand-in server.
+    """
+    constants.COMPRESSION = compression  # type: ignore[misc]
+    stand_in.connected.clear()
+    stand_in.received = 0
+    stand_in.received_all.clear()
+    client = GanglionClient("./", default_config(), Environment("bench", "", url), None)
+    task = asyncio.create_task(client.run())
+    await stand_in.connected.wait()
+
+    ping_times = [await stand_in.ping() for _ in range(PING_COUNT)]
+
+    output = make_output(CHUNK_SIZE * 64)
+    chunks = [
+        output[offset : offset + CHUNK_SIZE]
+        for offset in range(0, len(output), CHUNK_SIZE)
+    ]
+    start = perf_counter()
+    sent = 0
+    while sent < TOTAL_BYTES:
+        chunk = chunks[(sent // CHUNK_SIZE) % len(chunks)]
+        await client.send(SessionData("bench", chunk))
+        sent += len(chunk)
+    await stand_in.received_all.wait()
+    elapsed = perf_counter() - start
+
+    client.force_exit()
+    await task
+    ping_times.sort()
+    print(
+        f"{name:<28} {TOTAL_BYTES / elapsed / 1024 / 1024:7.1f} MiB/s"
+        f"  ping median {statistics.median(ping_times) * 1e6:6.0f} µs"
+        f"  p99 {ping_times[int(len(ping_times) * 0.99)] * 1e6:6.0f} µs"
+    )
+
+
+async def run() -> None:
+    logging.getLogger("textual-web").setLevel(logging.ERROR)
+    stand_in = StandIn()
+    app = web.Application()
+    app.add_routes([web.get("/app-service/", stand_in.handle)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        socket_path = os.path.join(temp_dir, "ganglion.sock")
+        await web.TCPSite(runner, "127.0.0.1", PORT).start()
+        await web.UnixSite(runner, socket_path).start()
+        tcp_url = f"ws://127.0.0.1:{PORT}/app-service/"
+        await measure("loopback TCP (deflate)", tcp_url, "websocket", stand_in)
+        await measure("loopback TCP (uncompressed)", tcp_url, "none", stand_in)
+        await measure("Unix socket", f"unix://{socket_path}", "websocket", stand_in)
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,101 @@
+"""
+Generates textual_web/packets.py from packets.yml and packets.py.template.
+
+Requires the `jinja2` and `pyyaml` packages. Run with `make packets.py`, which also
+formats the output with black.
+
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import re
+import sys
+import time
+
+import jinja2
+import yaml
+
+VERSION = 1
+"""Version of the generated file."""
+TYPES = {"bytes", "str", "int", "bool", "list"}
+"""Permitted attribute types."""
+SENDERS = {"client", "server", "both"}
+"""Permitted senders."""
+
+
+def snake_case(name: str) -> str:
+    """Convert a packet name (CamelCase) to snake case.
+
+    Args:
+        name: Packet name.
+
+    Returns:
+        Snake case name.
+    """
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def load_packets(path: Path) -> list[dict]:
+    """Load and validate packet definitions.
+
+    Args:
+        path: Path to packets.yml.
+
+    Raises:
+        ValueError: If a definition is invalid.
+
+    Returns:
+        Packet definitions, with the fields used by the template.
+    """
+    packets = yaml.safe_load(path.read_text())
+    ids: set[int] = set()
+    for packet in packets:
+        name = packet["name"]
+        if packet["id"] in ids:
+            raise ValueError(f"Duplicate packet id {packet['id']} ({name})")
+        ids.add(packet["id"])
+        if packet["sender"] not in SENDERS:
+            raise ValueError(f"Invalid sender {packet['sender']!r} ({name})")
+        attributes = packet["attributes"]
+        for attribute in attributes:
+            if attribute["type"] not in TYPES:
+                raise ValueError(f"Invalid type {attribute['type']!r} ({name})")
+        packet["constant"] = snake_case(name).upper()
+        packet["handler_name"] = f"on_{snake_case(name)}"
+        packet["parameters"] = ", ".join(
+            f"{attribute['name']}: {attribute['type']}" for attribute in attributes
+        )
+        packet["names"] = ", ".join(attribute["name"] for attribute in attributes)
+        packet.setdefault("notes", "")
+    if sorted(ids) != list(range(1, len(ids) + 1)):
+        raise ValueError("Packet ids should be consecutive, from 1")
+    return sorted(packets, key=lambda packet: packet["id"])
+
+
+def build(definitions_path: Path, template_path: Path) -> str:
+    """Render packets.py.
+
+    Args:
+        definitions_path: Path to packets.yml.
+        template_path: Path to packets.py.template.
+
+    Returns:
+        Python source (not yet formatted).
+    """
+    environment = jinja2.Environment(
+        keep_trailing_newline=True, undefined=jinja2.StrictUndefined
+    )
+    template = environment.from_string(template_path.read_text())
+    return template.render(
+        packets=load_packets(definitions_path),
+        time=time.ctime(),
+        version=VERSION,
+    )
+
+
+if __name__ == "__main__":
+    base_path = Path(__file__).parent
+    sys.stdout.write(
+        build(base_path / "packets.yml", base_path / "packets.py.template")
+    )
@@ -9,6 +9,7 @@ import logging
 import json
 import logging
 import os
+import signal
 from time import monotonic
 from datetime import timedelta
 from pathlib import Path
@@ -18,10 +19,9 @@ from importlib_metadata import version
 import rich.repr
 
 from . import constants
-from .session import Session, SessionConnector
+from .session import KILL_TIMEOUT, Session, SessionConnector
 from .types import Meta, SessionID
 
-
 log = logging.getLogger("textual-web")
 
 
@@ -56,6 +56,7 @@ class AppSession(Session):
         self.end_time: float | None = None
         self._process: Process | None = None
         self._task: asyncio.Task | None = None
+        self._size = (80, 24)
 
         super().__init__()
         self._state = ProcessState.PENDING
@@ -149,9 +150,12 @@ class AppSession(Session):
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 env=environment,
+                # A process group for the shell and the app, so both can be killed
+                start_new_session=True,
             )
         finally:
             os.chdir(cwd)
+        self.pid = self._process.pid
         await self.set_terminal_size(width, height)
         log.debug("opened %r; %r", self.command, self._process)
         self.start_time = monotonic()
@@ -168,6 +172,39 @@ class AppSession(Session):
         self.state = ProcessState.CLOSING
         await self.send_meta({"type": "quit"})
 
+    async def kill(self, timeout: float = KILL_TIMEOUT) -> None:
+        """Kill the process, without asking it to quit.
+
+        Args:
+            timeout: Time (in seconds) to wait before sending SIGKILL.
+        """
+        process = self._process
+        if process is None:
+            return
+        self.state = ProcessState.CLOSING
+        try:
+            self._send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                log.warning("%r didn't exit after SIGTERM; sending SIGKILL", self)
+                self._send_signal(getattr(signal, "SIGKILL", signal.SIGTERM))
+                await process.wait()
+        except ProcessLookupError:
+            pass
+
+    def _send_signal(self, signal_number: int) -> None:
+        """Send a signal to the shell, and the app it started.
+
+        Args:
+            signal_number: Signal to send.
+        """
+        assert self._process is not None
+        if hasattr(os, "killpg"):
+            os.killpg(self._process.pid, signal_number)
+        else:
+            self._process.send_signal(signal_number)
+
     async def wait(self) -> None:
         """Wait for the process to finish (call close first)."""
         if self._task:
@@ -181,6 +218,7 @@ class AppSession(Session):
             width: Width in cells.
             height: Height in cells.
         """
+        self._size = (width, height)
         await self.send_meta(
             {
                 "type": "resize",
@@ -189,6 +227,11 @@ class AppSession(Session):
             }
         )
 
+    async def repaint(self) -> None:
+        """Redraw the app, by resending the terminal size."""
+        width, height = self._size
+        await self.set_terminal_size(width, height)
+
     async def run(self) -> None:
         """This loop reads stdout from the process and relays it through the websocket."""
 
@@ -234,6 +277,8 @@ class AppSession(Session):
                     size = from_bytes(size_bytes, "big")
                     payload = await readexactly(size)
                     if type_bytes == DATA:
+                        # Waits while the route is over the writer's high watermark,
+                        # which stops reading stdout until the network catches up.
                         await on_data(payload)
                     elif type_bytes == META:
                         meta_data = json.loads(payload)
@@ -270,12 +315,12 @@ class AppSession(Session):
 
         Args:
             packet_type: The packet type (b"D" for data or b"M" for meta)
-            payload: The payload.
+            payload: The payload (any bytes-like object).
 
         Returns:
             Data as bytes.
         """
-        return b"%s%s%s" % (packet_type, len(payload).to_bytes(4, "big"), payload)
+        return b"".join((packet_type, len(payload).to_bytes(4, "big"), payload))
 
     async def send_bytes(self, data: bytes) -> bool:
         """Send bytes to process.
@@ -291,7 +336,11 @@ class AppSession(Session):
             stdin.write(self.encode_packet(b"D", data))
         except RuntimeError:
             return False
-        await stdin.drain()
+        try:
+            await stdin.drain()
+        except ConnectionError:
+            # The process has exited
+            return False
         return True
 
     async def send_meta(self, data: Meta) -> bool:
@@ -309,5 +358,9 @@ class AppSession(Session):
             stdin.write(self.encode_packet(b"M", data_bytes))
         except RuntimeError:
             return False
-        await stdin.drain()
+        try:
+            await stdin.drain()
+        except ConnectionError:
+            # The process has exited
+            return False
         return True
@@ -93,9 +93,37 @@ def print_disclaimer() -> None:
     help="Exit textual-web when no apps have been launched in WAIT seconds",
 )
 @click.option("-w", "--web-interface", is_flag=True, help="Enable web interface")
+@click.option(
+    "--direct",
+    is_flag=True,
+    help="Serve apps to browsers from the web interface, without a Ganglion server.",
+)
+@click.option(
+    "--host",
+    help="Address for the web interface to listen on.",
+    default=constants.WEB_HOST,
+)
+@click.option(
+    "--port",
+    type=int,
+    help="Port for the web interface to listen on.",
+    default=constants.WEB_PORT,
+)
 @click.option("-s", "--signup", is_flag=True, help="Create a textual-web account.")
 @click.option("--welcome", is_flag=True, help="Launch an example app.")
 @click.option("--merlin", is_flag=True, help="Launch Merlin game.")
+@click.option(
+    "--connections",
+    type=int,
+    metavar="COUNT",
+    default=constants.CONNECTIONS,
+    help="Number of connections to the server, to spread sessions over.",
+)
+@click.option(
+    "--train-dictionary",
+    help="Train a compression dictionary from recorded sessions in DIR.",
+    metavar="DIR",
+)
 def app(
     config: str | None,
     environment: str,
@@ -104,10 +132,15 @@ def app(
     terminal: bool,
     exit_on_idle: int,
     web_interface: bool,
+    direct: bool,
+    host: str,
+    port: int,
     api_key: str,
     signup: bool,
     welcome: bool,
     merlin: bool,
+    connections: int,
+    train_dictionary: str | None,
 ) -> None:
     """Textual-web can server Textual apps and terminals."""
 
@@ -120,6 +153,11 @@ def app(
     #     signup: Signup dialog.
     #     welcome: Welcome app.
     #     merlin: Merlin app.
+    #     connections: Number of connections.
+    #     direct: Serve apps without Ganglion.
+    #     host: Web interface address.
+    #     port: Web interface port.
+    #     train_dictionary: Directory of recorded sessions.
 
     error_console = Console(stderr=True)
     from .config import load_config, default_config
@@ -145,6 +183,17 @@ def app(
         MerlinApp().run()
         return
 
+    if train_dictionary is not None:
+        from .stream_compression import train_dictionary as train
+
+        try:
+            dictionary_path = train(Path(train_dictionary))
+        except Exception as error:
+            error_console.print(f"Failed to train dictionary; {error}")
+        else:
+            Console().print(f"Wrote compression dictionary to {str(dictionary_path)!r}")
+        return
+
     VERSION = version("textual-web")
 
     print_disclaimer()
@@ -188,6 +237,10 @@ def app(
         devtools=dev,
         exit_on_idle=exit_on_idle,
         web_interface=web_interface,
+        connections=connections,
+        direct=direct,
+        web_host=host,
+        web_port=port,
     )
 
     for app_command in run:
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from time import monotonic, process_time, thread_time
+import zlib
+
+import msgpack
+
+from .packets import Compressed, Packet, PacketType
+
+log = logging.getLogger("textual-web")
+
+ENCODING = "zlib"
+"""Encoding name in Compressed packets."""
+
+MIN_SIZE = 512
+"""Payloads smaller than this (in bytes) are sent uncompressed."""
+MAX_RATIO = 0.9
+"""Routes which compress worse than this ratio (compressed / original) are sampled."""
+SAMPLE_RATE = 16
+"""Poorly compressing routes compress one in every SAMPLE_RATE payloads to re-measure."""
+RATIO_SMOOTHING = 0.2
+"""Weight of a new sample in a route's compression ratio moving average."""
+CPU_SAMPLE_PERIOD = 1.0
+"""Time (in seconds) between measurements of CPU usage."""
+OFFLOAD_SIZE = 32 * 1024
+"""Envelopes at least this size (in bytes) are compressed in a thread."""
+MAX_THREADS = 2
+"""Maximum number of threads used for compression."""
+
+LEVELS = [(0.5, 6), (0.8, 3), (1.0, 1)]
+"""Compression level to use under a given (process) CPU usage. While the connection is
+congested, the next higher level is used."""
+
+SAMPLE_SIZE = 1024
+"""Bytes from the end of a binary payload, compressed to estimate if the payload is
+already compressed (such as a chunk of an image or archive)."""
+SAMPLE_LEVEL = 1
+"""Compression level used for a sample."""
+
+COMPRESSIBLE = {PacketType.SESSION_DATA, PacketType.BINARY_ENCODED_MESSAGE}
+"""Packets types to consider for compression. These all have (route_key, data) fields."""
+
+
+class CompressionStats:
+    """Counters for a compression decision."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        """Number of packets."""
+        self.bytes_in = 0
+        """Payload bytes before compression."""
+        self.bytes_out = 0
+        """Bytes after compression."""
+        self.cpu_time = 0.0
+        """CPU time (in seconds) spent compressing."""
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size as a ratio of the original size."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get the counters.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "count": self.count,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.ratio,
+            "cpu_time": self.cpu_time,
+        }
+
+
+def is_incompressible(data: bytes, max_ratio: float) -> bool:
+    """Estimate if a payload is already compressed, by compressing a sample.
+
+    The sample is taken from the end of the payload, which skips any header (for
+    example the delivery key of a file chunk).
+
+    Args:
+        data: Payload.
+        max_ratio: Maximum ratio (compressed / original) of a compressible sample.
+
+    Returns:
+        `True` if the data is unlikely to compress.
+    """
+    sample = data[-SAMPLE_SIZE:]
+    return len(zlib.compress(sample, SAMPLE_LEVEL)) > len(sample) * max_ratio
+
+
+class CompressionPolicy:
+    """Decides which packets to compress, and at what level.
+
+    Packets are compressed in to a `Compressed` packet, which wraps the original envelope.
+    Small payloads, binary payloads which are already compressed (estimated from a sample
+    of each payload), and routes which aren't saving bytes, are sent uncompressed. The
+    compression level is chosen from the CPU usage of the process, so that compression
+    backs off when the host is busy, and is raised while the connection is congested
+    (when bytes saved matter more than CPU time).
+    """
+
+    def __init__(
+        self,
+        min_size: int = MIN_SIZE,
+        max_ratio: float = MAX_RATIO,
+        offload_size: int = OFFLOAD_SIZE,
+    ) -> None:
+        """
+        Args:
+            min_size: Minimum payload size to compress.
+            max_ratio: Ratio above which a route is considered incompressible.
+            offload_size: Minimum envelope size to compress in a thread.
+        """
+        self.min_size = min_size
+        self.max_ratio = max_ratio
+        self.offload_size = offload_size
+        self._executor: ThreadPoolExecutor | None = None
+        self.level = LEVELS[0][1]
+        """Current compression level (for the CPU usage)."""
+        self._level_index = 0
+        self.congested_count = 0
+        """Payloads compressed at a higher level, as the connection was congested."""
+        self.cpu_usage = 0.0
+        """Process CPU usage (1.0 is one core) at last measurement."""
+        self._cpu_sample = (monotonic(), process_time())
+        self._route_ratios: dict[str, float] = {}
+        self._route_skips: dict[str, int] = {}
+
+        self.compressed = CompressionStats()
+        """Payloads which were compressed."""
+        self.compressed_offloaded = CompressionStats()
+        """Payloads which were compressed in a thread."""
+        self.skipped_small = CompressionStats()
+        """Payloads below the minimum size."""
+        self.skipped_incompressible = CompressionStats()
+        """Binary payloads which are already compressed."""
+        self.skipped_ratio = CompressionStats()
+        """Payloads on routes which aren't saving bytes."""
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get compression metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "level": self.level,
+            "cpu_usage": self.cpu_usage,
+            "congested": self.congested_count,
+            "compressed": self.compressed.get_metrics(),
+            "compressed_offloaded": self.compressed_offloaded.get_metrics(),
+            "skipped_small": self.skipped_small.get_metrics(),
+            "skipped_incompressible": self.skipped_incompressible.get_metrics(),
+            "skipped_ratio": self.skipped_ratio.get_metrics(),
+        }
+
+    def close(self) -> None:
+        """Shut down compression threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard state for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self._route_ratios.pop(route_key, None)
+        self._route_skips.pop(route_key, None)
+
+    def update_level(self, congested: bool = False) -> int:
+        """Update the compression level from the CPU usage, if the sample period has elapsed.
+
+        Args:
+            congested: The connection is congested, so use the next higher level.
+
+        Returns:
+            The compression level.
+        """
+        sample_time, sample_cpu = self._cpu_sample
+        now = monotonic()
+        elapsed = now - sample_time
+        if elapsed >= CPU_SAMPLE_PERIOD:
+            cpu = process_time()
+            self.cpu_usage = (cpu - sample_cpu) / elapsed
+            self._cpu_sample = (now, cpu)
+            for level_index, (max_usage, level) in enumerate(LEVELS):
+                if self.cpu_usage <= max_usage:
+                    break
+            if level != self.level:
+                log.debug(
+                    "compression level %s (cpu usage %.2f)", level, self.cpu_usage
+                )
+                self.level = level
+                self._level_index = level_index
+        if congested and self._level_index:
+            self.congested_count += 1
+            return LEVELS[self._level_index - 1][1]
+        return self.level
+
+    def _skip(self, stats: CompressionStats, size: int) -> None:
+        """Count a payload which was not compressed.
+
+        Args:
+            stats: Stats for the reason it was skipped.
+            size: Size of the payload.
+        """
+        stats.count += 1
+        stats.bytes_in += size
+        stats.bytes_out += size
+
+    def should_compress(self, packet: Packet) -> bool:
+        """Decide if a packet should be compressed.
+
+        Args:
+            packet: A packet to be sent.
+
+        Returns:
+            `True` if the packet should be compressed.
+        """
+        packet_type = packet.type
+        if packet_type not in COMPRESSIBLE:
+            return False
+
+        route_key: str = packet[1]
+        data: bytes = packet[2]
+        size = len(data)
+        if size < self.min_size:
+            self._skip(self.skipped_small, size)
+            return False
+
+        if packet_type == PacketType.BINARY_ENCODED_MESSAGE and is_incompressible(
+            data, self.max_ratio
+        ):
+            self._skip(self.skipped_incompressible, size)
+            return False
+
+        if self._route_ratios.get(route_key, 0.0) > self.max_ratio:
+            skips = self._route_skips.get(route_key, 0) + 1
+            if skips < SAMPLE_RATE:
+                self._route_skips[route_key] = skips
+                self._skip(self.skipped_ratio, size)
+                return False
+            self._route_skips[route_key] = 0
+        return True
+
+    async def compress(self, packet: Packet, congested: bool = False) -> Packet:
+        """Compress a packet, if the policy decides it is worthwhile.
+
+        Large envelopes are compressed in a thread (zlib releases the GIL), so that
+        the event loop is free to handle other sessions.
+
+        Args:
+            packet: A packet to be sent.
+            congested: The connection is congested.
+
+        Returns:
+            Either the original packet, or a `Compressed` packet.
+        """
+        if not self.should_compress(packet):
+            return packet
+        envelope = msgpack.packb(packet, use_bin_type=True)
+        level = self.update_level(congested)
+        if len(envelope) >= self.offload_size:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    MAX_THREADS, thread_name_prefix="textual-web-compression"
+                )
+            (
+                compressed_envelope,
+                cpu_time,
+            ) = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _compress, envelope, level
+            )
+            stats = self.compressed_offloaded
+        else:
+            compressed_envelope, cpu_time = _compress(envelope, level)
+            stats = self.compressed
+        return self._record(packet, envelope, compressed_envelope, cpu_time, stats)
+
+    def _record(
+        self,
+        packet: Packet,
+        envelope: bytes,
+        compressed_envelope: bytes,
+        cpu_time: float,
+        stats: CompressionStats,
+    ) -> Packet:
+        """Record the result of compressing a packet.
+
+        Args:
+            packet: Original packet.
+            envelope: Packed envelope.
+            compressed_envelope: Compressed envelope.
+            cpu_time: CPU time spent compressing.
+            stats: Stats to update.
+
+        Returns:
+            A `Compressed` packet, or the original packet if compression didn't save bytes.
+        """
+        stats.cpu_time += cpu_time
+        stats.count += 1
+        stats.bytes_in += len(envelope)
+        ratio = len(compressed_envelope) / len(envelope)
+        route_key: str = packet[1]
+        route_ratio = self._route_ratios.get(route_key)
+        self._route_ratios[route_key] = (
+            ratio
+            if route_ratio is None
+            else route_ratio + (ratio - route_ratio) * RATIO_SMOOTHING
+        )
+        if ratio >= 1.0:
+            stats.bytes_out += len(envelope)
+            return packet
+        stats.bytes_out += len(compressed_envelope)
+        return Compressed(ENCODING, compressed_envelope)
+
+
+def _compress(envelope: bytes, level: int) -> tuple[bytes, float]:
+    """Compress an envelope, and measure the CPU time of the calling thread.
+
+    Args:
+        envelope: Packed envelope.
+        level: Compression level.
+
+    Returns:
+        A tuple of the compressed envelope, and the CPU time in seconds.
+    """
+    start_time = thread_time()
+    compressed_envelope = zlib.compress(envelope, level)
+    return compressed_envelope, thread_time() - start_time
+
+
+def decompress(packet: Compressed) -> bytes:
+    """Decompress the envelope in a compressed packet.
+
+    Args:
+        packet: A compressed packet.
+
+    Raises:
+        ValueError: If the encoding is unknown.
+
+    Returns:
+        The packed envelope.
+    """
+    if packet.encoding != ENCODING:
+        raise ValueError(f"Unknown encoding {packet.encoding!r}")
+    return zlib.decompress(packet.data)
@@ -28,6 +28,8 @@ class App(BaseModel):
     color: str = ""
     command: ExpandVarsStr = ""
     terminal: bool = False
+    compression_dictionary: ExpandVarsStr = ""
+    weight: int = Field(default=1, ge=1)
 
 
 class Config(BaseModel):
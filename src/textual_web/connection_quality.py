@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+from collections import deque
+from itertools import count
+import logging
+from time import monotonic
+
+log = logging.getLogger("textual-web")
+
+PROBE_INTERVAL = 1.0
+"""Time (in seconds) between websocket pings sent to measure the round trip time."""
+DEAD_TIMEOUT = 5.0
+"""Minimum time (in seconds) without a pong or any other message, before the peer is considered dead."""
+STALL_TIME = 1.0
+"""Minimum time (in seconds) a ping may be unanswered, before it is counted as a stall."""
+MAX_PROBES = 16
+"""Maximum number of unanswered pings to track."""
+RTT_SAMPLES = 256
+"""Number of round trip times kept, to calculate percentiles."""
+SEND_BUFFER_SAMPLES = 10
+"""Number of send buffer samples kept, to calculate the rate it is growing."""
+
+RTT_GAIN = 1 / 8
+"""Weight of a new sample in the smoothed RTT (as TCP, RFC 6298)."""
+RTT_VARIANCE_GAIN = 1 / 4
+"""Weight of a new sample in the RTT variation (as TCP, RFC 6298)."""
+JITTER_GAIN = 1 / 16
+"""Weight of a new sample in the inter-arrival jitter (as RTP, RFC 3550)."""
+
+
+def get_percentile(samples: list[float], percentile: float) -> float:
+    """Get a percentile of sorted samples.
+
+    Args:
+        samples: Samples, in ascending order.
+        percentile: Percentile, between 0 and 1.
+
+    Returns:
+        The sample at the percentile, or 0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+
+class RouteQuality:
+    """Quality of a route, measured from the `RoutePing` packets sent by the server."""
+
+    def __init__(self) -> None:
+        self.ping_count = 0
+        """Number of RoutePing packets received."""
+        self.interval = 0.0
+        """Smoothed time (in seconds) between RoutePing packets."""
+        self.jitter = 0.0
+        """Smoothed variation (in seconds) of the time between RoutePing packets."""
+        self.stall_count = 0
+        """Number of times a RoutePing arrived late (more than twice the usual interval)."""
+        self.send_buffer = 0
+        """Bytes of session data waiting to be sent, at the last sample."""
+        self.max_send_buffer = 0
+        """Maximum bytes of session data waiting to be sent."""
+        self._last_ping_time: float | None = None
+
+    def on_ping(self, now: float) -> None:
+        """Called when a RoutePing is received.
+
+        Args:
+            now: Time the ping was received.
+        """
+        self.ping_count += 1
+        last_ping_time = self._last_ping_time
+        self._last_ping_time = now
+        if last_ping_time is None:
+            return
+        interval = now - last_ping_time
+        if self.ping_count == 2:
+            self.interval = interval
+            return
+        if interval > max(STALL_TIME, self.interval * 2):
+            self.stall_count += 1
+        self.jitter += (abs(interval - self.interval) - self.jitter) * JITTER_GAIN
+        self.interval += (interval - self.interval) * RTT_GAIN
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get route quality metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "pings": self.ping_count,
+            "interval": self.interval * 1000,
+            "jitter": self.jitter * 1000,
+            "stalls": self.stall_count,
+            "send_buffer": self.send_buffer,
+            "max_send_buffer": self.max_send_buffer,
+        }
+
+
+class ConnectionQuality:
+    """Measures the quality of a websocket connection.
+
+    The connection sends a websocket ping every PROBE_INTERVAL, with a unique payload.
+    The pong gives a round trip time, which is smoothed (as TCP does) and kept to
+    calculate percentiles. A ping which isn't answered promptly is counted as a stall,
+    and if the peer sends nothing at all for long enough, it is considered dead (which is
+    detected much sooner than by the websocket heartbeat).
+
+    Values are in seconds, and reported in milliseconds by `get_metrics`.
+    """
+
+    def __init__(self) -> None:
+        self.rtt: float | None = None
+        """Smoothed round trip time, or `None` if not yet measured."""
+        self.rtt_variance = 0.0
+        """Smoothed variation of the round trip time (i.e. jitter)."""
+        self.rtt_samples: deque[float] = deque(maxlen=RTT_SAMPLES)
+        """Recent round trip times."""
+        self.probe_count = 0
+        """Number of pings sent."""
+        self.pong_count = 0
+        """Number of pongs received."""
+        self.stall_count = 0
+        """Number of pings which weren't answered within the stall time."""
+        self.dead_count = 0
+        """Number of times the peer stopped responding."""
+        self.send_buffer = 0
+        """Bytes waiting to be sent, at the last sample."""
+        self.max_send_buffer = 0
+        """Maximum bytes waiting to be sent."""
+        self.routes: dict[str, RouteQuality] = {}
+        """Quality of each route which the server pings."""
+        self._probe_ids = count()
+        self._probes: dict[bytes, float] = {}
+        self._unanswered_time: float | None = None
+        self._stalled = False
+        self._last_receive_time = monotonic()
+        self._send_buffer_samples: deque[tuple[float, int]] = deque(
+            maxlen=SEND_BUFFER_SAMPLES
+        )
+
+    @property
+    def stall_time(self) -> float:
+        """Time a ping may be unanswered, before it is counted as a stall."""
+        if self.rtt is None:
+            return STALL_TIME
+        return max(STALL_TIME, 2 * (self.rtt + 4 * self.rtt_variance))
+
+    @property
+    def dead_timeout(self) -> float:
+        """Time without any message from the peer, before it is considered dead."""
+        return max(DEAD_TIMEOUT, 2 * self.stall_time)
+
+    @property
+    def send_buffer_growth(self) -> float:
+        """Rate (in bytes per second) the send buffer has grown over recent samples."""
+        samples = self._send_buffer_samples
+        if len(samples) < 2:
+            return 0.0
+        (first_time, first_size), (last_time, last_size) = samples[0], samples[-1]
+        if last_time <= first_time:
+            return 0.0
+        return (last_size - first_size) / (last_time - first_time)
+
+    @property
+    def congested(self) -> bool:
+        """Is data being written faster than the connection can send it?
+
+        The compression policy uses a higher level while the connection is congested.
+        """
+        return self._stalled or self.send_buffer_growth > 0
+
+    def reset(self) -> None:
+        """Reset for a new websocket, keeping the measurements."""
+        self._probes.clear()
+        self._unanswered_time = None
+        self._stalled = False
+        self._last_receive_time = monotonic()
+        self._send_buffer_samples.clear()
+
+    def on_receive(self) -> None:
+        """Called when any message is received from the peer."""
+        self._last_receive_time = monotonic()
+
+    def create_probe(self) -> bytes:
+        """Create the payload of a ping, and record the time it is sent.
+
+        Returns:
+            Ping payload.
+        """
+        probes = self._probes
+        if len(probes) >= MAX_PROBES:
+            del probes[next(iter(probes))]
+        probe = b"tw%d" % next(self._probe_ids)
+        probes[probe] = sent_time = monotonic()
+        if self._unanswered_time is None:
+            self._unanswered_time = sent_time
+        self.probe_count += 1
+        return probe
+
+    def on_pong(self, data: bytes) -> None:
+        """Called when a pong is received.
+
+        Args:
+            data: Pong payload.
+        """
+        self._last_receive_time = now = monotonic()
+        sent_time = self._probes.pop(data, None)
+        if sent_time is None:
+            # A pong to a heartbeat ping
+            return
+        # Pongs arrive in order, so earlier pings won't be answered
+        probes = self._probes
+        while probes and next(iter(probes.values())) < sent_time:
+            del probes[next(iter(probes))]
+        self._unanswered_time = next(iter(probes.values())) if probes else None
+        self._stalled = False
+        self.pong_count += 1
+        rtt = now - sent_time
+        self.rtt_samples.append(rtt)
+        if self.rtt is None:
+            self.rtt = rtt
+            self.rtt_variance = rtt / 2
+        else:
+            self.rtt_variance += (abs(self.rtt - rtt) - self.rtt_variance) * (
+                RTT_VARIANCE_GAIN
+            )
+            self.rtt += (rtt - self.rtt) * RTT_GAIN
+
+    def get_route(self, route_key: str) -> RouteQuality:
+        """Get the quality of a route.
+
+        Args:
+            route_key: Route key.
+
+        Returns:
+            Route quality.
+        """
+        route = self.routes.get(route_key)
+        if route is None:
+            route = self.routes[route_key] = RouteQuality()
+        return route
+
+    def on_route_ping(self, route_key: str) -> None:
+        """Called when the server pings a route.
+
+        Args:
+            route_key: Route key.
+        """
+        self.get_route(route_key).on_ping(monotonic())
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard the quality of a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self.routes.pop(route_key, None)
+
+    def sample_send_buffer(self, route_sizes: dict[str, int]) -> None:
+        """Record the bytes waiting to be sent.
+
+        Args:
+            route_sizes: Bytes of session data waiting to be sent, per route.
+        """
+        for route_key, route_size in route_sizes.items():
+            route = self.get_route(route_key)
+            route.send_buffer = route_size
+            route.max_send_buffer = max(route.max_send_buffer, route_size)
+        size = sum(route_sizes.values())
+        self.send_buffer = size
+        self.max_send_buffer = max(self.max_send_buffer, size)
+        self._send_buffer_samples.append((monotonic(), size))
+
+    def check(self) -> bool:
+        """Check for stalls, and if the peer is dead.
+
+        Returns:
+            `True` if the peer has stopped responding.
+        """
+        if self._unanswered_time is None:
+            return False
+        now = monotonic()
+        # Time since the oldest ping which hasn't been answered
+        unanswered = now - self._unanswered_time
+        if unanswered > self.stall_time and not self._stalled:
+            self._stalled = True
+            self.stall_count += 1
+            log.debug("Ping unanswered after %.0fms", unanswered * 1000)
+        if (
+            unanswered > self.dead_timeout
+            and now - self._last_receive_time > self.dead_timeout
+        ):
+            self.dead_count += 1
+            return True
+        return False
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get connection quality metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        samples = sorted(self.rtt_samples)
+        return {
+            "rtt": None if self.rtt is None else self.rtt * 1000,
+            "rtt_p50": get_percentile(samples, 0.5) * 1000,
+            "rtt_p90": get_percentile(samples, 0.9) * 1000,
+            "rtt_p99": get_percentile(samples, 0.99) * 1000,
+            "jitter": self.rtt_variance * 1000,
+            "probes": self.probe_count,
+            "pongs": self.pong_count,
+            "stalls": self.stall_count,
+            "dead": self.dead_count,
+            "send_buffer": self.send_buffer,
+            "max_send_buffer": self.max_send_buffer,
+            "send_buffer_growth": self.send_buffer_growth,
+            "congested": self.congested,
+            "routes": {
+                route_key: route.get_metrics()
+                for route_key, route in self.routes.items()
+            },
+        }
@@ -51,3 +51,33 @@ ENVIRONMENT: Final[str] = get_environ("GANGLION_ENVIRONMENT", "prod")
 """Select alternative environment."""
 
 API_KEY: Final[str] = get_environ("GANGLION_API_KEY", "")
+
+COMPRESSION: Final[str] = get_environ("GANGLION_COMPRESSION", "websocket")
+"""Compression of packets sent to Ganglion; "websocket" (permessage-deflate),
+"adaptive" (per packet, used if the server accepts the "compression" feature), or "none"."""
+
+RECORD_DIR: Final[str] = get_environ("GANGLION_RECORD_DIR", "")
+"""Directory to record session data, for training compression dictionaries."""
+
+STRICT_PACKETS: Final = get_environ_bool("GANGLION_STRICT_PACKETS")
+"""Validate the type of every attribute in packets received from Ganglion."""
+
+CONNECTIONS: Final = get_environ_int("GANGLION_CONNECTIONS", 1)
+"""Number of websocket connections to Ganglion (more than 1 requires server support)."""
+
+STANDBY: Final = get_environ_bool("GANGLION_STANDBY")
+"""Keep a standby connection to Ganglion, to switch to if a connection drops (requires server support)."""
+
+URL: Final[str] = get_environ("GANGLION_URL", "")
+"""Websocket URL of the Ganglion server, to override the environment's URL. May be a
+`unix://` path, for a server on the same host."""
+
+ENDPOINTS: Final[str] = get_environ("GANGLION_ENDPOINTS", "")
+"""Comma separated websocket URLs of alternative Ganglion endpoints, selected by latency."""
+
+WEB_HOST: Final[str] = get_environ("GANGLION_WEB_HOST", "")
+"""Address the web interface listens on. Defaults to all interfaces, or to the loopback
+interface in direct-serve mode without an API key."""
+
+WEB_PORT: Final = get_environ_int("GANGLION_WEB_PORT", 8080)
+"""Port the web interface listens on."""
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from . import packets
+from .ganglion_connection import BATCH_PROTOCOL
+from .packet_decoder import PacketDecoder, PacketError
+from .packet_dispatcher import PacketDispatcher
+from .packet_writer import PacketWriter
+from .packets import Packet, PacketType
+from .types import RouteKey, SessionID
+
+if TYPE_CHECKING:
+    from .ganglion_client import GanglionClient
+
+log = logging.getLogger("textual-web")
+
+REJECTED = {
+    PacketType.RECONNECT,
+    PacketType.ACCEPT_COMPRESSION_DICTIONARY,
+    PacketType.ORPHANED_SESSIONS,
+    PacketType.COMPRESSED,
+    PacketType.ACCEPT_FEATURES,
+    PacketType.COMPACT_SESSION_DATA,
+}
+"""Packets sent by a Ganglion server, which a direct peer may not send."""
+
+
+class DirectConnection:
+    """A websocket from a browser, which speaks the Ganglion protocol without a Ganglion server.
+
+    The peer takes the place of the Ganglion server; it opens sessions, and sends input
+    to them. Sessions opened by a peer belong to it, so a peer may only send packets for
+    its own routes, and its sessions are closed when the websocket closes.
+
+    Has the same interface as a `GanglionConnection`, as far as the client is concerned.
+    """
+
+    is_primary = False
+
+    def __init__(
+        self, client: GanglionClient, websocket: web.WebSocketResponse, remote: str
+    ) -> None:
+        """
+        Args:
+            client: The client which owns the sessions.
+            websocket: A prepared websocket.
+            remote: Address of the peer.
+        """
+        self.client = client
+        self.websocket = websocket
+        self.remote = remote
+        self.writer = PacketWriter()
+        # The peer is untrusted, so every packet is validated
+        self.decoder = PacketDecoder(strict=True)
+        self.dispatcher = PacketDispatcher(
+            self.dispatch_packet, on_stuck_route=self.close_route
+        )
+        self.route_keys: set[RouteKey] = set()
+        """Routes opened by the peer."""
+        self.reject_count = 0
+        """Number of packets rejected."""
+
+    def __repr__(self) -> str:
+        return f"<DirectConnection {self.remote}>"
+
+    @property
+    def connected(self) -> bool:
+        """Is the websocket open?"""
+        return self.writer.connected
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get connection metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "connected": self.connected,
+            "routes": len(self.route_keys),
+            "rejected": self.reject_count,
+            "writer": self.writer.get_metrics(),
+            "decoder": self.decoder.get_metrics(),
+            "dispatcher": self.dispatcher.get_metrics(),
+        }
+
+    async def send(self, packet: Packet, wait: bool = False) -> bool:
+        """Send a packet to the peer.
+
+        Args:
+            packet: Packet to send.
+            wait: Wait for the packet to be written to the websocket.
+
+        Returns:
+            bool: `True` if the packet was queued or sent, otherwise `False`.
+        """
+        return await self.writer.write(packet, wait=wait)
+
+    async def bind_route(self, route_key: str, handle: int) -> None:
+        """Route handles aren't used by direct peers.
+
+        Args:
+            route_key: Route key.
+            handle: Route handle.
+        """
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard state held for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self.writer.forget_route(route_key)
+        self.dispatcher.forget_route(route_key)
+        self.route_keys.discard(RouteKey(route_key))
+
+    async def close_route(self, route_key: str) -> None:
+        """Kill the session on a route which isn't handling its packets.
+
+        Args:
+            route_key: Route key.
+        """
+        session_process = self.client.session_manager.get_session_by_route_key(
+            RouteKey(route_key)
+        )
+        if session_process is not None:
+            await session_process.kill()
+
+    async def run(self) -> None:
+        """Run until the websocket closes, then close the peer's sessions."""
+        websocket = self.websocket
+        self.writer.start(
+            websocket, batch_frames=websocket.ws_protocol == BATCH_PROTOCOL
+        )
+        try:
+            await self.client.declare_direct_apps(self)
+            await self.run_websocket()
+        finally:
+            await self.writer.stop()
+            # Routes are forgotten as their sessions close
+            session_manager = self.client.session_manager
+            for route_key in list(self.route_keys):
+                session_id = session_manager.routes.get(route_key)
+                if session_id is None:
+                    self.client.forget_route(route_key)
+                else:
+                    await session_manager.close_session(session_id)
+            await self.dispatcher.close()
+
+    async def run_websocket(self) -> None:
+        """Read packets from the websocket."""
+        decode = self.decoder.decode
+        put = self.dispatcher.put
+        BINARY = web.WSMsgType.BINARY
+        try:
+            async for message in self.websocket:
+                if message.type == BINARY:
+                    try:
+                        frame_packets = decode(message.data)
+                    except PacketError as error:
+                        log.warning("Rejected frame from %r; %s", self, error)
+                        self.reject_count += 1
+                        continue
+                    for packet in frame_packets:
+                        log.debug("<RECV> %r", packet)
+                        await put(packet)
+                elif message.type == web.WSMsgType.ERROR:
+                    break
+        except ConnectionResetError:
+            log.info("connection reset")
+
+    def is_permitted(self, packet: Packet) -> bool:
+        """Check if the peer may send a packet.
+
+        Args:
+            packet: A packet received from the peer.
+
+        Returns:
+            `True` if the packet may be dispatched.
+        """
+        if packet.sender == "client" or packet.type in REJECTED:
+            return False
+        session_manager = self.client.session_manager
+        if packet.type == PacketType.SESSION_OPEN:
+            # Don't permit a peer to take over an existing session
+            return (
+                RouteKey(packet.route_key) not in session_manager.routes
+                and SessionID(packet.session_id) not in session_manager.sessions
+            )
+        route_key: str | None = getattr(packet, "route_key", None)
+        if route_key is not None and route_key not in self.route_keys:
+            return False
+        session_id: str | None = getattr(packet, "session_id", None)
+        if session_id is not None:
+            return (
+                session_manager.routes.get_key(SessionID(session_id)) in self.route_keys
+            )
+        return True
+
+    async def dispatch_packet(self, packet: Packet) -> None:
+        """Dispatch a packet received from the peer, in order for each route.
+
+        Args:
+            packet: Packet to dispatch.
+        """
+        if not self.is_permitted(packet):
+            log.warning("Rejected %r from %r", packet, self)
+            self.reject_count += 1
+            if (
+                packet.type == PacketType.SESSION_OPEN
+                and packet.route_key not in self.route_keys
+            ):
+                self.dispatcher.forget_route(packet.route_key)
+            return
+        packet_type = packet.type
+        if packet_type == PacketType.PING:
+            await self.send(packets.Pong(packet.data))
+        elif packet_type == PacketType.SESSION_OPEN:
+            route_key = RouteKey(packet.route_key)
+            self.route_keys.add(route_key)
+            self.client.add_direct_route(route_key, self)
+            await self.client.dispatch_packet(packet)
+            if route_key not in self.client.session_manager.routes:
+                # The session couldn't be created
+                self.client.forget_route(route_key)
+        else:
+            handler = self.client.get_handler(packet)
+            if handler is not None:
+                await handler(packet)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic
+
+import aiohttp
+
+from .transport import HTTPSessions, save_tls_session
+
+log = logging.getLogger("textual-web")
+
+PROBE_TIMEOUT = 3.0
+"""Time (in seconds) to wait for an endpoint to answer a probe."""
+PROBE_PINGS = 3
+"""Number of pings sent to each endpoint (the fastest pong is the RTT)."""
+PROBE_INTERVAL = 300.0
+"""Time (in seconds) between re-evaluating the endpoints."""
+SWITCH_MARGIN = 0.8
+"""An endpoint must have an RTT below this fraction of the current endpoint's RTT, to switch to it."""
+
+
+class EndpointSelector:
+    """Selects a Ganglion endpoint by latency.
+
+    Each endpoint is probed with a websocket, and the round trip time of a ping / pong is
+    measured. The client connects to the endpoint with the lowest RTT, and if it can't
+    connect, fails over to the next fastest endpoint.
+    """
+
+    def __init__(self, urls: list[str]) -> None:
+        """
+        Args:
+            urls: Websocket URLs of the candidate endpoints, in order of preference.
+        """
+        assert urls, "at least one endpoint is required"
+        self.urls = list(dict.fromkeys(urls))
+        self.rtts: dict[str, float | None] = {}
+        """Most recent RTT (in seconds) of each endpoint, or `None` if unreachable."""
+        self._index = 0
+        self.probe_count = 0
+        """Number of times the endpoints were probed."""
+        self.switch_count = 0
+        """Number of times the selected endpoint changed."""
+
+    @property
+    def url(self) -> str:
+        """The selected endpoint."""
+        return self.urls[self._index]
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get endpoint metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "url": self.url,
+            "rtts": {
+                url: None if rtt is None else rtt * 1000
+                for url, rtt in self.rtts.items()
+            },
+            "probes": self.probe_count,
+            "switches": self.switch_count,
+        }
+
+    def failed(self, url: str) -> None:
+        """Called when an endpoint can't be connected to, to fail over to the next.
+
+        Args:
+            url: The endpoint which failed.
+        """
+        if url != self.url or len(self.urls) == 1:
+            return
+        self._index = (self._index + 1) % len(self.urls)
+        self.switch_count += 1
+        log.info("Failing over to Ganglion endpoint %s", self.url)
+
+    @classmethod
+    async def measure_rtt(
+        cls, session: aiohttp.ClientSession, url: str, headers: dict[str, str]
+    ) -> float:
+        """Measure the round trip time to an endpoint.
+
+        Args:
+            session: HTTP session.
+            url: Websocket URL.
+            headers: Headers for the websocket handshake.
+
+        Returns:
+            Fastest ping / pong time (in seconds).
+        """
+        start_time = monotonic()
+        async with session.ws_connect(
+            url, headers=headers, autoping=False
+        ) as websocket:
+            # If the server doesn't answer pings, the handshake time is an upper bound
+            handshake_time = monotonic() - start_time
+            # Connecting to the selected endpoint may then resume the TLS session
+            save_tls_session(websocket)
+            rtts: list[float] = []
+            for ping_index in range(PROBE_PINGS):
+                ping_time = monotonic()
+                await websocket.ping(b"%d" % ping_index)
+                message = await websocket.receive()
+                while message.type not in (
+                    aiohttp.WSMsgType.PONG,
+                    aiohttp.WSMsgType.CLOSE,
+                    aiohttp.WSMsgType.CLOSED,
+                    aiohttp.WSMsgType.ERROR,
+                ):
+                    message = await websocket.receive()
+                if message.type != aiohttp.WSMsgType.PONG:
+                    break
+                rtts.append(monotonic() - ping_time)
+        return min(rtts) if rtts else handshake_time
+
+    async def probe(self, sessions: HTTPSessions, headers: dict[str, str]) -> bool:
+        """Measure the RTT of every endpoint, and order them from fastest to slowest.
+
+        Args:
+            sessions: HTTP sessions.
+            headers: Headers for the websocket handshake.
+
+        Returns:
+            `True` if the selected endpoint changed.
+        """
+
+        async def probe_url(url: str) -> float | None:
+            session, request_url = sessions.get(url)
+            try:
+                return await asyncio.wait_for(
+                    self.measure_rtt(session, request_url, headers), PROBE_TIMEOUT
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                log.debug("Unable to probe %s; %s", url, error)
+                return None
+
+        urls = self.urls
+        rtts = await asyncio.gather(*[probe_url(url) for url in urls])
+        self.probe_count += 1
+        self.rtts = dict(zip(urls, rtts))
+        current_url = self.url
+        current_rtt = self.rtts[current_url]
+
+        def by_rtt(url: str) -> tuple[bool, float]:
+            """Sort key to order endpoints by RTT, with unreachable endpoints last."""
+            rtt = self.rtts[url]
+            return (rtt is None, rtt or 0.0)
+
+        # Fail over down the list in order of RTT
+        self.urls = sorted(urls, key=by_rtt)
+        fastest_url = self.urls[0]
+        fastest_rtt = self.rtts[fastest_url]
+        log.info(
+            "Ganglion endpoint RTTs; %s",
+            ", ".join(
+                f"{url} {'unreachable' if rtt is None else f'{rtt * 1000:.1f}ms'}"
+                for url, rtt in self.rtts.items()
+            ),
+        )
+        if fastest_rtt is not None and (
+            current_rtt is None or fastest_rtt < current_rtt * SWITCH_MARGIN
+        ):
+            self._index = self.urls.index(fastest_url)
+        else:
+            self._index = self.urls.index(current_url)
+        if self.url != current_url:
+            self.switch_count += 1
+            log.info("Selected Ganglion endpoint %s", self.url)
+            return True
+        return False
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+
+from . import constants
 
 
 @dataclass
@@ -12,7 +14,14 @@ class Environment:
     api_url: str
     """Endpoint for API."""
     url: str
-    """Websocket endpoint for client."""
+    """Websocket endpoint for client, or a `unix://` path to a socket on the same host."""
+    urls: list[str] = field(default_factory=list)
+    """Alternative websocket endpoints (e.g. in other regions), selected by latency."""
+
+    @property
+    def endpoints(self) -> list[str]:
+        """All candidate websocket endpoints, in order of preference."""
+        return [self.url, *[url for url in self.urls if url != self.url]]
 
 
 ENVIRONMENTS = {
@@ -45,4 +54,9 @@ def get_environment(environment: str) -> Environment:
         run_environment = ENVIRONMENTS[environment]
     except KeyError:
         raise RuntimeError(f"Invalid environment {environment!r}")
+    if constants.URL:
+        run_environment = replace(run_environment, url=constants.URL)
+    if constants.ENDPOINTS:
+        urls = [url.strip() for url in constants.ENDPOINTS.split(",") if url.strip()]
+        run_environment = replace(run_environment, urls=run_environment.urls + urls)
     return run_environment
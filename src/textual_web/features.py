@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Iterable
+
+log = logging.getLogger("textual-web")
+
+BATCH = "batch"
+"""Multi-envelope frames."""
+COMPRESSION = "compression"
+"""Packets compressed by the client, in `Compressed` packets."""
+COMPRESSION_DICTIONARIES = "compression_dictionaries"
+"""Session data compressed with trained dictionaries, declared with `CompressionDictionary`."""
+SESSION_INVENTORY = "session_inventory"
+"""Sessions reconciled after reconnecting, with `SessionInventory` and `OrphanedSessions`."""
+REPLAY = "replay"
+"""Session data buffered while disconnected is sent after reconnecting (otherwise the
+sessions are repainted)."""
+ROUTE_HANDLES = "route_handles"
+"""Session data addressed by a small integer handle (bound with `BindRoute`), in place of
+the route key. Other packets for a route always carry the route key."""
+
+FEATURES_PROTOCOL = "ganglion.features"
+"""Websocket subprotocol selected by a server which will accept features."""
+ACCEPT_TIMEOUT = 5.0
+"""Maximum time (in seconds) to wait for the server to accept features."""
+
+
+class Features:
+    """The optional protocol features used on a websocket.
+
+    The client declares the features it supports (with `DeclareFeatures`), and the server
+    accepts the subset to use (with `AcceptFeatures`). Until the features are accepted,
+    or if the server doesn't negotiate features, the fallback features are used.
+    """
+
+    def __init__(
+        self, declared: Iterable[str], fallback: Iterable[str], negotiate: bool
+    ) -> None:
+        """
+        Args:
+            declared: Features supported by the client.
+            fallback: Features used if the server doesn't accept features.
+            negotiate: The server will accept features.
+        """
+        self.declared = frozenset(declared)
+        self.fallback = frozenset(fallback)
+        self.negotiate = negotiate
+        self.accepted: frozenset[str] | None = None
+        """Features accepted by the server, or `None` if not accepted."""
+        self._accepted_event = asyncio.Event()
+
+    def __repr__(self) -> str:
+        return f"<Features {sorted(self.active)!r}>"
+
+    def __contains__(self, feature: str) -> bool:
+        return feature in self.active
+
+    @property
+    def active(self) -> frozenset[str]:
+        """The features in use."""
+        return self.fallback if self.accepted is None else self.accepted
+
+    def accept(self, features: list) -> None:
+        """Called when the server accepts features.
+
+        Args:
+            features: Names of the accepted features.
+        """
+        if self.accepted is not None:
+            log.warning("Features already accepted; ignoring %r", features)
+            return
+        names = {feature for feature in features if isinstance(feature, str)}
+        if not names <= self.declared:
+            log.warning(
+                "Ignoring features which weren't declared: %s",
+                ", ".join(sorted(names - self.declared)),
+            )
+        self.accepted = self.declared & names
+        self._accepted_event.set()
+
+    async def wait(self, timeout: float = ACCEPT_TIMEOUT) -> bool:
+        """Wait for the server to accept features, if it negotiates features.
+
+        Args:
+            timeout: Maximum time (in seconds) to wait.
+
+        Returns:
+            `True` if the server accepted features, or `False` if the fallback features
+                are in use.
+        """
+        if self.negotiate and self.accepted is None:
+            try:
+                await asyncio.wait_for(self._accepted_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.accepted is not None
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get feature metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "negotiated": self.accepted is not None,
+            "features": sorted(self.active),
+        }
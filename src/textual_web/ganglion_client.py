@@ -3,24 +3,25 @@ from __future__ import annotations
 import asyncio
 import logging
 import signal
-from functools import partial
 from pathlib import Path
 import platform
-from typing import TYPE_CHECKING, Union, cast
+from typing import TYPE_CHECKING, cast
 
-import aiohttp
-import msgpack
-from aiohttp.client_exceptions import WSServerHandshakeError
+from aiohttp import web
 
 from . import constants, packets
+from .compression import CompressionPolicy
+from .direct_connection import DirectConnection
+from .endpoints import PROBE_INTERVAL, EndpointSelector
 from .environment import Environment
 from .exit_poller import ExitPoller
+from .features import COMPRESSION_DICTIONARIES, ROUTE_HANDLES, SESSION_INVENTORY
+from .ganglion_connection import BATCH_PROTOCOL, GanglionConnection, get_shard
 from .identity import generate
+from .loop_monitor import LoopMonitor
 from .packets import (
     Blur,
     Focus,
-    PACKET_MAP,
-    Handlers,
     NotifyTerminalSize,
     OpenUrl,
     Packet,
@@ -29,13 +30,23 @@ from .packets import (
     SessionClose,
     SessionData,
 )
+from .packet_decoder import PacketDataType, PacketDecoder, PacketError, decode_envelope
+from .packet_handlers import PacketHandlers
+from .packet_writer import split_fragments
 from .poller import Poller
-from .retry import Retry
+from .retry import CONNECT_BURST, CONNECT_RATE, TokenBucket
 from .session import SessionConnector
 from .session_manager import SessionManager
+from .stream_compression import RECORDING_EXTENSION, SessionRecorder, StreamCompression
+from .transport import HTTPSessions
 from .types import Meta, RouteKey, SessionID
-from .web import run_web_interface
-
+from .web import (
+    DEFAULT_HOST,
+    LOOPBACK_HOST,
+    has_api_key,
+    is_loopback,
+    run_web_interface,
+)
 
 if TYPE_CHECKING:
     from .config import Config
@@ -45,24 +56,40 @@ WINDOWS = platform.system() == "Windows"
 log = logging.getLogger("textual-web")
 
 
-PacketDataType = Union[int, bytes, str, None]
-
-
-class PacketError(Exception):
-    """A packet error."""
-
-
 class _ClientConnector(SessionConnector):
     def __init__(
-        self, client: GanglionClient, session_id: SessionID, route_key: RouteKey
+        self,
+        client: GanglionClient,
+        session_id: SessionID,
+        route_key: RouteKey,
+        app_slug: str,
     ) -> None:
         self.client = client
         self.session_id = session_id
         self.route_key = route_key
+        self.app_slug = app_slug
+        self._recorder: SessionRecorder | None = None
+        if constants.RECORD_DIR:
+            self._recorder = SessionRecorder(
+                Path(constants.RECORD_DIR)
+                / app_slug
+                / f"{session_id}{RECORDING_EXTENSION}"
+            )
 
     async def on_data(self, data: bytes) -> None:
         """Data received from the process."""
-        await self.client.send(packets.SessionData(self.route_key, data))
+        if self._recorder is not None:
+            self._recorder.record(data)
+        compress = self.client.stream_compression.compress
+        send = self.client.send
+        for fragment in split_fragments(data):
+            compressed_data = compress(self.route_key, self.app_slug, fragment)
+            if compressed_data is None:
+                await send(packets.SessionData(self.route_key, fragment))
+            else:
+                await send(
+                    packets.CompressedSessionData(self.route_key, compressed_data)
+                )
 
     async def on_meta(self, meta: Meta) -> None:
         """On receiving a meta dict from the running process, send it to the Ganglion server."""
@@ -106,10 +133,13 @@ class _ClientConnector(SessionConnector):
 
     async def on_close(self) -> None:
         await self.client.send(packets.SessionClose(self.session_id, self.route_key))
+        self.client.forget_route(self.route_key)
+        if self._recorder is not None:
+            self._recorder.close()
         self.client.session_manager.on_session_end(self.session_id)
 
 
-class GanglionClient(Handlers):
+class GanglionClient(PacketHandlers):
     """Manages a connection to a ganglion server."""
 
     def __init__(
@@ -121,24 +151,54 @@ class GanglionClient(Handlers):
         devtools: bool = False,
         exit_on_idle: int = 0,
         web_interface: bool = False,
+        connections: int = 1,
+        direct: bool = False,
+        web_host: str = "",
+        web_port: int = constants.WEB_PORT,
     ) -> None:
         self.environment = environment
-        self.websocket_url = environment.url
+        self.endpoints = EndpointSelector(environment.endpoints)
         self.exit_on_idle = exit_on_idle
         self.web_interface = web_interface
+        self.direct = direct
+        """Serve sessions to browsers from the web interface, without Ganglion."""
+        self.web_host = web_host
+        """Address the web interface listens on, or empty for the default."""
+        self.web_port = web_port
+        """Port the web interface listens on."""
 
         abs_path = Path(config_path).absolute()
         path = abs_path if abs_path.is_dir() else abs_path.parent
         self.config = config
         self.api_key = api_key
         self._devtools = devtools
-        self._websocket: aiohttp.ClientWebSocketResponse | None = None
         self._poller = Poller()
         self.session_manager = SessionManager(self._poller, path, config.apps)
         self.exit_event = asyncio.Event()
         self._task: asyncio.Task | None = None
         self._exit_poller = ExitPoller(self, exit_on_idle)
         self._connected_event = asyncio.Event()
+        self.compression_policy = CompressionPolicy()
+        self.stream_compression = StreamCompression(path)
+        self._loop_monitor = LoopMonitor()
+        self.pool_id = generate()
+        """Identifies the connections of this client, to the server."""
+        self.connect_bucket = TokenBucket(
+            CONNECT_RATE, max(CONNECT_BURST, 2 * connections)
+        )
+        """Limits the rate of connection attempts, shared by every connection."""
+        self.connections = [
+            GanglionConnection(self, index, connections, standby=constants.STANDBY)
+            for index in range(max(1, connections))
+        ]
+        self.direct_connections: set[DirectConnection] = set()
+        """Websockets from browsers, in direct-serve mode."""
+        self._direct_routes: dict[str, DirectConnection] = {}
+
+    @property
+    def websocket_url(self) -> str:
+        """The websocket URL of the selected Ganglion endpoint."""
+        return self.endpoints.url
 
     @property
     def app_count(self) -> int:
@@ -176,46 +236,44 @@ class GanglionClient(Handlers):
     def decode_envelope(
         cls, packet_envelope: tuple[PacketDataType, ...]
     ) -> Packet | None:
-        """Decode a packet envelope.
-
-        Packet envelopes are a list where the first value is an integer denoting the type.
-        The type is used to look up the appropriate Packet class which is instantiated with
-        the rest of the data.
+        """Decode a packet envelope, and validate its attributes.
 
-        If the envelope contains *more* data than required, then that data is silently dropped.
-        This is to provide an extension mechanism.
+        See [decode_envelope][textual_web.packet_decoder.decode_envelope].
 
         Raises:
-            PacketError: If the packet_envelope is empty.
-            PacketError: If the packet type is not an int.
+            PacketError: If the envelope is invalid.
 
         Returns:
             One of the Packet classes defined in packets.py or None if the packet was of an unknown type.
         """
-        if not packet_envelope:
-            raise PacketError("Packet data is empty")
-
-        packet_data: list[PacketDataType]
-        packet_type, *packet_data = packet_envelope
-        if not isinstance(packet_type, int):
-            raise PacketError(f"Packet id expected int, found {packet_type!r}")
-        packet_class = PACKET_MAP.get(packet_type, None)
-        if packet_class is None:
-            return None
-        try:
-            packet = packet_class.build(*packet_data[: len(packet_class._attributes)])
-        except TypeError as error:
-            raise PacketError(f"Packet failed to validate; {error}")
-        return packet
+        return decode_envelope(packet_envelope)
+
+    @classmethod
+    def decode_frame(cls, frame: list) -> list[Packet]:
+        """Decode the contents of a websocket frame, in strict mode.
+
+        Args:
+            frame: Unpacked frame data.
+
+        Raises:
+            PacketError: If any of the envelopes are invalid.
+
+        Returns:
+            A list of decoded packets, with packets of unknown type removed.
+        """
+        return PacketDecoder(strict=True).decode_frame(frame)
 
     async def run(self) -> None:
         """Run the connection loop."""
 
         try:
             self._exit_poller.start()
+            self._loop_monitor.start()
             await self._run()
         finally:
             self._exit_poller.stop()
+            self._loop_monitor.stop()
+            self.compression_policy.close()
             # Shut down the poller thread
             if not WINDOWS:
                 try:
@@ -247,8 +305,30 @@ class GanglionClient(Handlers):
             self._poller.set_loop(loop)
             self._poller.start()
 
-        if self.web_interface:
-            app = await run_web_interface(self._connected_event)
+        if self.direct:
+            host = self._get_direct_host()
+            if host is None:
+                return
+            app = await run_web_interface(
+                self._connected_event,
+                self.get_metrics,
+                self.handle_direct,
+                host=host,
+                port=self.web_port,
+                api_key=self._get_api_key(),
+            )
+            try:
+                self._task = asyncio.create_task(self.serve_direct())
+            finally:
+                await app.shutdown()
+        elif self.web_interface:
+            app = await run_web_interface(
+                self._connected_event,
+                self.get_metrics,
+                host=self.web_host or DEFAULT_HOST,
+                port=self.web_port,
+                api_key=self._get_api_key(),
+            )
             try:
                 self._task = asyncio.create_task(self.connect())
             finally:
@@ -272,144 +352,335 @@ class GanglionClient(Handlers):
             pass
 
     async def _connect(self) -> None:
-        """Internal connect."""
-        api_key = self.config.account.api_key or self.api_key or None
-        if api_key:
-            headers = {"GANGLIONAPIKEY": api_key}
-        else:
-            headers = {}
-
-        retry = Retry()
+        """Internal connect.
 
-        async for retry_count in retry:
-            self._connected_event.clear()
-            if self.exit_event.is_set():
-                break
+        Runs every connection until cancelled, then closes sessions before the
+        connections, so that the server is notified.
+        """
+        done_event = asyncio.Event()
+        async with HTTPSessions() as http_sessions:
+            probe_task: asyncio.Task | None = None
+            if len(self.endpoints.urls) > 1:
+                await self.endpoints.probe(http_sessions, self._get_probe_headers())
+                probe_task = asyncio.create_task(self._run_probes(http_sessions))
+            tasks = [
+                asyncio.create_task(connection.run(done_event, http_sessions))
+                for connection in self.connections
+            ]
             try:
-                if retry_count == 1:
-                    log.info("connecting to Ganglion")
-                async with aiohttp.ClientSession() as session:
-                    async with session.ws_connect(
-                        self.websocket_url,
-                        headers=headers,
-                        heartbeat=15,  # Sends a regular ping
-                        compress=12,  # Enables websocket compression
-                    ) as websocket:
-                        self._websocket = websocket
-                        retry.success()
-                        await self.post_connect()
-                        try:
-                            await self.run_websocket(websocket, retry)
-                        finally:
-                            self._websocket = None
-                            log.info("Disconnected from Ganglion")
-                if self.exit_event.is_set():
-                    break
+                await asyncio.wait(tasks)
             except asyncio.CancelledError:
+                done_event.set()
+                await self.session_manager.close_all()
+                for connection in self.connections:
+                    await connection.close()
+                await asyncio.wait(tasks)
                 raise
-            except WSServerHandshakeError:
-                if retry_count == 1:
-                    log.warning("Received forbidden response, check your API Key")
-            except Exception as error:
-                if retry_count == 1:
-                    log.warning(
-                        "Unable to connect to Ganglion server. Will reattempt connection soon."
-                    )
-                if constants.DEBUG:
-                    log.error("Unable to connect; %s", error)
-
-    async def run_websocket(
-        self, websocket: aiohttp.ClientWebSocketResponse, retry: Retry
-    ) -> None:
-        """Run the websocket loop.
+            finally:
+                if probe_task is not None:
+                    probe_task.cancel()
 
-        Args:
-            websocket: Websocket.
+    def _get_direct_host(self) -> str | None:
+        """Get the address to listen on, in direct-serve mode.
+
+        Without an API key, anyone who can reach the web interface could open sessions
+        (including terminals), so only the loopback interface is allowed.
+
+        Returns:
+            An address, or `None` if direct-serve mode must not start.
         """
-        unpackb = partial(msgpack.unpackb, use_list=True, raw=False)
-        BINARY = aiohttp.WSMsgType.BINARY
-
-        async def run_messages() -> None:
-            """Read, decode, and dispatch websocket messages."""
-            async for message in websocket:
-                if message.type == BINARY:
-                    try:
-                        envelope = unpackb(message.data)
-                    except Exception:
-                        log.error(f"Unable to decode {message.data!r}")
-                    else:
-                        packet = self.decode_envelope(envelope)
-                        log.debug("<RECV> %r", packet)
-                        if packet is not None:
-                            try:
-                                await self.dispatch_packet(packet)
-                            except Exception:
-                                log.exception("error processing %r", packet)
-
-                elif message.type == aiohttp.WSMsgType.ERROR:
-                    break
+        if self._get_api_key():
+            return self.web_host or DEFAULT_HOST
+        if not self.web_host:
+            log.warning(
+                "Direct-serve mode has no API key; only accepting connections from this host"
+            )
+            return LOOPBACK_HOST
+        if not is_loopback(self.web_host):
+            log.critical(
+                "Direct-serve mode requires an API key to listen on %r", self.web_host
+            )
+            return None
+        return self.web_host
 
+    async def serve_direct(self) -> None:
+        """Serve sessions to browsers which connect to the web interface, until exit."""
+        self._connected_event.set()
         try:
-            await run_messages()
+            await self.exit_event.wait()
         except asyncio.CancelledError:
-            retry.done()
-            await self.session_manager.close_all()
-            await websocket.close(message=b"Close requested")
-            try:
-                await run_messages()
-            except asyncio.CancelledError:
-                pass
-        except ConnectionResetError:
-            log.info("connection reset")
-        except Exception as error:
-            log.exception(str(error))
-
-    async def post_connect(self) -> None:
-        """Called immediately after connecting to the Ganglion server."""
-        # Inform the server about our apps
+            pass
+        for connection in list(self.direct_connections):
+            await connection.websocket.close()
+        await self.session_manager.close_all()
+
+    async def handle_direct(self, request: web.Request) -> web.StreamResponse:
+        """Handle a websocket from a browser, in direct-serve mode.
+
+        If there is an API key, the browser must supply it in a `GANGLIONAPIKEY` header
+        or a `key` query parameter (browsers can't set websocket headers).
+
+        Args:
+            request: The websocket request.
+
+        Returns:
+            A websocket response.
+        """
+        api_key = self._get_api_key()
+        if api_key:
+            if not has_api_key(request, api_key):
+                log.warning("Refused direct connection from %s", request.remote)
+                raise web.HTTPUnauthorized()
+        websocket = web.WebSocketResponse(protocols=(BATCH_PROTOCOL,), heartbeat=15)
+        await websocket.prepare(request)
+        connection = DirectConnection(self, websocket, request.remote or "")
+        log.info("Direct connection from %s", connection.remote)
+        self.direct_connections.add(connection)
         try:
-            apps = [
-                app.model_dump(include={"name", "slug", "color", "terminal"})
-                for app in self.config.apps
-            ]
-            if WINDOWS:
-                filter_apps = [app for app in apps if not app["terminal"]]
-                if filter_apps != apps:
-                    log.warn(
-                        "Sorry, textual-web does not currently support terminals on Windows"
-                    )
-                apps = filter_apps
-
-            await self.send(packets.DeclareApps(apps))
+            await connection.run()
+        finally:
+            self.direct_connections.discard(connection)
+            log.info("Direct connection from %s closed", connection.remote)
+        return websocket
+
+    def add_direct_route(self, route_key: str, connection: DirectConnection) -> None:
+        """Send a route's packets to a browser, rather than to Ganglion.
+
+        Args:
+            route_key: Route key.
+            connection: The browser's connection.
+        """
+        self._direct_routes[route_key] = connection
+
+    def _get_api_key(self) -> str | None:
+        """Get the API key, if there is one.
+
+        Returns:
+            API key or `None`.
+        """
+        return self.config.account.api_key or self.api_key or None
+
+    def _get_probe_headers(self) -> dict[str, str]:
+        """Get the headers for the websocket handshake, when probing endpoints.
+
+        Returns:
+            A dict of headers.
+        """
+        headers = {"GANGLIONPROBE": "1"}
+        api_key = self._get_api_key()
+        if api_key:
+            headers["GANGLIONAPIKEY"] = api_key
+        return headers
+
+    async def _run_probes(self, http_sessions: HTTPSessions) -> None:
+        """Periodically re-evaluate the endpoints.
+
+        If a faster endpoint is found while there are no sessions, the connections switch
+        to it immediately. Otherwise it is used when the connections next reconnect,
+        so that running sessions aren't moved to another endpoint.
+
+        Args:
+            http_sessions: HTTP sessions.
+        """
+        while True:
+            await asyncio.sleep(PROBE_INTERVAL)
+            if not await self.endpoints.probe(http_sessions, self._get_probe_headers()):
+                continue
+            if not self.session_manager.sessions:
+                for connection in self.connections:
+                    await connection.reconnect(use_standby=False)
+
+    def get_connection(
+        self, route_key: str | None
+    ) -> GanglionConnection | DirectConnection:
+        """Get the connection for a route.
+
+        Args:
+            route_key: Route key, or `None` for the primary connection.
+
+        Returns:
+            A connection.
+        """
+        if self._direct_routes and route_key is not None:
+            direct_connection = self._direct_routes.get(route_key)
+            if direct_connection is not None:
+                return direct_connection
+        connections = self.connections
+        if route_key is None or len(connections) == 1:
+            return connections[0]
+        return connections[get_shard(route_key, len(connections))]
+
+    def on_connection_lost(self, connection: GanglionConnection) -> None:
+        """Called when a connection is lost.
+
+        Args:
+            connection: The connection which was lost.
+        """
+        if connection.is_primary:
+            self._connected_event.clear()
+            self.stream_compression.reset()
+        else:
+            for route_key in self.session_manager.routes:
+                if self.get_connection(route_key) is connection:
+                    self.stream_compression.forget_route(route_key)
+
+    async def post_connect(self, connection: GanglionConnection) -> None:
+        """Called immediately after a connection to the Ganglion server becomes active.
+
+        Declares the features the client supports, if the server negotiates features,
+        then uses the features agreed with the server (or the fallback features).
+
+        Args:
+            connection: The connection.
+        """
+        features = connection.features
+        if features.negotiate:
+            await connection.send(packets.DeclareFeatures(sorted(features.declared)))
+        if connection.is_primary:
+            await self.declare_apps()
+        if features.negotiate and not await features.wait():
+            log.warning("Ganglion didn't accept features; continuing without them")
+        if connection.is_primary and COMPRESSION_DICTIONARIES in features:
+            await self.declare_compression_dictionaries()
+        if SESSION_INVENTORY in features:
+            await self.send_session_inventory(connection)
+        if ROUTE_HANDLES in features:
+            await self.bind_routes(connection)
+
+    async def declare_apps(self) -> None:
+        """Inform the server about our apps."""
+        try:
+            await self.send(packets.DeclareApps(self.get_app_declarations()), wait=True)
         finally:
             self._connected_event.set()
 
-    async def send(self, packet: Packet) -> bool:
+    async def declare_compression_dictionaries(self) -> None:
+        """Inform the server about our apps' compression dictionaries."""
+        for declaration in self.stream_compression.get_declarations(self.config.apps):
+            await self.send(declaration)
+
+    def get_app_declarations(self) -> list[dict[str, object]]:
+        """Get the apps to declare to the server.
+
+        Returns:
+            A list of app declarations.
+        """
+        apps = [
+            app.model_dump(include={"name", "slug", "color", "terminal"})
+            for app in self.config.apps
+        ]
+        if WINDOWS:
+            filter_apps = [app for app in apps if not app["terminal"]]
+            if filter_apps != apps:
+                log.warn(
+                    "Sorry, textual-web does not currently support terminals on Windows"
+                )
+            apps = filter_apps
+        return apps
+
+    async def declare_direct_apps(self, connection: DirectConnection) -> None:
+        """Inform a browser connected in direct-serve mode about our apps.
+
+        Args:
+            connection: The browser's connection.
+        """
+        await connection.send(packets.DeclareApps(self.get_app_declarations()))
+
+    async def send_session_inventory(self, connection: GanglionConnection) -> None:
+        """Report the sessions on a connection, so the server can identify orphans.
+
+        Sessions may outlive their routes while disconnected. The server replies with
+        the sessions it has no route for (see `on_orphaned_sessions`).
+
+        Args:
+            connection: The connection.
+        """
+        routes = self.session_manager.routes
+        inventory = [
+            [routes.get(route_key), route_key]
+            for route_key in routes
+            if self.get_connection(route_key) is connection
+        ]
+        if inventory:
+            await connection.send(packets.SessionInventory(inventory))
+
+    async def bind_routes(self, connection: GanglionConnection) -> None:
+        """Bind the routes on a connection to their handles, after connecting.
+
+        Args:
+            connection: The connection.
+        """
+        for route_key, handle in list(self.session_manager.route_handles.items()):
+            if self.get_connection(route_key) is connection:
+                await connection.bind_route(route_key, handle)
+
+    async def send(self, packet: Packet, wait: bool = False) -> bool:
         """Send a packet to the Ganglion server through the websocket.
 
+        Packets for a route are sent on the route's connection, other packets are
+        sent on the primary connection. Packets are written by a single writer task per
+        connection. Unless `wait` is set, this method returns as soon as the packet is queued.
+
         Args:
             packet: Packet to send.
+            wait: Wait for the packet to be written to the websocket.
 
         Returns:
-            bool: `True` if the packet was sent, otherwise `False`.
+            bool: `True` if the packet was queued or sent, otherwise `False`.
         """
-        if self._websocket is None:
-            log.warning("Failed to send %r", packet)
-            return False
-        packet_bytes = msgpack.packb(packet, use_bin_type=True)
-        try:
-            await self._websocket.send_bytes(packet_bytes)
-        except Exception as error:
-            log.warning("Failed to send %r; %s", packet, error)
-            return False
-        else:
-            log.debug("<SEND> %r", packet)
-        return True
+        route_key: str | None = getattr(packet, "route_key", None)
+        return await self.get_connection(route_key).send(packet, wait=wait)
+
+    def forget_route(self, route_key: RouteKey) -> None:
+        """Discard state held for a route which has closed.
 
-    async def on_ping(self, packet: packets.Ping) -> None:
-        """Sent by the server."""
-        # Reply to a Ping with an immediate Pong.
-        await self.send(packets.Pong(packet.data))
+        Args:
+            route_key: Route key.
+        """
+        self.compression_policy.forget_route(route_key)
+        self.stream_compression.forget_route(route_key)
+        self.get_connection(route_key).forget_route(route_key)
+        self._direct_routes.pop(route_key, None)
+
+    async def repaint_route(self, route_key: str) -> None:
+        """Ask a route's session to redraw, after some of its output was lost.
+
+        Args:
+            route_key: Route key.
+        """
+        session_process = self.session_manager.get_session_by_route_key(
+            RouteKey(route_key)
+        )
+        if session_process is not None:
+            await session_process.repaint()
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get metrics for the web interface.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "connected": self.connections[0].connected,
+            "sessions": len(self.session_manager.sessions),
+            "connections": [
+                connection.get_metrics() for connection in self.connections
+            ],
+            "compression": self.compression_policy.get_metrics(),
+            "loop": self._loop_monitor.get_metrics(),
+            "stream_compression": self.stream_compression.get_metrics(),
+            "endpoints": self.endpoints.get_metrics(),
+            "connect_waits": self.connect_bucket.wait_count,
+            "direct": [
+                connection.get_metrics() for connection in self.direct_connections
+            ],
+        }
+
+    async def on_accept_compression_dictionary(
+        self, packet: packets.AcceptCompressionDictionary
+    ) -> None:
+        """The server accepted a compression dictionary."""
+        self.stream_compression.accept(packet.slug, packet.dictionary_id)
 
     async def on_log(self, packet: packets.Log) -> None:
         """A log message sent by the server."""
@@ -433,11 +704,31 @@ class GanglionClient(Handlers):
             return
 
         connector = _ClientConnector(
-            self, cast(SessionID, packet.session_id), cast(RouteKey, route_key)
+            self,
+            cast(SessionID, packet.session_id),
+            cast(RouteKey, route_key),
+            packet.application_slug,
         )
+        app = self.session_manager.apps_by_slug.get(packet.application_slug)
+        if app is not None and app.weight != 1:
+            self.get_connection(route_key).writer.set_route_weight(
+                route_key, app.weight
+            )
+        handle = self.session_manager.route_handles.get(RouteKey(route_key))
+        if handle is not None:
+            await self.get_connection(route_key).bind_route(route_key, handle)
 
         await session_process.start(connector)
 
+    async def on_orphaned_sessions(self, packet: packets.OrphanedSessions) -> None:
+        """The server has no route for these sessions, which should be closed."""
+        session_ids = [
+            SessionID(session_id)
+            for session_id in packet.session_ids
+            if isinstance(session_id, str)
+        ]
+        await self.session_manager.reap_sessions(session_ids)
+
     async def on_session_close(self, packet: SessionClose) -> None:
         session_id = SessionID(packet.session_id)
         session_process = self.session_manager.get_session(session_id)
@@ -451,6 +742,11 @@ class GanglionClient(Handlers):
         if session_process is not None:
             await session_process.send_bytes(packet.data)
 
+    async def on_compact_session_data(self, packet: packets.CompactSessionData) -> None:
+        session_process = self.session_manager.get_session_by_handle(packet.handle)
+        if session_process is not None:
+            await session_process.send_bytes(packet.data)
+
     async def on_notify_terminal_size(self, packet: NotifyTerminalSize) -> None:
         session_process = self.session_manager.get_session(SessionID(packet.session_id))
         if session_process is not None:
@@ -0,0 +1,816 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Coroutine
+import zlib
+
+import aiohttp
+from aiohttp.client_exceptions import WSServerHandshakeError
+import msgpack
+
+from . import constants, packets
+from .compression import decompress
+from .connection_quality import PROBE_INTERVAL, ConnectionQuality
+from .features import (
+    BATCH,
+    COMPRESSION,
+    COMPRESSION_DICTIONARIES,
+    FEATURES_PROTOCOL,
+    REPLAY,
+    ROUTE_HANDLES,
+    SESSION_INVENTORY,
+    Features,
+)
+from .packet_decoder import PacketDecoder, PacketError
+from .packet_dispatcher import PacketDispatcher
+from .packet_writer import PacketWriter
+from .packets import Packet, PacketType
+from .replay_buffer import REPAINTABLE, ReplayBuffer
+from .retry import Retry, get_info_retry_after, get_retry_after
+from .transport import (
+    HTTPSessions,
+    abort_websocket,
+    get_unix_path,
+    is_unix_websocket,
+    save_tls_session,
+)
+from .types import RouteKey
+
+if TYPE_CHECKING:
+    from .ganglion_client import GanglionClient
+
+log = logging.getLogger("textual-web")
+
+BATCH_PROTOCOL = "ganglion.batch"
+"""Websocket subprotocol offered to the server, to negotiate multi-envelope frames."""
+CLOSE_TIMEOUT = 2.0
+"""Time (in seconds) to wait for queued packets to be written when closing."""
+
+
+def get_shard(route_key: str, shard_count: int) -> int:
+    """Get the connection a route is assigned to.
+
+    Uses CRC32 so that the server can make the same assignment.
+
+    Args:
+        route_key: Route key.
+        shard_count: Number of connections.
+
+    Returns:
+        Index of the connection.
+    """
+    if shard_count == 1:
+        return 0
+    return zlib.crc32(route_key.encode("utf-8")) % shard_count
+
+
+class GanglionConnection:
+    """A websocket connection to the Ganglion server.
+
+    The client may open several connections (shards). Routes are assigned to a connection
+    by a hash of the route key, and the first connection (the primary) also carries
+    packets which aren't associated with a route. Each connection has its own writer and
+    reconnects independently, so losing a connection only affects its routes.
+
+    A connection may keep an idle standby websocket open (authenticated, but carrying no
+    routes). If the active websocket closes, writing switches to the standby without
+    waiting to reconnect. When the server requests a reconnect, the new websocket is
+    opened before the old websocket is closed.
+
+    Session data which can't be sent while disconnected is held in a replay buffer, and
+    sent (in order) once a websocket becomes active again.
+
+    The active websocket is pinged every second to measure its quality, and is closed
+    if the server stops responding.
+
+    Received packets are dispatched concurrently per route, so that a route which is
+    slow to handle a packet (such as opening a session) doesn't hold up other routes.
+
+    Optional protocol features are negotiated for each websocket, if the server selects
+    the features subprotocol. Otherwise no packet types are sent which the server may not
+    understand (multi-envelope frames are still used if the server selects the batch
+    subprotocol).
+    """
+
+    def __init__(
+        self,
+        client: GanglionClient,
+        index: int = 0,
+        shard_count: int = 1,
+        standby: bool = False,
+    ) -> None:
+        """
+        Args:
+            client: The client which owns the connection.
+            index: Index of this connection (0 for the primary).
+            shard_count: Number of connections.
+            standby: Keep a standby websocket open, to switch to if the websocket closes.
+        """
+        self.client = client
+        self.index = index
+        self.shard_count = shard_count
+        self.replay_buffer = ReplayBuffer()
+        self.writer = PacketWriter(on_unsent=self._on_unsent)
+        self.decoder = PacketDecoder(strict=constants.STRICT_PACKETS)
+        self.dispatcher = PacketDispatcher(
+            self.dispatch_packet,
+            get_handle_route=client.session_manager.get_route_key_by_handle,
+            on_stuck_route=self.close_route,
+        )
+        self.standby = standby
+        self._websocket: aiohttp.ClientWebSocketResponse | None = None
+        self._standby: aiohttp.ClientWebSocketResponse | None = None
+        self._standby_task: asyncio.Task | None = None
+        self._readers: dict[aiohttp.ClientWebSocketResponse, asyncio.Task] = {}
+        self._sessions: HTTPSessions | None = None
+        self._done_event = asyncio.Event()
+        self._compression = "websocket"
+        self._closing = False
+        self._replay_task: asyncio.Task | None = None
+        self._replay_ready = False
+        """Has the server been told about the active websocket's features, so that
+        buffered data may be replayed?"""
+        self._retry_after: float | None = None
+        self.quality = ConnectionQuality()
+        self.features = Features((), (), negotiate=False)
+        """Features used on the active websocket."""
+        self._quality_task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        """Other background tasks, cancelled when the connection stops running."""
+        self.connect_count = 0
+        """Number of websockets which have become active."""
+        self.failover_count = 0
+        """Number of times the standby websocket became active."""
+        self.connect_latency = 0.0
+        """Time (in seconds) taken by the last websocket handshake."""
+        self.reconnect_latency = 0.0
+        """Time (in seconds) from losing the last websocket, to another becoming active."""
+        self.max_reconnect_latency = 0.0
+        """Maximum time (in seconds) from losing a websocket, to another becoming active."""
+        self.tls_resume_count = 0
+        """Number of websockets which resumed a TLS session."""
+        self._lost_time: float | None = None
+
+    def __repr__(self) -> str:
+        return f"<GanglionConnection {self.index}/{self.shard_count}>"
+
+    @property
+    def is_primary(self) -> bool:
+        """Is this the primary connection?"""
+        return self.index == 0
+
+    @property
+    def is_local(self) -> bool:
+        """Is the active websocket connected over a Unix domain socket?"""
+        return self._websocket is not None and is_unix_websocket(self._websocket)
+
+    @property
+    def connected(self) -> bool:
+        """Is the connection open?"""
+        return self._websocket is not None
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get connection metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "connected": self.connected,
+            "connects": self.connect_count,
+            "failovers": self.failover_count,
+            "standby": self._standby is not None,
+            "connect_latency": self.connect_latency,
+            "reconnect_latency": self.reconnect_latency,
+            "max_reconnect_latency": self.max_reconnect_latency,
+            "tls_resumes": self.tls_resume_count,
+            "writer": self.writer.get_metrics(),
+            "replay": self.replay_buffer.get_metrics(),
+            "decoder": self.decoder.get_metrics(),
+            "dispatcher": self.dispatcher.get_metrics(),
+            "quality": self.quality.get_metrics(),
+            "features": self.features.get_metrics(),
+        }
+
+    async def send(self, packet: Packet, wait: bool = False) -> bool:
+        """Send a packet on this connection.
+
+        Session data which can't be sent is added to the replay buffer, as is any session
+        data for a route which is still waiting to be replayed.
+
+        Args:
+            packet: Packet to send.
+            wait: Wait for the packet to be written to the websocket.
+
+        Returns:
+            bool: `True` if the packet was queued or sent (or buffered), otherwise `False`.
+        """
+        replay_buffer = self.replay_buffer
+        if packet.type in REPAINTABLE:
+            route_key = packet[1]
+            if not self.writer.connected or (
+                replay_buffer and replay_buffer.is_buffering(route_key)
+            ):
+                replay_buffer.add(route_key, packet)
+                return True
+            # If the packet is queued but can't be written, the writer returns it to the buffer
+            return await self.writer.write(packet, wait=wait)
+        if not await self.writer.write(packet, wait=wait):
+            replay_buffer.drop(packet)
+            return False
+        return True
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard state held for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self.writer.forget_route(route_key)
+        self.replay_buffer.forget_route(route_key)
+        self.quality.forget_route(route_key)
+        self.dispatcher.forget_route(route_key)
+
+    async def close_route(self, route_key: str) -> None:
+        """Kill the session on a route which isn't handling its packets.
+
+        The session may be blocked writing to its process, so it isn't asked to quit.
+
+        Args:
+            route_key: Route key.
+        """
+        session_process = self.client.session_manager.get_session_by_route_key(
+            RouteKey(route_key)
+        )
+        if session_process is not None:
+            await session_process.kill()
+
+    def _start_task(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        """Run a coroutine in a background task, which is cancelled if the connection
+        stops running.
+
+        Args:
+            coroutine: Coroutine to run.
+        """
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        """Forget a finished background task, and log any error.
+
+        Args:
+            task: A finished task.
+        """
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("%r background task failed", self, exc_info=task.exception())
+
+    async def bind_route(self, route_key: str, handle: int) -> None:
+        """Bind a route to its handle, if route handles are in use on this connection.
+
+        Args:
+            route_key: Route key.
+            handle: Route handle.
+        """
+        if ROUTE_HANDLES in self.features:
+            await self.send(packets.BindRoute(route_key, handle))
+
+    def _on_unsent(self, unsent: list[tuple[str | None, Packet]]) -> None:
+        """Buffer packets which the writer didn't write, to be replayed.
+
+        Senders which were waiting for space in the writer may return packets after a
+        websocket switch has been replayed, so they are replayed now.
+
+        Args:
+            unsent: Pairs of route key (if known) and packet, in the order they were
+                queued.
+        """
+        self.replay_buffer.add_unsent(unsent)
+        if self._replay_ready and self.writer.connected:
+            self._start_replay()
+
+    def _start_replay(self) -> None:
+        """Start replaying buffered session data, if there is any."""
+        self._replay_ready = True
+        if self.replay_buffer and self._replay_task is None:
+            self._replay_task = asyncio.create_task(self._replay())
+
+    async def _replay(self) -> None:
+        """Send buffered session data, and repaint routes which overflowed."""
+        replay_buffer = self.replay_buffer
+        write = self.writer.write
+        replay = REPLAY in self.features
+        replay_count = repaint_count = 0
+        try:
+            while replay_buffer:
+                for route_key in replay_buffer.route_keys:
+                    route = replay_buffer.take_route(route_key)
+                    if route is None:
+                        continue
+                    if not replay:
+                        # The server won't accept buffered data
+                        route.overflow()
+                    # Data added while replaying goes to the end of the buffer
+                    while route.packets:
+                        packet = route.pop()
+                        if not await write(packet):
+                            route.restore(packet)
+                            return
+                        replay_count += 1
+                    if route.overflowed:
+                        replay_buffer.forget_route(route_key)
+                        repaint_count += 1
+                        await self.client.repaint_route(route_key)
+                    else:
+                        replay_buffer.done_route(route_key)
+        finally:
+            self._replay_task = None
+            replay_buffer.replayed_count += replay_count
+            replay_buffer.repaint_count += repaint_count
+            replay_buffer.log_summary(force=True)
+            if replay_count or repaint_count:
+                log.info(
+                    "Replayed %d packet(s), repainted %d session(s)",
+                    replay_count,
+                    repaint_count,
+                )
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """Write any queued packets, then close the websocket, if it is open.
+
+        Args:
+            timeout: Maximum time (in seconds) to wait for queued packets to be written.
+        """
+        self._closing = True
+        await self._close_standby()
+        websocket = self._websocket
+        if websocket is None:
+            return
+        try:
+            await asyncio.wait_for(self.writer.flush(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        await websocket.close(message=b"Close requested")
+
+    def _get_headers(self, standby: bool = False) -> dict[str, str]:
+        """Get the headers for the websocket handshake.
+
+        Args:
+            standby: Get headers for a standby connection.
+
+        Returns:
+            A dict of headers.
+        """
+        client = self.client
+        headers: dict[str, str] = {}
+        api_key = client.config.account.api_key or client.api_key or None
+        if api_key:
+            headers["GANGLIONAPIKEY"] = api_key
+        if self.shard_count > 1 or self.standby:
+            headers["GANGLIONPOOL"] = client.pool_id
+            headers["GANGLIONSHARD"] = f"{self.index}/{self.shard_count}"
+        if standby:
+            headers["GANGLIONSTANDBY"] = "1"
+        return headers
+
+    async def _open_websocket(
+        self, standby: bool = False
+    ) -> aiohttp.ClientWebSocketResponse:
+        """Open a websocket, and start reading from it.
+
+        Args:
+            standby: Open a standby connection.
+
+        Returns:
+            A connected websocket.
+        """
+        assert self._sessions is not None
+        url = self.client.websocket_url
+        session, request_url = self._sessions.get(url)
+        # Compression isn't worth the CPU over a Unix domain socket
+        local = get_unix_path(url) is not None
+        start_time = monotonic()
+        websocket = await session.ws_connect(
+            request_url,
+            headers=self._get_headers(standby),
+            heartbeat=15,  # Sends a regular ping
+            autoping=False,  # Pongs are measured by the quality monitor
+            # Enables websocket compression
+            compress=12 if self._compression == "websocket" and not local else 0,
+            protocols=(FEATURES_PROTOCOL, BATCH_PROTOCOL),
+        )
+        if not standby:
+            self.connect_latency = monotonic() - start_time
+        if save_tls_session(websocket):
+            self.tls_resume_count += 1
+        self._readers[websocket] = asyncio.create_task(self.run_websocket(websocket))
+        return websocket
+
+    def _get_features(self, websocket: aiohttp.ClientWebSocketResponse) -> Features:
+        """Get the features which may be used on a websocket.
+
+        Args:
+            websocket: A connected websocket.
+
+        Returns:
+            Features to declare, and to use if the server doesn't accept features.
+        """
+        declared = {BATCH, SESSION_INVENTORY, REPLAY, ROUTE_HANDLES}
+        if not is_unix_websocket(websocket):
+            # Compression isn't worth the CPU over a Unix domain socket
+            declared.add(COMPRESSION_DICTIONARIES)
+            if self._compression == "adaptive":
+                declared.add(COMPRESSION)
+        if websocket.protocol == FEATURES_PROTOCOL:
+            # Only features which the server accepts are used
+            return Features(declared, (), negotiate=True)
+        # A server which doesn't negotiate may not understand any newer packet types.
+        # Replayed session data is sent in SessionData packets, which every server accepts.
+        fallback = {REPLAY}
+        if websocket.protocol == BATCH_PROTOCOL:
+            fallback.add(BATCH)
+        return Features(declared, fallback, negotiate=False)
+
+    def _get_writer_options(self) -> dict[str, object]:
+        """Get the writer options for the features in use.
+
+        Returns:
+            Keyword arguments for the writer.
+        """
+        features = self.features
+        return {
+            "batch_frames": BATCH in features,
+            "compression": (
+                self.client.compression_policy if COMPRESSION in features else None
+            ),
+        }
+
+    def accept_features(self, packet: packets.AcceptFeatures) -> None:
+        """Use the features accepted by the server.
+
+        Args:
+            packet: Packet from the server.
+        """
+        features = self.features
+        features.accept(packet.features)
+        log.debug("%r features %s", self, ", ".join(sorted(features.active)) or "-")
+        if self._websocket is not None:
+            self.writer.configure(**self._get_writer_options())
+
+    def _activate(self, websocket: aiohttp.ClientWebSocketResponse) -> None:
+        """Make a websocket the active websocket, which packets are written to.
+
+        Args:
+            websocket: A connected websocket.
+        """
+        self._replay_ready = False
+        self.features = self._get_features(websocket)
+        writer_options = self._get_writer_options()
+        if self._websocket is None:
+            self.writer.start(websocket, **writer_options)
+        else:
+            # Queued packets are written to the new websocket
+            self.writer.switch(websocket, **writer_options)
+            self.client.on_connection_lost(self)
+        self._websocket = websocket
+        self.connect_count += 1
+        if self._lost_time is not None:
+            self.reconnect_latency = monotonic() - self._lost_time
+            self.max_reconnect_latency = max(
+                self.max_reconnect_latency, self.reconnect_latency
+            )
+            self._lost_time = None
+        if self.standby:
+            self._start_standby()
+        self.quality.reset()
+        if self._quality_task is not None:
+            self._quality_task.cancel()
+        self._quality_task = asyncio.create_task(self._monitor_quality(websocket))
+
+    async def _monitor_quality(
+        self, websocket: aiohttp.ClientWebSocketResponse
+    ) -> None:
+        """Ping the active websocket to measure its quality, and abort it if the server
+        stops responding.
+
+        Args:
+            websocket: The active websocket.
+        """
+        quality = self.quality
+        while not websocket.closed and self._websocket is websocket:
+            await asyncio.sleep(PROBE_INTERVAL)
+            if self._websocket is not websocket:
+                break
+            quality.sample_send_buffer(self.writer.unsent_bytes)
+            self.writer.congested = quality.congested
+            if quality.check():
+                log.warning(
+                    "No response from Ganglion in %.1f seconds; closing connection",
+                    quality.dead_timeout,
+                )
+                abort_websocket(websocket)
+                break
+            try:
+                await websocket.ping(quality.create_probe())
+            except Exception:
+                break
+
+    async def _run_active(self, websocket: aiohttp.ClientWebSocketResponse) -> None:
+        """Run until there is no websocket to write to.
+
+        When the active websocket closes, writing switches to the standby websocket
+        (if there is one). A planned reconnect switches before the websocket closes.
+
+        Args:
+            websocket: A newly connected websocket.
+        """
+        client = self.client
+        self._activate(websocket)
+        await client.post_connect(self)
+        self._start_replay()
+        while True:
+            websocket = self._websocket
+            await asyncio.wait([self._readers[websocket]])
+            self._readers.pop(websocket, None)
+            if self._websocket is not websocket:
+                # Switched by a planned reconnect
+                continue
+            if self._closing or client.exit_event.is_set():
+                return
+            self._lost_time = monotonic()
+            standby = self._take_standby()
+            if standby is None:
+                return
+            self.failover_count += 1
+            log.info("Switched to standby connection")
+            self._activate(standby)
+            await client.post_connect(self)
+            self._start_replay()
+
+    async def reconnect(self, use_standby: bool = True) -> None:
+        """Switch to a new websocket, before closing the current websocket.
+
+        Args:
+            use_standby: Switch to the standby websocket, if there is one. Otherwise the
+                standby is closed, and a new websocket is opened.
+        """
+        websocket = self._websocket
+        if websocket is None or self._closing:
+            return
+        if use_standby:
+            new_websocket = self._take_standby()
+        else:
+            await self._close_standby()
+            new_websocket = None
+        if new_websocket is None:
+            try:
+                new_websocket = await self._open_websocket()
+            except Exception as error:
+                log.warning("Unable to reconnect; %s", error)
+                return
+        if self._websocket is not websocket:
+            await new_websocket.close()
+            return
+        self._activate(new_websocket)
+        await self.client.post_connect(self)
+        self._start_replay()
+        await websocket.close(message=b"Reconnected")
+        log.info("Reconnected to Ganglion")
+
+    def _start_standby(self) -> None:
+        """Start maintaining a standby websocket, if not already started."""
+        if self._standby_task is None and not self._closing:
+            self._standby_task = asyncio.create_task(self._run_standby())
+
+    def _take_standby(self) -> aiohttp.ClientWebSocketResponse | None:
+        """Take the standby websocket, if it is open.
+
+        Returns:
+            A connected websocket, or `None` if there is no standby.
+        """
+        standby = self._standby
+        if standby is None or standby.closed:
+            return None
+        self._standby = None
+        if self._standby_task is not None:
+            self._standby_task.cancel()
+            self._standby_task = None
+        return standby
+
+    async def _close_standby(self) -> None:
+        """Stop maintaining a standby websocket, and close it."""
+        if self._standby_task is not None:
+            self._standby_task.cancel()
+            self._standby_task = None
+        standby, self._standby = self._standby, None
+        if standby is not None:
+            await standby.close()
+
+    async def _run_standby(self) -> None:
+        """Open a standby websocket, and re-open it if it closes."""
+        retry = Retry(self._done_event, bucket=self.client.connect_bucket)
+        async for _retry_count in retry:
+            try:
+                standby = await self._open_websocket(standby=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                log.debug("Unable to open standby connection; %s", error)
+                continue
+            retry.success()
+            self._standby = standby
+            log.debug("%r standby connected", self)
+            await asyncio.wait([self._readers[standby]])
+            self._readers.pop(standby, None)
+            if self._standby is standby:
+                self._standby = None
+                log.debug("%r standby disconnected", self)
+
+    async def run(self, done_event: asyncio.Event, sessions: HTTPSessions) -> None:
+        """Connect, and reconnect until done.
+
+        Args:
+            done_event: An event to stop reconnecting.
+            sessions: HTTP sessions (shared by the client's connections).
+        """
+        client = self.client
+        self._done_event = done_event
+        retry = Retry(done_event, bucket=client.connect_bucket)
+        compression = constants.COMPRESSION
+        if compression not in ("websocket", "adaptive", "none"):
+            log.warning("Unknown compression %r; using 'websocket'", compression)
+            compression = "websocket"
+        self._compression = compression
+
+        self._sessions = sessions
+        try:
+            async for retry_count in retry:
+                if client.exit_event.is_set():
+                    break
+                url = client.websocket_url
+                try:
+                    if retry_count == 1:
+                        log.info("connecting to Ganglion")
+                    websocket = await self._open_websocket()
+                except asyncio.CancelledError:
+                    raise
+                except WSServerHandshakeError as error:
+                    retry_after = get_retry_after(error.headers)
+                    if retry_after is not None:
+                        log.info(
+                            "Ganglion is busy; retrying in at least %.0f seconds",
+                            retry_after,
+                        )
+                        retry.retry_after(retry_after)
+                    elif retry_count == 1:
+                        log.warning("Received forbidden response, check your API Key")
+                    continue
+                except Exception as error:
+                    if retry_count == 1:
+                        log.warning(
+                            "Unable to connect to Ganglion server. Will reattempt connection soon."
+                        )
+                    if constants.DEBUG:
+                        log.error("Unable to connect; %s", error)
+                    client.endpoints.failed(url)
+                    continue
+                retry.success()
+                try:
+                    await self._run_active(websocket)
+                finally:
+                    websocket = self._websocket
+                    self._websocket = None
+                    if self._lost_time is None:
+                        self._lost_time = monotonic()
+                    await self.writer.stop()
+                    client.on_connection_lost(self)
+                    if websocket is not None:
+                        await websocket.close()
+                    log.info("Disconnected from Ganglion")
+                if client.exit_event.is_set():
+                    break
+                if self._retry_after is not None:
+                    retry.retry_after(self._retry_after)
+                    self._retry_after = None
+        finally:
+            if self._replay_task is not None:
+                self._replay_task.cancel()
+            if self._quality_task is not None:
+                self._quality_task.cancel()
+                self._quality_task = None
+            for task in list(self._tasks):
+                task.cancel()
+            await self.dispatcher.close()
+            await self._close_standby()
+            for reader in self._readers.values():
+                reader.cancel()
+            self._readers.clear()
+            self._sessions = None
+
+    async def run_websocket(self, websocket: aiohttp.ClientWebSocketResponse) -> None:
+        """Run the websocket loop.
+
+        Args:
+            websocket: Websocket.
+        """
+        decode = self.decoder.decode
+        receive_packet = self.receive_packet
+        quality = self.quality
+        BINARY = aiohttp.WSMsgType.BINARY
+        try:
+            async for message in websocket:
+                if websocket is self._websocket:
+                    quality.on_receive()
+                if message.type == BINARY:
+                    try:
+                        frame_packets = decode(message.data)
+                    except PacketError as error:
+                        log.error(f"Unable to decode {message.data!r}; {error}")
+                    else:
+                        for packet in frame_packets:
+                            log.debug("<RECV> %r", packet)
+                            await receive_packet(packet, websocket)
+
+                elif message.type == aiohttp.WSMsgType.PING:
+                    await websocket.pong(message.data)
+                elif message.type == aiohttp.WSMsgType.PONG:
+                    quality.on_pong(message.data)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    break
+        except ConnectionResetError:
+            log.info("connection reset")
+        except Exception as error:
+            log.exception(str(error))
+
+    async def receive_packet(
+        self, packet: Packet, websocket: aiohttp.ClientWebSocketResponse
+    ) -> None:
+        """Handle a packet read from a websocket.
+
+        Pings are answered on the websocket they were received on, and compressed packets
+        are unwrapped. Features are only accepted from the active websocket. Everything
+        else goes to the dispatcher.
+
+        Args:
+            packet: Packet received.
+            websocket: The websocket the packet was received on.
+        """
+        packet_type = packet.type
+        if packet_type == PacketType.PING:
+            # Reply to a Ping with an immediate Pong.
+            pong = packets.Pong(packet.data)
+            if websocket is self._websocket:
+                await self.send(pong)
+            else:
+                # The writer only writes to the active websocket
+                try:
+                    await websocket.send_bytes(msgpack.packb(pong, use_bin_type=True))
+                except Exception as error:
+                    log.debug("Unable to send %r; %s", pong, error)
+        elif packet_type == PacketType.COMPRESSED:
+            # Unwrapped here, so the packets keep their order with other packets
+            try:
+                decompressed_packets = self.decoder.decode(decompress(packet))
+            except Exception as error:
+                log.error("Unable to decompress %r; %s", packet, error)
+                return
+            for decompressed_packet in decompressed_packets:
+                log.debug("<RECV> %r", decompressed_packet)
+                await self.receive_packet(decompressed_packet, websocket)
+        elif packet_type == PacketType.ACCEPT_FEATURES:
+            if websocket is self._websocket:
+                self.accept_features(packet)
+            else:
+                # Features are declared on a websocket once it is active
+                log.debug("Ignoring %r from an inactive websocket", packet)
+        else:
+            if packet_type == PacketType.ROUTE_PING:
+                self.quality.on_route_ping(packet.route_key)
+            await self.dispatcher.put(packet)
+
+    async def dispatch_packet(self, packet: Packet) -> None:
+        """Dispatch a packet received on this connection.
+
+        Called by the dispatcher, in order for each route. Packets the connection doesn't
+        handle are handled by the client.
+
+        Args:
+            packet: Packet to dispatch.
+        """
+        packet_type = packet.type
+        if packet_type == PacketType.INFO:
+            # The server may send a retry-after hint, before closing the connection
+            retry_after = get_info_retry_after(packet.message)
+            if retry_after is not None:
+                self._retry_after = retry_after
+            await self.client.dispatch_packet(packet)
+        elif packet_type == PacketType.RECONNECT:
+            log.info("Reconnect requested; %s", packet.reason)
+            self._start_task(self.reconnect())
+        else:
+            handler = self.client.get_handler(packet)
+            if handler is not None:
+                await handler(packet)
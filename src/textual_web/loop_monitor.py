@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic
+
+SAMPLE_INTERVAL = 0.1
+"""Time (in seconds) between samples of the event loop lag."""
+LAG_SMOOTHING = 0.1
+"""Weight of a new sample in the lag moving average."""
+STALL_LAG = 0.05
+"""Lag (in seconds) which is counted as a stall."""
+
+log = logging.getLogger("textual-web")
+
+
+class LoopMonitor:
+    """Measures how late the event loop is to wake a sleeping task.
+
+    Lag is a measure of how long the loop is blocked by callbacks, which delays the handling
+    of keystrokes and output for every session.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.lag = 0.0
+        """Moving average of the lag (in seconds)."""
+        self.max_lag = 0.0
+        """Maximum lag (in seconds)."""
+        self.stall_count = 0
+        """Number of samples with a lag of at least STALL_LAG."""
+
+    def start(self) -> None:
+        """Start monitoring."""
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get event loop metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "stalls": self.stall_count,
+        }
+
+    async def run(self) -> None:
+        """Run the monitor."""
+        interval = self.interval
+        try:
+            while True:
+                sleep_start = monotonic()
+                await asyncio.sleep(interval)
+                lag = max(0.0, monotonic() - sleep_start - interval)
+                self.lag += (lag - self.lag) * LAG_SMOOTHING
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                if lag >= STALL_LAG:
+                    self.stall_count += 1
+                    log.debug("event loop stalled for %.0fms", lag * 1000)
+        except asyncio.CancelledError:
+            pass
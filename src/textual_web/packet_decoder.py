@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import msgpack
+
+from .packets import PACKET_MAP, Packet, PacketType
+
+PacketDataType = Union[int, bytes, str, None]
+
+
+class PacketError(Exception):
+    """A packet error."""
+
+
+def decode_envelope(packet_envelope: Sequence[PacketDataType]) -> Packet | None:
+    """Decode a packet envelope, and validate its attributes.
+
+    Packet envelopes are a list where the first value is an integer denoting the type.
+    The type is used to look up the appropriate Packet class which is instantiated with
+    the rest of the data.
+
+    If the envelope contains *more* data than required, then that data is silently dropped.
+    This is to provide an extension mechanism.
+
+    Args:
+        packet_envelope: An unpacked envelope.
+
+    Raises:
+        PacketError: If the packet_envelope is empty.
+        PacketError: If the packet type is not an int.
+        PacketError: If the packet attributes failed to validate.
+
+    Returns:
+        One of the Packet classes defined in packets.py or None if the packet was of an unknown type.
+    """
+    if not packet_envelope:
+        raise PacketError("Packet data is empty")
+
+    packet_data: list[PacketDataType]
+    packet_type, *packet_data = packet_envelope
+    if not isinstance(packet_type, int):
+        raise PacketError(f"Packet id expected int, found {packet_type!r}")
+    packet_class = PACKET_MAP.get(packet_type, None)
+    if packet_class is None:
+        return None
+    try:
+        packet = packet_class.build(*packet_data[: len(packet_class._attributes)])
+    except TypeError as error:
+        raise PacketError(f"Packet failed to validate; {error}")
+    return packet
+
+
+CONSTRUCTORS: dict[int, tuple[type[Packet], PacketType, int]] = {
+    packet_type: (packet_class, packet_class.type, packet_class._attribute_count)
+    for packet_type, packet_class in PACKET_MAP.items()
+}
+"""Maps a packet type on to its class, type enumeration, and number of attributes."""
+
+
+class PacketDecoder:
+    """Decodes websocket frames from the Ganglion server in to packets.
+
+    Frames are unpacked with a reusable streaming unpacker. In strict mode, every attribute
+    is validated with the packet's `build` method. Otherwise, the server is trusted to send
+    attributes of the correct type, and packets are constructed directly from the envelope,
+    which only checks the type and the number of attributes.
+    """
+
+    def __init__(self, strict: bool = False) -> None:
+        """
+        Args:
+            strict: Validate the type of every packet attribute.
+        """
+        self.strict = strict
+        self._unpacker = msgpack.Unpacker(use_list=True, raw=False)
+        self._position = 0
+
+        self.frame_count = 0
+        """Number of frames decoded."""
+        self.packet_count = 0
+        """Number of packets decoded."""
+        self.error_count = 0
+        """Number of frames which failed to decode."""
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get decoder metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "strict": self.strict,
+            "frames": self.frame_count,
+            "packets": self.packet_count,
+            "errors": self.error_count,
+        }
+
+    def _reset(self) -> None:
+        """Discard any partially unpacked data."""
+        self._unpacker = msgpack.Unpacker(use_list=True, raw=False)
+        self._position = 0
+
+    def decode(self, data: bytes) -> list[Packet]:
+        """Decode a websocket frame.
+
+        Args:
+            data: Frame data.
+
+        Raises:
+            PacketError: If the data could not be unpacked, or any envelope is invalid.
+
+        Returns:
+            A list of decoded packets, with packets of unknown type removed.
+        """
+        unpacker = self._unpacker
+        unpacker.feed(data)
+        try:
+            frame = unpacker.unpack()
+        except Exception as error:
+            self.error_count += 1
+            self._reset()
+            raise PacketError(f"Unable to unpack frame; {error!r}")
+        self._position += len(data)
+        if unpacker.tell() != self._position:
+            self.error_count += 1
+            self._reset()
+            raise PacketError("Unexpected data after frame")
+        try:
+            packets = self.decode_frame(frame)
+        except PacketError:
+            self.error_count += 1
+            raise
+        self.frame_count += 1
+        self.packet_count += len(packets)
+        return packets
+
+    def decode_frame(self, frame: list) -> list[Packet]:
+        """Decode the contents of a websocket frame.
+
+        A frame contains either a single packet envelope, or (if the first value is a list)
+        a multi-envelope frame, where each value is a packet envelope.
+
+        Args:
+            frame: Unpacked frame data.
+
+        Raises:
+            PacketError: If any of the envelopes are invalid.
+
+        Returns:
+            A list of decoded packets, with packets of unknown type removed.
+        """
+        if not isinstance(frame, list):
+            raise PacketError(f"Frame expected list, found {type(frame)}")
+        envelopes = frame if frame and isinstance(frame[0], list) else [frame]
+        if not self.strict:
+            return self._decode_trusted(envelopes)
+        packets: list[Packet] = []
+        for envelope in envelopes:
+            packet = decode_envelope(envelope)
+            if packet is not None:
+                packets.append(packet)
+        return packets
+
+    @classmethod
+    def _decode_trusted(cls, envelopes: list[list]) -> list[Packet]:
+        """Decode packet envelopes, without validating attribute types.
+
+        Args:
+            envelopes: Unpacked envelopes.
+
+        Raises:
+            PacketError: If an envelope doesn't have a type and enough attributes.
+
+        Returns:
+            A list of decoded packets, with packets of unknown type removed.
+        """
+        packets: list[Packet] = []
+        get_constructor = CONSTRUCTORS.get
+        new_packet = tuple.__new__
+        for envelope in envelopes:
+            try:
+                constructor = get_constructor(envelope[0])
+            except (IndexError, TypeError):
+                raise PacketError(f"Invalid packet envelope {envelope!r}")
+            if constructor is None:
+                continue
+            packet_class, packet_type, attribute_count = constructor
+            if len(envelope) <= attribute_count:
+                raise PacketError(
+                    f"Packet {packet_class.__name__} expected {attribute_count} attribute(s)"
+                )
+            envelope[0] = packet_type
+            packets.append(new_packet(packet_class, envelope[: attribute_count + 1]))
+        return packets
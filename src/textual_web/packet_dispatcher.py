@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import logging
+from typing import Awaitable, Callable
+
+from ._two_way_dict import TwoWayDict
+from .packets import Packet, PacketType
+
+log = logging.getLogger("textual-web")
+
+MAX_ROUTE_QUEUE = 1024
+"""Maximum number of packets waiting to be dispatched for a route, before the route is
+disconnected (or for the connection, before the reader must wait)."""
+
+
+class _Worker:
+    """Dispatches the packets for a single route (or the connection), in order."""
+
+    def __init__(self) -> None:
+        self.packets: deque[Packet] = deque()
+        self.task: asyncio.Task | None = None
+        self.drained: asyncio.Event | None = None
+
+
+class PacketDispatcher:
+    """Dispatches received packets, without waiting for one route to handle a packet
+    before dispatching packets for another route.
+
+    Each route has a worker, which dispatches its packets in the order they were
+    received. Packets which aren't for a route (such as Ping) are dispatched in order by
+    a separate worker for the connection. Workers exist only while they have packets
+    waiting.
+
+    Packets identify their route with a `route_key`, a `session_id` for the route
+    they were opened with, or a route handle.
+
+    A route which isn't handling its packets (such as an app which has stopped reading
+    its input) is disconnected when it has too many packets waiting, rather than
+    making the reader wait: its packets are dropped, and so are any more packets for it
+    until the route has been closed (or forgotten).
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[Packet], Awaitable[None]],
+        max_route_queue: int = MAX_ROUTE_QUEUE,
+        get_handle_route: Callable[[int], str | None] | None = None,
+        on_stuck_route: Callable[[str], Awaitable[None]] | None = None,
+    ) -> None:
+        """
+        Args:
+            dispatch: Callable to dispatch a single packet.
+            max_route_queue: Maximum number of packets waiting for a route.
+            get_handle_route: Callable to get the route key for a route handle, or
+                `None` if route handles aren't used.
+            on_stuck_route: Async callable to close a route which has been
+                disconnected, or `None` to only drop its packets until the route is
+                forgotten.
+        """
+        self._dispatch = dispatch
+        self.max_route_queue = max_route_queue
+        self._get_handle_route = get_handle_route
+        self._on_stuck_route = on_stuck_route
+        self._workers: dict[str | None, _Worker] = {}
+        self._sessions: TwoWayDict[str, str] = TwoWayDict()
+        self._stuck_routes: set[str] = set()
+        self._close_tasks: set[asyncio.Task] = set()
+        self.dispatch_count = 0
+        """Number of packets dispatched."""
+        self.max_queue_depth = 0
+        """Maximum number of packets waiting for a single route."""
+        self.wait_count = 0
+        """Number of times the reader waited for the connection's packets to be handled."""
+        self.drop_count = 0
+        """Number of packets dropped for disconnected routes."""
+        self.stuck_count = 0
+        """Number of routes disconnected for having too many packets waiting."""
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get dispatcher metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "workers": len(self._workers),
+            "dispatched": self.dispatch_count,
+            "max_queue_depth": self.max_queue_depth,
+            "waits": self.wait_count,
+            "dropped": self.drop_count,
+            "stuck_routes": self.stuck_count,
+        }
+
+    def get_route_key(self, packet: Packet) -> str | None:
+        """Get the route a packet should be dispatched on.
+
+        Args:
+            packet: A received packet.
+
+        Returns:
+            Route key, or `None` for packets which aren't for a route.
+        """
+        if (
+            packet.type == PacketType.COMPACT_SESSION_DATA
+            and self._get_handle_route is not None
+        ):
+            return self._get_handle_route(packet.handle)
+        route_key: str | None = getattr(packet, "route_key", None)
+        session_id: str | None = getattr(packet, "session_id", None)
+        if route_key is None:
+            if session_id is not None:
+                return self._sessions.get_key(session_id)
+        elif packet.type == PacketType.SESSION_OPEN:
+            # Later packets may refer to the route by session ID
+            self._sessions[route_key] = session_id
+        return route_key
+
+    async def put(self, packet: Packet) -> None:
+        """Dispatch a packet, after any packets received earlier for the same route.
+
+        Returns without waiting for the packet to be handled, unless the connection (as
+        opposed to a route) has too many packets waiting.
+
+        Args:
+            packet: A received packet.
+        """
+        route_key = self.get_route_key(packet)
+        if route_key in self._stuck_routes:
+            self.drop_count += 1
+            return
+        worker = self._workers.get(route_key)
+        if worker is None:
+            worker = self._workers[route_key] = _Worker()
+            worker.packets.append(packet)
+            worker.task = asyncio.create_task(self._run_worker(route_key, worker))
+            return
+        packets = worker.packets
+        packets.append(packet)
+        queue_depth = len(packets)
+        if queue_depth > self.max_queue_depth:
+            self.max_queue_depth = queue_depth
+        if queue_depth >= self.max_route_queue:
+            if route_key is not None:
+                self._disconnect_route(route_key, worker)
+                return
+            self.wait_count += 1
+            log.debug("dispatch waiting for %d connection packets", queue_depth)
+            if worker.drained is None:
+                worker.drained = asyncio.Event()
+            await worker.drained.wait()
+
+    def _disconnect_route(self, route_key: str, worker: _Worker) -> None:
+        """Drop the packets waiting for a route, and any more packets received for it.
+
+        Args:
+            route_key: Route key.
+            worker: The route's worker.
+        """
+        log.warning(
+            "Route %r has %d packets waiting; disconnecting route",
+            route_key,
+            len(worker.packets),
+        )
+        self.drop_count += len(worker.packets)
+        self.stuck_count += 1
+        worker.packets.clear()
+        self._stuck_routes.add(route_key)
+        if self._on_stuck_route is not None:
+            task = asyncio.create_task(self._close_route(route_key))
+            self._close_tasks.add(task)
+            task.add_done_callback(self._close_tasks.discard)
+
+    async def _close_route(self, route_key: str) -> None:
+        """Close a disconnected route, then dispatch its packets again.
+
+        Args:
+            route_key: Route key.
+        """
+        assert self._on_stuck_route is not None
+        try:
+            await self._on_stuck_route(route_key)
+        except Exception:
+            log.exception("error closing route %r", route_key)
+        finally:
+            self._stuck_routes.discard(route_key)
+
+    async def _run_worker(self, route_key: str | None, worker: _Worker) -> None:
+        """Dispatch a route's packets until there are none waiting.
+
+        Args:
+            route_key: Route key, or `None` for the connection.
+            worker: The route's worker.
+        """
+        packets = worker.packets
+        dispatch = self._dispatch
+        try:
+            while packets:
+                packet = packets.popleft()
+                try:
+                    await dispatch(packet)
+                except Exception:
+                    log.exception("error processing %r", packet)
+                self.dispatch_count += 1
+                if (
+                    worker.drained is not None
+                    and len(packets) < self.max_route_queue // 2
+                ):
+                    worker.drained.set()
+                    worker.drained = None
+        finally:
+            if self._workers.get(route_key) is worker:
+                del self._workers[route_key]
+            if worker.drained is not None:
+                worker.drained.set()
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard state held for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        if route_key in self._sessions:
+            del self._sessions[route_key]
+        self._stuck_routes.discard(route_key)
+
+    async def close(self) -> None:
+        """Stop dispatching, and discard waiting packets."""
+        for task in list(self._close_tasks):
+            task.cancel()
+        workers = list(self._workers.values())
+        self._workers.clear()
+        for worker in workers:
+            worker.packets.clear()
+            if worker.task is not None:
+                worker.task.cancel()
+        await asyncio.gather(
+            *[worker.task for worker in workers if worker.task is not None],
+            return_exceptions=True,
+        )
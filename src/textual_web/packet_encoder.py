@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import msgpack
+
+from .packets import Packet, PacketType
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+ROUTED_DATA = {
+    PacketType.SESSION_DATA,
+    PacketType.BINARY_ENCODED_MESSAGE,
+    PacketType.COMPRESSED_SESSION_DATA,
+}
+"""Packet types with (route_key, data) fields, which are encoded with a cached header."""
+
+MAX_CACHED_HEADERS = 4096
+"""Maximum number of envelope headers to cache."""
+
+
+def encode_bin_header(size: int) -> bytes:
+    """Encode a msgpack bin header.
+
+    Args:
+        size: Size of the binary data.
+
+    Returns:
+        Encoded header.
+    """
+    if size < 0x100:
+        return b"\xc4" + size.to_bytes(1, "big")
+    if size < 0x10000:
+        return b"\xc5" + size.to_bytes(2, "big")
+    return b"\xc6" + size.to_bytes(4, "big")
+
+
+class PacketEncoder:
+    """Encodes packets in to websocket frames.
+
+    Session data is the bulk of what is sent. Rather than packing the whole envelope, the
+    envelope header (the array header, type, and route key) is encoded once per route,
+    and the payload (which may be any bytes-like object) is copied only once, in to the frame.
+    Other packets are encoded with a reusable packer.
+
+    Once a `BindRoute` packet has been encoded, session data for the route is encoded as
+    `CompactSessionData`, with the route handle in place of the route key. Packets are
+    encoded in the order they are written, so the server always receives the binding
+    first.
+    """
+
+    def __init__(self) -> None:
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._headers: dict[tuple[int, str], bytes] = {}
+        self._handles: dict[str, int] = {}
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard cached headers for a route.
+
+        Args:
+            route_key: Route key.
+        """
+        headers = self._headers
+        for packet_type in ROUTED_DATA:
+            headers.pop((packet_type, route_key), None)
+        self._handles.pop(route_key, None)
+
+    def reset_handles(self) -> None:
+        """Discard route handles, which are bound to a websocket."""
+        if self._handles:
+            for route_key in self._handles:
+                self._headers.pop((PacketType.SESSION_DATA, route_key), None)
+            self._handles.clear()
+
+    def _bind_route(self, packet: Packet) -> None:
+        """Encode session data for a route with its handle, from now on.
+
+        Args:
+            packet: A `BindRoute` packet.
+        """
+        _type, route_key, handle = packet
+        self._handles[route_key] = handle
+        self._headers.pop((PacketType.SESSION_DATA, route_key), None)
+
+    def _get_header(self, packet_type: int, route_key: str) -> bytes:
+        """Get the encoded envelope header for routed data.
+
+        Args:
+            packet_type: Packet type.
+            route_key: Route key.
+
+        Returns:
+            Bytes for the start of the envelope, up to the data.
+        """
+        key = (packet_type, route_key)
+        header = self._headers.get(key)
+        if header is None:
+            if len(self._headers) >= MAX_CACHED_HEADERS:
+                self._headers.clear()
+            pack = self._packer.pack
+            handle = (
+                self._handles.get(route_key)
+                if packet_type == PacketType.SESSION_DATA
+                else None
+            )
+            if handle is None:
+                header = b"\x93" + pack(int(packet_type)) + pack(route_key)
+            else:
+                header = (
+                    b"\x93" + pack(int(PacketType.COMPACT_SESSION_DATA)) + pack(handle)
+                )
+            self._headers[key] = header
+        return header
+
+    def _encode_into(self, frame: bytearray, packet: Packet) -> None:
+        """Encode a packet on to the end of a frame.
+
+        Args:
+            frame: Frame buffer.
+            packet: Packet to encode.
+        """
+        if packet.type in ROUTED_DATA:
+            _type, route_key, data = packet
+            frame += self._get_header(packet.type, route_key)
+            frame += encode_bin_header(len(data))
+            frame += data
+        else:
+            if packet.type == PacketType.BIND_ROUTE:
+                self._bind_route(packet)
+            frame += self._packer.pack(packet)
+
+    def encode(self, packet: Packet) -> Buffer:
+        """Encode a single packet.
+
+        Args:
+            packet: Packet to encode.
+
+        Returns:
+            Encoded envelope.
+        """
+        if packet.type in ROUTED_DATA:
+            frame = bytearray()
+            self._encode_into(frame, packet)
+            return frame
+        if packet.type == PacketType.BIND_ROUTE:
+            self._bind_route(packet)
+        return self._packer.pack(packet)
+
+    def encode_batch(self, packets: Sequence[Packet]) -> Buffer:
+        """Encode a multi-envelope frame.
+
+        Args:
+            packets: Packets to encode.
+
+        Returns:
+            Encoded frame.
+        """
+        frame = bytearray(self._packer.pack_array_header(len(packets)))
+        encode_into = self._encode_into
+        for packet in packets:
+            encode_into(frame, packet)
+        return frame
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from time import perf_counter
+from typing import Awaitable, Callable
+
+from .packets import PACKET_MAP, Handlers, Packet
+
+PacketHandler = Callable[[Packet], Awaitable[None]]
+"""A bound method to handle a packet."""
+HandlerTimer = Callable[[Packet, float], None]
+"""Callable which receives a packet and the time (in seconds) taken to handle it."""
+
+
+def _time_handler(handler: PacketHandler, timer: HandlerTimer) -> PacketHandler:
+    """Wrap a handler, to report the time taken to handle each packet.
+
+    Args:
+        handler: A packet handler.
+        timer: Callable to receive the time taken.
+
+    Returns:
+        A packet handler.
+    """
+
+    async def timed_handler(packet: Packet) -> None:
+        start_time = perf_counter()
+        try:
+            await handler(packet)
+        finally:
+            timer(packet, perf_counter() - start_time)
+
+    return timed_handler
+
+
+class PacketHandlers(Handlers):
+    """Handlers which dispatch packets with a table.
+
+    Packets are dispatched with a table of bound handlers, indexed by packet type, which
+    is built once per instance. Packet types which aren't handled (i.e. neither the
+    handler or `on_default` are overridden) have no handler, and are skipped.
+    """
+
+    _dispatch_table: list[PacketHandler | None] | None = None
+    _handler_timer: HandlerTimer | None = None
+
+    def _build_dispatch_table(self) -> list[PacketHandler | None]:
+        """Build the table of handlers for each packet type.
+
+        Returns:
+            A list of handlers (or `None`), indexed by packet type.
+        """
+        cls = type(self)
+        handles_default = cls.on_default is not Handlers.on_default
+        table: list[PacketHandler | None] = [None] * (max(PACKET_MAP) + 1)
+        for packet_type, packet_class in PACKET_MAP.items():
+            handler_name = packet_class.handler_name
+            if getattr(cls, handler_name) is not getattr(Handlers, handler_name):
+                handler: PacketHandler | None = getattr(self, handler_name)
+            elif handles_default:
+                # Skip the default handler, which would call on_default
+                handler = self.on_default
+            else:
+                handler = None
+            if handler is not None and self._handler_timer is not None:
+                handler = _time_handler(handler, self._handler_timer)
+            table[packet_type] = handler
+        self._dispatch_table = table
+        return table
+
+    def set_handler_timer(self, timer: HandlerTimer | None) -> None:
+        """Set a callable to receive the time taken to handle each packet.
+
+        Timing is off by default, as it adds overhead to every packet.
+
+        Args:
+            timer: Callable which receives the packet and the time taken (in seconds),
+                or `None` to stop timing.
+        """
+        self._handler_timer = timer
+        self._dispatch_table = None
+
+    def get_handler(self, packet: Packet) -> PacketHandler | None:
+        """Get the handler for a packet.
+
+        Args:
+            packet: A packet object.
+
+        Returns:
+            A bound handler, or `None` if the packet type isn't handled.
+        """
+        table = self._dispatch_table
+        if table is None:
+            table = self._build_dispatch_table()
+        return table[packet[0]]
+
+    async def dispatch_packet(self, packet: Packet) -> None:
+        """Dispatch a packet to the appropriate handler.
+
+        Args:
+            packet: A packet object.
+        """
+        table = self._dispatch_table
+        if table is None:
+            table = self._build_dispatch_table()
+        handler = table[packet[0]]
+        if handler is not None:
+            await handler(packet)
@@ -0,0 +1,790 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import logging
+from operator import attrgetter
+from time import monotonic
+from typing import Callable, Iterator, NamedTuple
+
+import aiohttp
+
+from .compression import CompressionPolicy
+from .packet_encoder import PacketEncoder
+from .packets import Packet, PacketType
+
+log = logging.getLogger("textual-web")
+
+BATCH_WINDOW = 1 / 500
+"""Time (in seconds) to gather packets in to a single multi-envelope frame."""
+BATCH_SIZE = 128
+"""Maximum number of packets written per wakeup (and per multi-envelope frame)."""
+MAX_QUEUE = 4096
+"""Maximum number of packets waiting to be written in each lane, before senders must wait."""
+FRAGMENT_SIZE = 16 * 1024
+"""Session data larger than this (in bytes) is split in to fragments. Also the number of bytes a
+route may write per turn in the interactive lane, at a weight of 1."""
+INTERACTIVE_BATCH_BYTES = 64 * 1024
+"""Maximum bytes of session data written per wakeup (at least one packet is written)."""
+BULK_BATCH_BYTES = 64 * 1024
+"""Maximum bytes of bulk packets written per wakeup (at least one packet is written)."""
+LATENCY_SMOOTHING = 0.1
+"""Weight of a new sample in the flush latency moving average."""
+HIGH_WATERMARK = 256 * 1024
+"""Unwritten bytes for a route which will pause the sender."""
+LOW_WATERMARK = 64 * 1024
+"""Unwritten bytes for a route which will resume a paused sender."""
+
+FLOW_CONTROLLED = {
+    PacketType.SESSION_DATA,
+    PacketType.BINARY_ENCODED_MESSAGE,
+    PacketType.COMPRESSED_SESSION_DATA,
+}
+"""Packets types which count towards a route's unwritten bytes. These all have (route_key, data) fields."""
+STREAM_COMPRESSED = {PacketType.COMPRESSED_SESSION_DATA}
+"""Packet types compressed with a stream context held by the server for the websocket, which
+can't be written to another websocket."""
+
+CONTROL_LANE = 0
+"""Lane for packets which the server is waiting on, or which measure latency."""
+INTERACTIVE_LANE = 1
+"""Lane for session output."""
+BULK_LANE = 2
+"""Lane for file deliveries, and other large transfers."""
+LANE_NAMES = ["control", "interactive", "bulk"]
+"""Lane names, in order of priority."""
+
+PACKET_LANES = {
+    PacketType.SESSION_DATA: INTERACTIVE_LANE,
+    PacketType.COMPRESSED_SESSION_DATA: INTERACTIVE_LANE,
+    PacketType.BINARY_ENCODED_MESSAGE: BULK_LANE,
+    PacketType.COMPRESSION_DICTIONARY: BULK_LANE,
+}
+"""Lane for each packet type. Packet types not listed here are in the control lane."""
+LANE_BATCH_BYTES = [None, INTERACTIVE_BATCH_BYTES, BULK_BATCH_BYTES]
+"""Maximum bytes written per wakeup from each lane, or `None` for no limit."""
+
+
+def split_fragments(data: bytes, size: int = FRAGMENT_SIZE) -> list[memoryview]:
+    """Split session data in to fragments.
+
+    Fragments won't split a UTF-8 encoded character, where possible.
+
+    Args:
+        data: Session data.
+        size: Maximum size of a fragment.
+
+    Returns:
+        A list of fragments (views of the original data).
+    """
+    view = memoryview(data)
+    fragments: list[memoryview] = []
+    start = 0
+    end = len(view)
+    while end - start > size:
+        split = start + size
+        # Back up over UTF-8 continuation bytes
+        while split > start + size - 3 and view[split] & 0xC0 == 0x80:
+            split -= 1
+        if view[split] & 0xC0 == 0x80:
+            split = start + size
+        fragments.append(view[start:split])
+        start = split
+    fragments.append(view[start:end])
+    return fragments
+
+
+class _QueuedPacket(NamedTuple):
+    """A packet waiting to be written."""
+
+    packet: Packet
+    queue_time: float
+    sent: asyncio.Future[bool] | None
+    route_key: str | None = None
+    """Route key, for packets queued per route."""
+    size: int = 0
+    """Size of flow controlled data."""
+    lane: int = CONTROL_LANE
+    """Priority lane."""
+
+
+class _Lane:
+    """Packets of a single priority, waiting to be written."""
+
+    def __init__(self, max_queue: int) -> None:
+        """
+        Args:
+            max_queue: Maximum number of packets in the lane.
+        """
+        self.max_queue = max_queue
+        self._packets: deque[_QueuedPacket] = deque()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+        self.packet_count = 0
+        """Number of packets written."""
+        self.wait_time = 0.0
+        """Moving average of time (in seconds) from queueing a packet to writing it."""
+        self.max_wait_time = 0.0
+        """Maximum time (in seconds) from queueing a packet to writing it."""
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    def __iter__(self) -> Iterator[_QueuedPacket]:
+        return iter(self._packets)
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get lane metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "queue_depth": len(self),
+            "packets": self.packet_count,
+            "wait_time": self.wait_time,
+            "max_wait_time": self.max_wait_time,
+        }
+
+    def append(self, queued: _QueuedPacket) -> None:
+        """Add a packet to the lane.
+
+        Args:
+            queued: Packet to add.
+        """
+        self._packets.append(queued)
+
+    def take(self, max_count: int, max_bytes: int | None = None) -> list[_QueuedPacket]:
+        """Take packets from the lane.
+
+        Args:
+            max_count: Maximum number of packets to take.
+            max_bytes: Maximum bytes to take (at least one packet is taken), or `None` for no limit.
+
+        Returns:
+            Packets in the order they should be written.
+        """
+        packets = self._packets
+        taken: list[_QueuedPacket] = []
+        taken_bytes = 0
+        while packets and len(taken) < max_count:
+            if max_bytes is not None and taken_bytes >= max_bytes:
+                break
+            queued = packets.popleft()
+            taken.append(queued)
+            taken_bytes += queued.size
+        return taken
+
+    def clear(self) -> list[_QueuedPacket]:
+        """Remove all packets from the lane.
+
+        Returns:
+            Packets that were removed.
+        """
+        cleared = list(self._packets)
+        self._packets.clear()
+        return cleared
+
+
+class _FairLane(_Lane):
+    """A lane which shares the websocket between routes, with deficit round robin.
+
+    Each route has its own queue. Routes take turns to write up to a quantum of bytes
+    (multiplied by the route's weight), so that a route with a lot of output can't hold
+    up the other routes for more than one turn.
+    """
+
+    def __init__(self, max_queue: int, quantum: int = FRAGMENT_SIZE) -> None:
+        """
+        Args:
+            max_queue: Maximum number of packets in the lane.
+            quantum: Bytes a route may write per turn, at a weight of 1.
+        """
+        super().__init__(max_queue)
+        self.quantum = quantum
+        self._size = 0
+        self._routes: dict[str | None, deque[_QueuedPacket]] = {}
+        self._active: deque[str | None] = deque()
+        self._deficits: dict[str | None, int] = {}
+        self._weights: dict[str, int] = {}
+        self._turn_started = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[_QueuedPacket]:
+        for route_packets in self._routes.values():
+            yield from route_packets
+
+    def set_weight(self, route_key: str, weight: int) -> None:
+        """Set the weight of a route.
+
+        Args:
+            route_key: Route key.
+            weight: Multiple of the quantum the route may write per turn.
+        """
+        if weight == 1:
+            self._weights.pop(route_key, None)
+        else:
+            self._weights[route_key] = weight
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard the weight of a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self._weights.pop(route_key, None)
+
+    def append(self, queued: _QueuedPacket) -> None:
+        route_key = queued.route_key
+        route_packets = self._routes.get(route_key)
+        if route_packets is None:
+            route_packets = self._routes[route_key] = deque()
+            self._deficits[route_key] = 0
+            self._active.append(route_key)
+        route_packets.append(queued)
+        self._size += 1
+
+    def take(self, max_count: int, max_bytes: int | None = None) -> list[_QueuedPacket]:
+        taken: list[_QueuedPacket] = []
+        taken_bytes = 0
+        active = self._active
+        routes = self._routes
+        deficits = self._deficits
+        while (
+            active
+            and len(taken) < max_count
+            and (max_bytes is None or taken_bytes < max_bytes)
+        ):
+            route_key = active[0]
+            route_packets = routes[route_key]
+            if not self._turn_started:
+                weight = 1 if route_key is None else self._weights.get(route_key, 1)
+                deficits[route_key] += self.quantum * weight
+                self._turn_started = True
+            deficit = deficits[route_key]
+            while (
+                route_packets
+                and len(taken) < max_count
+                and route_packets[0].size <= deficit
+            ):
+                queued = route_packets.popleft()
+                deficit -= queued.size
+                taken_bytes += queued.size
+                taken.append(queued)
+            if not route_packets:
+                del routes[route_key]
+                del deficits[route_key]
+                active.popleft()
+                self._turn_started = False
+            else:
+                deficits[route_key] = deficit
+                if len(taken) < max_count and route_packets[0].size > deficit:
+                    active.rotate(-1)
+                    self._turn_started = False
+        self._size -= len(taken)
+        return taken
+
+    def remove_routes(
+        self, route_keys: set[str | None], packet_types: set[PacketType]
+    ) -> list[_QueuedPacket]:
+        """Remove packets of the given types, for the given routes.
+
+        Args:
+            route_keys: Routes to remove packets from.
+            packet_types: Types of packet to remove.
+
+        Returns:
+            Packets that were removed.
+        """
+        removed: list[_QueuedPacket] = []
+        for route_key in route_keys:
+            route_packets = self._routes.get(route_key)
+            if route_packets is None:
+                continue
+            kept: deque[_QueuedPacket] = deque()
+            for queued in route_packets:
+                if queued.packet.type in packet_types:
+                    removed.append(queued)
+                else:
+                    kept.append(queued)
+            if kept:
+                self._routes[route_key] = kept
+                continue
+            if self._active[0] == route_key:
+                self._turn_started = False
+            del self._routes[route_key]
+            del self._deficits[route_key]
+            self._active.remove(route_key)
+        self._size -= len(removed)
+        return removed
+
+    def clear(self) -> list[_QueuedPacket]:
+        cleared = [
+            queued
+            for route_packets in self._routes.values()
+            for queued in route_packets
+        ]
+        self._routes.clear()
+        self._active.clear()
+        self._deficits.clear()
+        self._turn_started = False
+        self._size = 0
+        return cleared
+
+
+class PacketWriter:
+    """Writes packets to the Ganglion websocket from a single task.
+
+    Packets are placed in bounded queues, so that senders don't contend for the
+    websocket, and only have to wait on the socket if they request it.
+
+    Each packet type is assigned a priority lane. Packets in a higher priority lane are
+    always written before packets in a lower priority lane, so that a large transfer
+    doesn't delay the packets the server is waiting on (such as a Pong).
+
+    Session data from different routes is interleaved fairly (see `_FairLane`), so that
+    one busy session doesn't make every other session laggy.
+
+    Session data is flow controlled per route. If the unwritten bytes for a route exceeds
+    the high watermark, the sender is paused until the writer catches up to the low
+    watermark. This stops a session from reading its process' output faster than the
+    network can send it.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = MAX_QUEUE,
+        batch_size: int = BATCH_SIZE,
+        high_watermark: int = HIGH_WATERMARK,
+        low_watermark: int = LOW_WATERMARK,
+        on_unsent: Callable[[list[tuple[str | None, Packet]]], None] | None = None,
+    ) -> None:
+        """
+        Args:
+            max_queue: Maximum number of packets in each lane.
+            batch_size: Maximum number of packets to write per wakeup.
+            high_watermark: Unwritten bytes per route to pause the sender.
+            low_watermark: Unwritten bytes per route to resume the sender.
+            on_unsent: Callback with the route key (if any) and packet of queued packets
+                which could not be written, in the order they were queued.
+        """
+        assert low_watermark <= high_watermark
+        self.batch_size = batch_size
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.on_unsent = on_unsent
+        self._route_bytes: dict[str, int] = {}
+        self._route_resume: dict[str, asyncio.Event] = {}
+        self._interactive_lane = _FairLane(max_queue)
+        self._lanes = [_Lane(max_queue), self._interactive_lane, _Lane(max_queue)]
+        self._ready = asyncio.Event()
+        self._websocket: aiohttp.ClientWebSocketResponse | None = None
+        self._batch_frames = False
+        self._compression: CompressionPolicy | None = None
+        self._encoder = PacketEncoder()
+        self._task: asyncio.Task | None = None
+        self._close_task: asyncio.Task | None = None
+        self._generation = 0
+        self.congested = False
+        """Is the connection congested? Set by the connection's quality monitor, and
+        passed to the compression policy."""
+
+        self.frame_count = 0
+        """Number of websocket frames written."""
+        self.packet_count = 0
+        """Number of packets written."""
+        self.byte_count = 0
+        """Number of (uncompressed) bytes written."""
+        self.flush_count = 0
+        """Number of times the writer woke up to write packets."""
+        self.drop_count = 0
+        """Number of packets which could not be written."""
+        self.flush_latency = 0.0
+        """Moving average of time (in seconds) from queueing a packet to writing it."""
+        self.max_flush_latency = 0.0
+        """Maximum time (in seconds) from queueing a packet to writing it."""
+        self.pause_count = 0
+        """Number of times a route was paused at the high watermark."""
+
+    @property
+    def connected(self) -> bool:
+        """Is the writer connected to a websocket?"""
+        return self._websocket is not None
+
+    @property
+    def unsent_bytes(self) -> dict[str, int]:
+        """Bytes of session data queued but not yet written, per route."""
+        return self._route_bytes
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of packets waiting to be written."""
+        return sum(len(lane) for lane in self._lanes)
+
+    def start(
+        self,
+        websocket: aiohttp.ClientWebSocketResponse,
+        batch_frames: bool = False,
+        compression: CompressionPolicy | None = None,
+    ) -> None:
+        """Start writing to a websocket.
+
+        Args:
+            websocket: A connected websocket.
+            batch_frames: Write multi-envelope frames.
+            compression: Policy to compress packets, or `None` for no compression.
+        """
+        assert self._task is None
+        self._websocket = websocket
+        self._batch_frames = batch_frames
+        self._compression = compression
+        self._encoder.reset_handles()
+        self._generation += 1
+        self._task = asyncio.create_task(self.run())
+
+    def switch(
+        self,
+        websocket: aiohttp.ClientWebSocketResponse,
+        batch_frames: bool = False,
+        compression: CompressionPolicy | None = None,
+    ) -> None:
+        """Switch to writing to another websocket, keeping any queued packets.
+
+        Stream compressed session data can't be decompressed by the new websocket, so it is
+        returned as unsent (with any other queued session data for the same routes), and
+        the routes will be repainted.
+
+        Args:
+            websocket: A connected websocket.
+            batch_frames: Write multi-envelope frames.
+            compression: Policy to compress packets, or `None` for no compression.
+        """
+        assert self._task is not None
+        self._websocket = websocket
+        self._batch_frames = batch_frames
+        self._compression = compression
+        self._encoder.reset_handles()
+        self._generation += 1
+        self._remove_stream_compressed()
+
+    def configure(
+        self,
+        batch_frames: bool = False,
+        compression: CompressionPolicy | None = None,
+    ) -> None:
+        """Change how packets are written to the current websocket.
+
+        Args:
+            batch_frames: Write multi-envelope frames.
+            compression: Policy to compress packets, or `None` for no compression.
+        """
+        self._batch_frames = batch_frames
+        self._compression = compression
+
+    async def stop(self) -> None:
+        """Stop writing, and discard any unwritten packets."""
+        self._websocket = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._discard([])
+        self._route_bytes.clear()
+        for resume in self._route_resume.values():
+            resume.set()
+        self._route_resume.clear()
+
+    async def flush(self) -> None:
+        """Wait for queued packets to be written (or discarded)."""
+        while self.queue_depth and self._task is not None:
+            await asyncio.sleep(BATCH_WINDOW)
+
+    async def write(self, packet: Packet, wait: bool = False) -> bool:
+        """Queue a packet to be written.
+
+        If the packet takes the route over the high watermark, this method will not return
+        until the route's unwritten data has dropped below the low watermark.
+
+        Args:
+            packet: Packet to write.
+            wait: Wait until the packet has been written to the websocket.
+
+        Returns:
+            `True` if the packet was queued (or written if `wait` is `True`), otherwise `False`.
+        """
+        if self._websocket is None:
+            return False
+        # Stream compressed data can only be written to the websocket it was compressed for
+        generation = self._generation
+        sent = asyncio.get_running_loop().create_future() if wait else None
+        packet_type = packet.type
+        lane = PACKET_LANES.get(packet_type, CONTROL_LANE)
+        route_key: str | None = None
+        size = 0
+        flow_controlled = packet_type in FLOW_CONTROLLED
+        if flow_controlled:
+            route_key = packet[1]
+            size = len(packet[2])
+        elif packet_type == PacketType.SESSION_CLOSE:
+            if packet.route_key in self._route_bytes:
+                # Queued behind the session's output, so it doesn't overtake it
+                lane = INTERACTIVE_LANE
+                route_key = packet.route_key
+        if self._compression is not None:
+            # Compressed in the sender's task, which keeps packets for a route in order
+            packet = await self._compression.compress(packet, self.congested)
+        if flow_controlled:
+            route_bytes = self._route_bytes.get(route_key, 0) + size
+            self._route_bytes[route_key] = route_bytes
+        queued = _QueuedPacket(packet, monotonic(), sent, route_key, size, lane)
+        if not await self._put(queued, generation):
+            # Stopped or switched websocket while compressing, or waiting for space in
+            # the lane; queueing now could write the packet out of order
+            self._set_sent([queued], False)
+            if self.on_unsent is not None:
+                self.on_unsent([(route_key, packet)])
+            return False
+        if flow_controlled and route_bytes > self.high_watermark:
+            await self._pause_route(route_key)
+        if sent is None:
+            return True
+        return await sent
+
+    async def _put(self, queued: _QueuedPacket, generation: int) -> bool:
+        """Put a packet in its lane, waiting if the lane is full.
+
+        Args:
+            queued: Packet to queue.
+            generation: The generation of the websocket the packet was written to.
+
+        Returns:
+            `True` if the packet was queued, or `False` if the writer stopped or switched
+                websocket first.
+        """
+        lane = self._lanes[queued.lane]
+        while len(lane) >= lane.max_queue:
+            lane.not_full.clear()
+            await lane.not_full.wait()
+        if self._websocket is None or generation != self._generation:
+            return False
+        lane.append(queued)
+        self._ready.set()
+        return True
+
+    def set_route_weight(self, route_key: str, weight: int) -> None:
+        """Set a route's share of the websocket, relative to other routes.
+
+        Args:
+            route_key: Route key.
+            weight: Route weight (1 is the default).
+        """
+        self._interactive_lane.set_weight(route_key, weight)
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard cached state for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self._encoder.forget_route(route_key)
+        self._interactive_lane.forget_route(route_key)
+
+    async def _pause_route(self, route_key: str) -> None:
+        """Wait for the route's unwritten data to drop below the low watermark.
+
+        Args:
+            route_key: Route key.
+        """
+        resume = self._route_resume.get(route_key)
+        if resume is None:
+            resume = self._route_resume[route_key] = asyncio.Event()
+            self.pause_count += 1
+            log.debug("route %r paused", route_key)
+        await resume.wait()
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get writer metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "frames": self.frame_count,
+            "packets": self.packet_count,
+            "bytes": self.byte_count,
+            "flushes": self.flush_count,
+            "dropped": self.drop_count,
+            "paused_routes": len(self._route_resume),
+            "pauses": self.pause_count,
+            "flush_latency": self.flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "lanes": {
+                name: lane.get_metrics() for name, lane in zip(LANE_NAMES, self._lanes)
+            },
+        }
+
+    async def run(self) -> None:
+        """Write queued packets until cancelled."""
+        ready = self._ready
+        while True:
+            await ready.wait()
+            if self._batch_frames:
+                await asyncio.sleep(BATCH_WINDOW)
+            batch = self._take_batch()
+            if self.queue_depth == 0:
+                ready.clear()
+            if batch:
+                await self._flush(batch)
+
+    def _take_batch(self) -> list[_QueuedPacket]:
+        """Take packets to write, from the highest priority lanes first.
+
+        Session data and bulk packets are limited to a number of bytes per wakeup, so that
+        higher priority packets queued while writing don't have to wait for long.
+
+        Returns:
+            Up to `batch_size` packets.
+        """
+        batch: list[_QueuedPacket] = []
+        for lane, max_bytes in zip(self._lanes, LANE_BATCH_BYTES):
+            remaining = self.batch_size - len(batch)
+            if not remaining:
+                break
+            if lane:
+                batch.extend(lane.take(remaining, max_bytes))
+                if len(lane) < lane.max_queue:
+                    lane.not_full.set()
+        return batch
+
+    async def _flush(self, batch: list[_QueuedPacket]) -> None:
+        """Write a batch of packets.
+
+        Args:
+            batch: Packets to write.
+        """
+        websocket = self._websocket
+        if websocket is None:
+            self._discard(batch)
+            return
+        encoder = self._encoder
+        if self._batch_frames and len(batch) > 1:
+            # Bulk packets are written in their own frame, after the higher priority packets
+            priority = [queued.packet for queued in batch if queued.lane != BULK_LANE]
+            bulk = [queued.packet for queued in batch if queued.lane == BULK_LANE]
+            frames = [
+                encoder.encode_batch(packets) for packets in (priority, bulk) if packets
+            ]
+        else:
+            frames = [encoder.encode(queued.packet) for queued in batch]
+        try:
+            for frame in frames:
+                await websocket.send_bytes(frame)
+        except asyncio.CancelledError:
+            self._set_sent(batch, False)
+            raise
+        except Exception as error:
+            log.debug("Failed to send %d packet(s); %s", len(batch), error)
+            if self._websocket is websocket:
+                # Nothing more can be written until switched to another websocket
+                self._websocket = None
+                if not websocket.closed:
+                    self._close_task = asyncio.create_task(websocket.close())
+            self._discard(batch)
+            return
+
+        write_time = monotonic()
+        latency = write_time - min(queued.queue_time for queued in batch)
+        self.flush_latency += (latency - self.flush_latency) * LATENCY_SMOOTHING
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        lanes = self._lanes
+        for queued in batch:
+            lane = lanes[queued.lane]
+            wait_time = write_time - queued.queue_time
+            lane.packet_count += 1
+            lane.wait_time += (wait_time - lane.wait_time) * LATENCY_SMOOTHING
+            if wait_time > lane.max_wait_time:
+                lane.max_wait_time = wait_time
+        self.flush_count += 1
+        self.frame_count += len(frames)
+        self.packet_count += len(batch)
+        self.byte_count += sum(len(frame) for frame in frames)
+        for queued in batch:
+            log.debug("<SEND> %r", queued.packet)
+        self._set_sent(batch, True)
+
+    def _remove_stream_compressed(self) -> None:
+        """Remove queued stream compressed session data, after switching websocket.
+
+        Other session data for the same routes is also removed, so that the routes' output
+        isn't written out of order. The removed packets are returned as unsent.
+        """
+        lane = self._interactive_lane
+        route_keys = {
+            queued.route_key
+            for queued in lane
+            if queued.packet.type in STREAM_COMPRESSED
+        }
+        if not route_keys:
+            return
+        removed = lane.remove_routes(route_keys, FLOW_CONTROLLED)
+        lane.not_full.set()
+        log.debug(
+            "Removed %d stream compressed packet(s) after switching websocket",
+            len(removed),
+        )
+        self._set_sent(removed, False)
+        if self.on_unsent is not None:
+            removed.sort(key=attrgetter("queue_time"))
+            self.on_unsent([(queued.route_key, queued.packet) for queued in removed])
+
+    def _discard(self, batch: list[_QueuedPacket]) -> None:
+        """Discard a batch which could not be written, and everything still queued.
+
+        Args:
+            batch: Packets taken from the queue, which could not be written.
+        """
+        discarded = list(batch)
+        for lane in self._lanes:
+            discarded.extend(lane.clear())
+            lane.not_full.set()
+        self._ready.clear()
+        if not discarded:
+            return
+        log.debug("Discarded %d unsent packet(s)", len(discarded))
+        self._set_sent(discarded, False)
+        if self.on_unsent is not None:
+            discarded.sort(key=attrgetter("queue_time"))
+            self.on_unsent([(queued.route_key, queued.packet) for queued in discarded])
+
+    def _set_sent(self, batch: list[_QueuedPacket], success: bool) -> None:
+        """Resolve the futures of packets which are being waited on.
+
+        Also updates the unwritten bytes for the packets' routes, and resumes any routes
+        which have dropped below the low watermark.
+
+        Args:
+            batch: Queued packets.
+            success: `True` if the packets were written, otherwise `False`.
+        """
+        if not success:
+            self.drop_count += len(batch)
+        route_bytes = self._route_bytes
+        for queued in batch:
+            if queued.sent is not None and not queued.sent.done():
+                queued.sent.set_result(success)
+            route_key = queued.route_key
+            if route_key is not None and route_key in route_bytes:
+                unwritten = route_bytes[route_key] - queued.size
+                if unwritten > 0:
+                    route_bytes[route_key] = unwritten
+                else:
+                    del route_bytes[route_key]
+                if unwritten <= self.low_watermark and route_key in self._route_resume:
+                    self._route_resume.pop(route_key).set()
+                    log.debug("route %r resumed", route_key)
@@ -1,7 +1,7 @@
 """
 This file is auto-generated from packets.yml and packets.py.template
 
-Time: Wed Aug 21 10:16:06 2024
+Time: Sat Oct 17 03:26:45 2026
 Version: 1
 
 To regenerate run `make packets.py` (in src directory)
@@ -24,6 +24,12 @@ MAX_STRING = 20
 
 def abbreviate_repr(input: object) -> str:
     """Abbreviate any long strings."""
+    if isinstance(input, memoryview):
+        # Payloads may be views of a larger buffer; only copy what is shown
+        cropped = len(input) - MAX_STRING
+        if cropped > 0:
+            return f"{bytes(input[:MAX_STRING])!r}+{cropped}"
+        return repr(bytes(input))
     if isinstance(input, (bytes, str)) and len(input) > MAX_STRING:
         cropped = len(input) - MAX_STRING
         return f"{input[:MAX_STRING]!r}+{cropped}"
@@ -86,6 +92,39 @@ class PacketType(IntEnum):
     # The server requests a chunk of a file from the running app.
     REQUEST_DELIVER_CHUNK = 17  # See RequestDeliverChunk()
 
+    # A packet envelope which has been compressed.
+    COMPRESSED = 18  # See Compressed()
+
+    # Declare a Zstandard dictionary used to compress session data for an app.
+    COMPRESSION_DICTIONARY = 19  # See CompressionDictionary()
+
+    # The server will decompress session data for an app with the declared dictionary.
+    ACCEPT_COMPRESSION_DICTIONARY = 20  # See AcceptCompressionDictionary()
+
+    # Session data compressed with the route's Zstandard stream.
+    COMPRESSED_SESSION_DATA = 21  # See CompressedSessionData()
+
+    # Request the client opens a new connection, before closing the current connection.
+    RECONNECT = 22  # See Reconnect()
+
+    # Report the sessions running on the client, after reconnecting.
+    SESSION_INVENTORY = 23  # See SessionInventory()
+
+    # Sessions in an inventory which have no route on the server.
+    ORPHANED_SESSIONS = 24  # See OrphanedSessions()
+
+    # Declare the optional protocol features supported by the client, on a connection.
+    DECLARE_FEATURES = 25  # See DeclareFeatures()
+
+    # The declared features which the server will use, on a connection.
+    ACCEPT_FEATURES = 26  # See AcceptFeatures()
+
+    # Bind a route to a small integer handle, which may be used in place of the route key.
+    BIND_ROUTE = 27  # See BindRoute()
+
+    # Data for a session, addressed by route handle.
+    COMPACT_SESSION_DATA = 28  # See CompactSessionData()
+
 
 class Packet(tuple):
     """Base class for a packet.
@@ -1246,6 +1285,627 @@ class RequestDeliverChunk(Packet):
         return self[3]
 
 
+# PacketType.COMPRESSED (18)
+class Compressed(Packet):
+    """A packet envelope which has been compressed.
+
+    Args:
+        encoding (str): Compression algorithm.
+        data (bytes): Compressed packet envelope.
+
+    """
+
+    sender: ClassVar[str] = "both"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_compressed"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.COMPRESSED
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("encoding", str),
+        ("data", bytes),
+    ]
+    _attribute_count = 2
+    _get_handler = attrgetter("on_compressed")
+
+    def __new__(cls, encoding: str, data: bytes) -> "Compressed":
+        return tuple.__new__(cls, (PacketType.COMPRESSED, encoding, data))
+
+    @classmethod
+    def build(cls, encoding: str, data: bytes) -> "Compressed":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(encoding, str):
+            raise TypeError(
+                f'packets.Compressed Type of "encoding" incorrect; expected str, found {type(encoding)}'
+            )
+        if not isinstance(data, bytes):
+            raise TypeError(
+                f'packets.Compressed Type of "data" incorrect; expected bytes, found {type(data)}'
+            )
+        return tuple.__new__(cls, (PacketType.COMPRESSED, encoding, data))
+
+    def __repr__(self) -> str:
+        _type, encoding, data = self
+        return f"Compressed({abbreviate_repr(encoding)}, {abbreviate_repr(data)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "encoding", self.encoding
+        yield "data", self.data
+
+    @property
+    def encoding(self) -> str:
+        """Compression algorithm."""
+        return self[1]
+
+    @property
+    def data(self) -> bytes:
+        """Compressed packet envelope."""
+        return self[2]
+
+
+# PacketType.COMPRESSION_DICTIONARY (19)
+class CompressionDictionary(Packet):
+    """Declare a Zstandard dictionary used to compress session data for an app.
+
+    Args:
+        slug (str): App slug.
+        dictionary_id (int): Dictionary ID.
+        data (bytes): Dictionary data.
+
+    """
+
+    sender: ClassVar[str] = "client"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_compression_dictionary"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.COMPRESSION_DICTIONARY
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("slug", str),
+        ("dictionary_id", int),
+        ("data", bytes),
+    ]
+    _attribute_count = 3
+    _get_handler = attrgetter("on_compression_dictionary")
+
+    def __new__(
+        cls, slug: str, dictionary_id: int, data: bytes
+    ) -> "CompressionDictionary":
+        return tuple.__new__(
+            cls, (PacketType.COMPRESSION_DICTIONARY, slug, dictionary_id, data)
+        )
+
+    @classmethod
+    def build(
+        cls, slug: str, dictionary_id: int, data: bytes
+    ) -> "CompressionDictionary":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(slug, str):
+            raise TypeError(
+                f'packets.CompressionDictionary Type of "slug" incorrect; expected str, found {type(slug)}'
+            )
+        if not isinstance(dictionary_id, int):
+            raise TypeError(
+                f'packets.CompressionDictionary Type of "dictionary_id" incorrect; expected int, found {type(dictionary_id)}'
+            )
+        if not isinstance(data, bytes):
+            raise TypeError(
+                f'packets.CompressionDictionary Type of "data" incorrect; expected bytes, found {type(data)}'
+            )
+        return tuple.__new__(
+            cls, (PacketType.COMPRESSION_DICTIONARY, slug, dictionary_id, data)
+        )
+
+    def __repr__(self) -> str:
+        _type, slug, dictionary_id, data = self
+        return f"CompressionDictionary({abbreviate_repr(slug)}, {abbreviate_repr(dictionary_id)}, {abbreviate_repr(data)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "slug", self.slug
+        yield "dictionary_id", self.dictionary_id
+        yield "data", self.data
+
+    @property
+    def slug(self) -> str:
+        """App slug."""
+        return self[1]
+
+    @property
+    def dictionary_id(self) -> int:
+        """Dictionary ID."""
+        return self[2]
+
+    @property
+    def data(self) -> bytes:
+        """Dictionary data."""
+        return self[3]
+
+
+# PacketType.ACCEPT_COMPRESSION_DICTIONARY (20)
+class AcceptCompressionDictionary(Packet):
+    """The server will decompress session data for an app with the declared dictionary.
+
+    Args:
+        slug (str): App slug.
+        dictionary_id (int): Dictionary ID.
+
+    """
+
+    sender: ClassVar[str] = "server"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_accept_compression_dictionary"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.ACCEPT_COMPRESSION_DICTIONARY
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("slug", str),
+        ("dictionary_id", int),
+    ]
+    _attribute_count = 2
+    _get_handler = attrgetter("on_accept_compression_dictionary")
+
+    def __new__(cls, slug: str, dictionary_id: int) -> "AcceptCompressionDictionary":
+        return tuple.__new__(
+            cls, (PacketType.ACCEPT_COMPRESSION_DICTIONARY, slug, dictionary_id)
+        )
+
+    @classmethod
+    def build(cls, slug: str, dictionary_id: int) -> "AcceptCompressionDictionary":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(slug, str):
+            raise TypeError(
+                f'packets.AcceptCompressionDictionary Type of "slug" incorrect; expected str, found {type(slug)}'
+            )
+        if not isinstance(dictionary_id, int):
+            raise TypeError(
+                f'packets.AcceptCompressionDictionary Type of "dictionary_id" incorrect; expected int, found {type(dictionary_id)}'
+            )
+        return tuple.__new__(
+            cls, (PacketType.ACCEPT_COMPRESSION_DICTIONARY, slug, dictionary_id)
+        )
+
+    def __repr__(self) -> str:
+        _type, slug, dictionary_id = self
+        return f"AcceptCompressionDictionary({abbreviate_repr(slug)}, {abbreviate_repr(dictionary_id)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "slug", self.slug
+        yield "dictionary_id", self.dictionary_id
+
+    @property
+    def slug(self) -> str:
+        """App slug."""
+        return self[1]
+
+    @property
+    def dictionary_id(self) -> int:
+        """Dictionary ID."""
+        return self[2]
+
+
+# PacketType.COMPRESSED_SESSION_DATA (21)
+class CompressedSessionData(Packet):
+    """Session data compressed with the route's Zstandard stream.
+
+    Args:
+        route_key (str): Route key.
+        data (bytes): Compressed data for a remote app.
+
+    """
+
+    sender: ClassVar[str] = "client"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_compressed_session_data"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.COMPRESSED_SESSION_DATA
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("route_key", str),
+        ("data", bytes),
+    ]
+    _attribute_count = 2
+    _get_handler = attrgetter("on_compressed_session_data")
+
+    def __new__(cls, route_key: str, data: bytes) -> "CompressedSessionData":
+        return tuple.__new__(cls, (PacketType.COMPRESSED_SESSION_DATA, route_key, data))
+
+    @classmethod
+    def build(cls, route_key: str, data: bytes) -> "CompressedSessionData":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(route_key, str):
+            raise TypeError(
+                f'packets.CompressedSessionData Type of "route_key" incorrect; expected str, found {type(route_key)}'
+            )
+        if not isinstance(data, bytes):
+            raise TypeError(
+                f'packets.CompressedSessionData Type of "data" incorrect; expected bytes, found {type(data)}'
+            )
+        return tuple.__new__(cls, (PacketType.COMPRESSED_SESSION_DATA, route_key, data))
+
+    def __repr__(self) -> str:
+        _type, route_key, data = self
+        return f"CompressedSessionData({abbreviate_repr(route_key)}, {abbreviate_repr(data)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "route_key", self.route_key
+        yield "data", self.data
+
+    @property
+    def route_key(self) -> str:
+        """Route key."""
+        return self[1]
+
+    @property
+    def data(self) -> bytes:
+        """Compressed data for a remote app."""
+        return self[2]
+
+
+# PacketType.RECONNECT (22)
+class Reconnect(Packet):
+    """Request the client opens a new connection, before closing the current connection.
+
+    Args:
+        reason (str): Reason for the reconnect (for logging).
+
+    """
+
+    sender: ClassVar[str] = "server"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_reconnect"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.RECONNECT
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("reason", str),
+    ]
+    _attribute_count = 1
+    _get_handler = attrgetter("on_reconnect")
+
+    def __new__(cls, reason: str) -> "Reconnect":
+        return tuple.__new__(cls, (PacketType.RECONNECT, reason))
+
+    @classmethod
+    def build(cls, reason: str) -> "Reconnect":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(reason, str):
+            raise TypeError(
+                f'packets.Reconnect Type of "reason" incorrect; expected str, found {type(reason)}'
+            )
+        return tuple.__new__(cls, (PacketType.RECONNECT, reason))
+
+    def __repr__(self) -> str:
+        _type, reason = self
+        return f"Reconnect({abbreviate_repr(reason)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "reason", self.reason
+
+    @property
+    def reason(self) -> str:
+        """Reason for the reconnect (for logging)."""
+        return self[1]
+
+
+# PacketType.SESSION_INVENTORY (23)
+class SessionInventory(Packet):
+    """Report the sessions running on the client, after reconnecting.
+
+    Args:
+        sessions (list): List of [session_id, route_key] pairs.
+
+    """
+
+    sender: ClassVar[str] = "client"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_session_inventory"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.SESSION_INVENTORY
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("sessions", list),
+    ]
+    _attribute_count = 1
+    _get_handler = attrgetter("on_session_inventory")
+
+    def __new__(cls, sessions: list) -> "SessionInventory":
+        return tuple.__new__(cls, (PacketType.SESSION_INVENTORY, sessions))
+
+    @classmethod
+    def build(cls, sessions: list) -> "SessionInventory":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(sessions, list):
+            raise TypeError(
+                f'packets.SessionInventory Type of "sessions" incorrect; expected list, found {type(sessions)}'
+            )
+        return tuple.__new__(cls, (PacketType.SESSION_INVENTORY, sessions))
+
+    def __repr__(self) -> str:
+        _type, sessions = self
+        return f"SessionInventory({abbreviate_repr(sessions)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "sessions", self.sessions
+
+    @property
+    def sessions(self) -> list:
+        """List of [session_id, route_key] pairs."""
+        return self[1]
+
+
+# PacketType.ORPHANED_SESSIONS (24)
+class OrphanedSessions(Packet):
+    """Sessions in an inventory which have no route on the server.
+
+    Args:
+        session_ids (list): Session identities.
+
+    """
+
+    sender: ClassVar[str] = "server"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_orphaned_sessions"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.ORPHANED_SESSIONS
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("session_ids", list),
+    ]
+    _attribute_count = 1
+    _get_handler = attrgetter("on_orphaned_sessions")
+
+    def __new__(cls, session_ids: list) -> "OrphanedSessions":
+        return tuple.__new__(cls, (PacketType.ORPHANED_SESSIONS, session_ids))
+
+    @classmethod
+    def build(cls, session_ids: list) -> "OrphanedSessions":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(session_ids, list):
+            raise TypeError(
+                f'packets.OrphanedSessions Type of "session_ids" incorrect; expected list, found {type(session_ids)}'
+            )
+        return tuple.__new__(cls, (PacketType.ORPHANED_SESSIONS, session_ids))
+
+    def __repr__(self) -> str:
+        _type, session_ids = self
+        return f"OrphanedSessions({abbreviate_repr(session_ids)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "session_ids", self.session_ids
+
+    @property
+    def session_ids(self) -> list:
+        """Session identities."""
+        return self[1]
+
+
+# PacketType.DECLARE_FEATURES (25)
+class DeclareFeatures(Packet):
+    """Declare the optional protocol features supported by the client, on a connection.
+
+    Args:
+        features (list): Names of the features.
+
+    """
+
+    sender: ClassVar[str] = "client"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_declare_features"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.DECLARE_FEATURES
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("features", list),
+    ]
+    _attribute_count = 1
+    _get_handler = attrgetter("on_declare_features")
+
+    def __new__(cls, features: list) -> "DeclareFeatures":
+        return tuple.__new__(cls, (PacketType.DECLARE_FEATURES, features))
+
+    @classmethod
+    def build(cls, features: list) -> "DeclareFeatures":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(features, list):
+            raise TypeError(
+                f'packets.DeclareFeatures Type of "features" incorrect; expected list, found {type(features)}'
+            )
+        return tuple.__new__(cls, (PacketType.DECLARE_FEATURES, features))
+
+    def __repr__(self) -> str:
+        _type, features = self
+        return f"DeclareFeatures({abbreviate_repr(features)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "features", self.features
+
+    @property
+    def features(self) -> list:
+        """Names of the features."""
+        return self[1]
+
+
+# PacketType.ACCEPT_FEATURES (26)
+class AcceptFeatures(Packet):
+    """The declared features which the server will use, on a connection.
+
+    Args:
+        features (list): Names of the features.
+
+    """
+
+    sender: ClassVar[str] = "server"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_accept_features"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.ACCEPT_FEATURES
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("features", list),
+    ]
+    _attribute_count = 1
+    _get_handler = attrgetter("on_accept_features")
+
+    def __new__(cls, features: list) -> "AcceptFeatures":
+        return tuple.__new__(cls, (PacketType.ACCEPT_FEATURES, features))
+
+    @classmethod
+    def build(cls, features: list) -> "AcceptFeatures":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(features, list):
+            raise TypeError(
+                f'packets.AcceptFeatures Type of "features" incorrect; expected list, found {type(features)}'
+            )
+        return tuple.__new__(cls, (PacketType.ACCEPT_FEATURES, features))
+
+    def __repr__(self) -> str:
+        _type, features = self
+        return f"AcceptFeatures({abbreviate_repr(features)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "features", self.features
+
+    @property
+    def features(self) -> list:
+        """Names of the features."""
+        return self[1]
+
+
+# PacketType.BIND_ROUTE (27)
+class BindRoute(Packet):
+    """Bind a route to a small integer handle, which may be used in place of the route key.
+
+    Only sent when the server accepts the "route_handles" feature. Handles only apply to
+    session data (see CompactSessionData). Other packets for a route, such as Focus,
+    Blur, RoutePing, RoutePong, BinaryEncodedMessage, and SessionClose, always carry the
+    route key.
+
+    Args:
+        route_key (str): Route key.
+        handle (int): Route handle.
+
+    """
+
+    sender: ClassVar[str] = "client"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_bind_route"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.BIND_ROUTE
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("route_key", str),
+        ("handle", int),
+    ]
+    _attribute_count = 2
+    _get_handler = attrgetter("on_bind_route")
+
+    def __new__(cls, route_key: str, handle: int) -> "BindRoute":
+        return tuple.__new__(cls, (PacketType.BIND_ROUTE, route_key, handle))
+
+    @classmethod
+    def build(cls, route_key: str, handle: int) -> "BindRoute":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(route_key, str):
+            raise TypeError(
+                f'packets.BindRoute Type of "route_key" incorrect; expected str, found {type(route_key)}'
+            )
+        if not isinstance(handle, int):
+            raise TypeError(
+                f'packets.BindRoute Type of "handle" incorrect; expected int, found {type(handle)}'
+            )
+        return tuple.__new__(cls, (PacketType.BIND_ROUTE, route_key, handle))
+
+    def __repr__(self) -> str:
+        _type, route_key, handle = self
+        return f"BindRoute({abbreviate_repr(route_key)}, {abbreviate_repr(handle)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "route_key", self.route_key
+        yield "handle", self.handle
+
+    @property
+    def route_key(self) -> str:
+        """Route key."""
+        return self[1]
+
+    @property
+    def handle(self) -> int:
+        """Route handle."""
+        return self[2]
+
+
+# PacketType.COMPACT_SESSION_DATA (28)
+class CompactSessionData(Packet):
+    """Data for a session, addressed by route handle.
+
+    Equivalent to SessionData, for a route bound with BindRoute. This is the only packet
+    which may be addressed by route handle.
+
+    Args:
+        handle (int): Route handle.
+        data (bytes): Data for a remote app.
+
+    """
+
+    sender: ClassVar[str] = "both"
+    """Permitted sender, should be "client", "server", or "both"."""
+    handler_name: ClassVar[str] = "on_compact_session_data"
+    """Name of the method used to handle this packet."""
+    type: ClassVar[PacketType] = PacketType.COMPACT_SESSION_DATA
+    """The packet type enumeration."""
+
+    _attributes: ClassVar[list[tuple[str, Type]]] = [
+        ("handle", int),
+        ("data", bytes),
+    ]
+    _attribute_count = 2
+    _get_handler = attrgetter("on_compact_session_data")
+
+    def __new__(cls, handle: int, data: bytes) -> "CompactSessionData":
+        return tuple.__new__(cls, (PacketType.COMPACT_SESSION_DATA, handle, data))
+
+    @classmethod
+    def build(cls, handle: int, data: bytes) -> "CompactSessionData":
+        """Build and validate a packet from its attributes."""
+        if not isinstance(handle, int):
+            raise TypeError(
+                f'packets.CompactSessionData Type of "handle" incorrect; expected int, found {type(handle)}'
+            )
+        if not isinstance(data, bytes):
+            raise TypeError(
+                f'packets.CompactSessionData Type of "data" incorrect; expected bytes, found {type(data)}'
+            )
+        return tuple.__new__(cls, (PacketType.COMPACT_SESSION_DATA, handle, data))
+
+    def __repr__(self) -> str:
+        _type, handle, data = self
+        return f"CompactSessionData({abbreviate_repr(handle)}, {abbreviate_repr(data)})"
+
+    def __rich_repr__(self) -> rich.repr.Result:
+        yield "handle", self.handle
+        yield "data", self.data
+
+    @property
+    def handle(self) -> int:
+        """Route handle."""
+        return self[1]
+
+    @property
+    def data(self) -> bytes:
+        """Data for a remote app."""
+        return self[2]
+
+
 # A mapping of the packet id on to the packet class
 PACKET_MAP: dict[int, type[Packet]] = {
     1: Ping,
@@ -1265,6 +1925,17 @@ PACKET_MAP: dict[int, type[Packet]] = {
     15: BinaryEncodedMessage,
     16: DeliverFileStart,
     17: RequestDeliverChunk,
+    18: Compressed,
+    19: CompressionDictionary,
+    20: AcceptCompressionDictionary,
+    21: CompressedSessionData,
+    22: Reconnect,
+    23: SessionInventory,
+    24: OrphanedSessions,
+    25: DeclareFeatures,
+    26: AcceptFeatures,
+    27: BindRoute,
+    28: CompactSessionData,
 }
 
 # A mapping of the packet name on to the packet class
@@ -1286,6 +1957,17 @@ PACKET_NAME_MAP: dict[str, type[Packet]] = {
     "binaryencodedmessage": BinaryEncodedMessage,
     "deliverfilestart": DeliverFileStart,
     "requestdeliverchunk": RequestDeliverChunk,
+    "compressed": Compressed,
+    "compressiondictionary": CompressionDictionary,
+    "acceptcompressiondictionary": AcceptCompressionDictionary,
+    "compressedsessiondata": CompressedSessionData,
+    "reconnect": Reconnect,
+    "sessioninventory": SessionInventory,
+    "orphanedsessions": OrphanedSessions,
+    "declarefeatures": DeclareFeatures,
+    "acceptfeatures": AcceptFeatures,
+    "bindroute": BindRoute,
+    "compactsessiondata": CompactSessionData,
 }
 
 
@@ -1370,6 +2052,52 @@ class Handlers:
         """The server requests a chunk of a file from the running app."""
         await self.on_default(packet)
 
+    async def on_compressed(self, packet: Compressed) -> None:
+        """A packet envelope which has been compressed."""
+        await self.on_default(packet)
+
+    async def on_compression_dictionary(self, packet: CompressionDictionary) -> None:
+        """Declare a Zstandard dictionary used to compress session data for an app."""
+        await self.on_default(packet)
+
+    async def on_accept_compression_dictionary(
+        self, packet: AcceptCompressionDictionary
+    ) -> None:
+        """The server will decompress session data for an app with the declared dictionary."""
+        await self.on_default(packet)
+
+    async def on_compressed_session_data(self, packet: CompressedSessionData) -> None:
+        """Session data compressed with the route's Zstandard stream."""
+        await self.on_default(packet)
+
+    async def on_reconnect(self, packet: Reconnect) -> None:
+        """Request the client opens a new connection, before closing the current connection."""
+        await self.on_default(packet)
+
+    async def on_session_inventory(self, packet: SessionInventory) -> None:
+        """Report the sessions running on the client, after reconnecting."""
+        await self.on_default(packet)
+
+    async def on_orphaned_sessions(self, packet: OrphanedSessions) -> None:
+        """Sessions in an inventory which have no route on the server."""
+        await self.on_default(packet)
+
+    async def on_declare_features(self, packet: DeclareFeatures) -> None:
+        """Declare the optional protocol features supported by the client, on a connection."""
+        await self.on_default(packet)
+
+    async def on_accept_features(self, packet: AcceptFeatures) -> None:
+        """The declared features which the server will use, on a connection."""
+        await self.on_default(packet)
+
+    async def on_bind_route(self, packet: BindRoute) -> None:
+        """Bind a route to a small integer handle, which may be used in place of the route key."""
+        await self.on_default(packet)
+
+    async def on_compact_session_data(self, packet: CompactSessionData) -> None:
+        """Data for a session, addressed by route handle."""
+        await self.on_default(packet)
+
     async def on_default(self, packet: Packet) -> None:
         """Called when a packet is not handled."""
 
@@ -5,7 +5,11 @@ from dataclasses import dataclass, field
 from collections import deque
 import os
 import selectors
-from threading import Thread, Event
+from threading import Event, Lock, Thread
+
+MAX_QUEUED_READS = 8
+"""Reads queued for a file (each up to 32KB) which pause reading, until the queue has
+drained to half of this."""
 
 
 @dataclass
@@ -18,7 +22,12 @@ class Write:
 
 
 class Poller(Thread):
-    """A thread which reads from file descriptors and posts read data to a queue."""
+    """A thread which reads from file descriptors and posts read data to a queue.
+
+    Reading from a file is paused while its queue is full (see `MAX_QUEUED_READS`), so
+    that a slow consumer stops the process at the other end of the file, rather than
+    data accumulating in memory.
+    """
 
     def __init__(self) -> None:
         super().__init__()
@@ -26,6 +35,8 @@ class Poller(Thread):
         self._selector = selectors.DefaultSelector()
         self._read_queues: dict[int, asyncio.Queue[bytes | None]] = {}
         self._write_queues: dict[int, deque[Write]] = {}
+        self._paused_reads: set[int] = set()
+        self._selector_lock = Lock()
         self._exit_event = Event()
 
     def add_file(self, file_descriptor: int) -> asyncio.Queue:
@@ -49,9 +60,80 @@ class Poller(Thread):
         Args:
             file_descriptor: File descriptor.
         """
-        self._selector.unregister(file_descriptor)
-        self._read_queues.pop(file_descriptor, None)
-        self._write_queues.pop(file_descriptor, None)
+        with self._selector_lock:
+            self._read_queues.pop(file_descriptor, None)
+            write_queue = self._write_queues.pop(file_descriptor, None)
+            self._paused_reads.discard(file_descriptor)
+            if file_descriptor in self._selector.get_map():
+                self._selector.unregister(file_descriptor)
+        # Release writers waiting for a file which will never be written
+        for write in write_queue or ():
+            write.done_event.set()
+
+    def _update_events(self, file_descriptor: int, write: bool) -> None:
+        """Update the events selected for a file descriptor.
+
+        Called from both the poller thread and the event loop. A file which is paused,
+        and has nothing to write, is unregistered until there is.
+
+        Args:
+            file_descriptor: File descriptor.
+            write: Select writeable events.
+        """
+        events = selectors.EVENT_WRITE if write else 0
+        if file_descriptor not in self._paused_reads:
+            events |= selectors.EVENT_READ
+        selector = self._selector
+        with self._selector_lock:
+            if file_descriptor not in self._read_queues:
+                return
+            registered = file_descriptor in selector.get_map()
+            if not events:
+                if registered:
+                    selector.unregister(file_descriptor)
+            elif registered:
+                selector.modify(file_descriptor, events)
+            else:
+                selector.register(file_descriptor, events)
+
+    def _on_read(self, file_descriptor: int, data: bytes | None) -> None:
+        """Queue data read from a file, and pause reading if the queue is full.
+
+        Args:
+            file_descriptor: File descriptor.
+            data: Data read, or `None` at the end of the file.
+        """
+        queue = self._read_queues.get(file_descriptor, None)
+        if queue is None:
+            return
+        queue.put_nowait(data)
+        if queue.qsize() >= MAX_QUEUED_READS:
+            # Also repeated if the poller thread was reading when the file was paused
+            self._paused_reads.add(file_descriptor)
+            self._update_events(
+                file_descriptor, bool(self._write_queues.get(file_descriptor))
+            )
+
+    async def read(self, file_descriptor: int) -> bytes | None:
+        """Read data from a file descriptor.
+
+        Args:
+            file_descriptor: File descriptor.
+
+        Returns:
+            Data, or `None` at the end of the file.
+        """
+        queue = self._read_queues[file_descriptor]
+        data = await queue.get()
+        if (
+            file_descriptor in self._paused_reads
+            and queue.qsize() <= MAX_QUEUED_READS // 2
+        ):
+            self._paused_reads.discard(file_descriptor)
+            self._update_events(
+                file_descriptor, bool(self._write_queues.get(file_descriptor))
+            )
+        return data
 
     async def write(self, file_descriptor: int, data: bytes) -> None:
         """Write data to a file descriptor.
@@ -64,11 +146,20 @@ class Poller(Thread):
             self._write_queues[file_descriptor] = deque()
         new_write = Write(data)
         self._write_queues[file_descriptor].append(new_write)
-        self._selector.modify(
-            file_descriptor, selectors.EVENT_READ | selectors.EVENT_WRITE
-        )
+        self._update_events(file_descriptor, True)
         await new_write.done_event.wait()
 
+    def _discard_writes(self, file_descriptor: int) -> None:
+        """Discard the data waiting to be written to a file.
+
+        Args:
+            file_descriptor: File descriptor.
+        """
+        write_queue = self._write_queues.pop(file_descriptor, None)
+        for write in write_queue or ():
+            write.done_event.set()
+        self._update_events(file_descriptor, False)
+
     def set_loop(self, loop: asyncio.AbstractEventLoop) -> None:
         """Set the asyncio loop.
 
@@ -99,24 +190,30 @@ class Poller(Thread):
                         try:
                             data = os.read(file_descriptor, 1024 * 32) or None
                         except Exception:
-                            loop.call_soon_threadsafe(queue.put_nowait, None)
-                        else:
-                            loop.call_soon_threadsafe(queue.put_nowait, data)
+                            data = None
+                        loop.call_soon_threadsafe(self._on_read, file_descriptor, data)
 
                     if event_mask & writeable_events:
                         write_queue = self._write_queues.get(file_descriptor, None)
                         if write_queue:
                             write = write_queue[0]
-                            bytes_written = os.write(
-                                file_descriptor, write.data[write.position :]
-                            )
+                            try:
+                                bytes_written = os.write(
+                                    file_descriptor, write.data[write.position :]
+                                )
+                            except OSError:
+                                # The process has exited; discard what it didn't read
+                                loop.call_soon_threadsafe(
+                                    self._discard_writes, file_descriptor
+                                )
+                                continue
                             if bytes_written == len(write.data):
                                 write_queue.popleft()
                                 loop.call_soon_threadsafe(write.done_event.set)
                             else:
                                 write.position += bytes_written
                         else:
-                            selector.modify(file_descriptor, readable_events)
+                            self._update_events(file_descriptor, False)
 
     def exit(self) -> None:
         """Exit and block until finished."""
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+from collections import deque
+import logging
+from time import monotonic
+from typing import Iterable
+
+from .packets import Packet, PacketType
+
+log = logging.getLogger("textual-web")
+
+REPLAY_BYTES = 512 * 1024
+"""Maximum bytes of session data to buffer per route."""
+REPLAY_AGE = 30.0
+"""Maximum age (in seconds) of buffered session data."""
+SUMMARY_INTERVAL = 10.0
+"""Minimum time (in seconds) between summary log messages."""
+
+REPLAYABLE = {PacketType.SESSION_DATA}
+"""Packet types which may be buffered and sent after reconnecting."""
+REPAINTABLE = {
+    PacketType.SESSION_DATA,
+    PacketType.COMPRESSED_SESSION_DATA,
+    PacketType.COMPRESSED,
+}
+"""Packet types which are recovered by a repaint, if they can't be replayed."""
+
+
+class RouteReplay:
+    """Session data for a single route, waiting to be replayed."""
+
+    def __init__(self) -> None:
+        self.packets: deque[tuple[float, Packet]] = deque()
+        """Buffered packets, and the time they were buffered."""
+        self.size = 0
+        """Bytes of session data in the buffer."""
+        self.overflowed = False
+        """Data was lost, and the route must be repainted."""
+
+    def add(self, packet: Packet, max_bytes: int, max_age: float) -> None:
+        """Add a packet, or mark the route as overflowed.
+
+        Args:
+            packet: Packet to buffer.
+            max_bytes: Maximum bytes to buffer.
+            max_age: Maximum age of the oldest packet.
+        """
+        if self.overflowed:
+            return
+        if packet.type not in REPLAYABLE:
+            self.overflow()
+            return
+        now = monotonic()
+        size = len(packet[2])
+        if self.size + size > max_bytes or (
+            self.packets and now - self.packets[0][0] > max_age
+        ):
+            self.overflow()
+            return
+        self.packets.append((now, packet))
+        self.size += size
+
+    def prepend(self, packets: list[Packet], max_bytes: int) -> None:
+        """Add packets to the start of the buffer, or mark the route as overflowed.
+
+        Args:
+            packets: Packets which are older than any in the buffer, in order.
+            max_bytes: Maximum bytes to buffer.
+        """
+        if self.overflowed:
+            return
+        if any(packet.type not in REPLAYABLE for packet in packets):
+            self.overflow()
+            return
+        size = sum(len(packet[2]) for packet in packets)
+        if self.size + size > max_bytes:
+            self.overflow()
+            return
+        buffer_time = self.packets[0][0] if self.packets else monotonic()
+        self.packets.extendleft((buffer_time, packet) for packet in reversed(packets))
+        self.size += size
+
+    def pop(self) -> Packet:
+        """Remove the oldest packet.
+
+        Returns:
+            A session data packet.
+        """
+        _buffer_time, packet = self.packets.popleft()
+        self.size -= len(packet[2])
+        return packet
+
+    def restore(self, packet: Packet) -> None:
+        """Return a packet removed with `pop` to the start of the buffer.
+
+        Args:
+            packet: A session data packet.
+        """
+        self.packets.appendleft((monotonic(), packet))
+        self.size += len(packet[2])
+
+    def overflow(self) -> None:
+        """Discard buffered data, so that the route is repainted."""
+        self.packets.clear()
+        self.size = 0
+        self.overflowed = True
+
+    def expire(self, max_age: float) -> None:
+        """Overflow if the oldest packet is older than the maximum age.
+
+        Args:
+            max_age: Maximum age of the oldest packet.
+        """
+        if self.packets and monotonic() - self.packets[0][0] > max_age:
+            self.overflow()
+
+
+class ReplayBuffer:
+    """Buffers session data which couldn't be sent, to send after reconnecting.
+
+    Each route's buffer is bounded by bytes and age. If a route's buffer overflows, its
+    data is discarded and the session is asked to repaint after reconnecting, rather
+    than sending the remaining (incomplete) output.
+
+    Failures are counted, and logged as a periodic summary.
+    """
+
+    def __init__(
+        self, max_bytes: int = REPLAY_BYTES, max_age: float = REPLAY_AGE
+    ) -> None:
+        """
+        Args:
+            max_bytes: Maximum bytes to buffer per route.
+            max_age: Maximum age (in seconds) of buffered data.
+        """
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._routes: dict[str, RouteReplay] = {}
+        self._last_summary_time = monotonic()
+
+        self.buffered_count = 0
+        """Number of packets buffered."""
+        self.buffered_bytes = 0
+        """Bytes of session data buffered."""
+        self.replayed_count = 0
+        """Number of packets replayed."""
+        self.overflow_count = 0
+        """Number of times a route overflowed."""
+        self.repaint_count = 0
+        """Number of repaints requested."""
+        self.drop_count = 0
+        """Number of packets (not session data) which could not be sent."""
+        self._summary_counts = (0, 0, 0)
+
+    def __bool__(self) -> bool:
+        return bool(self._routes)
+
+    def is_buffering(self, route_key: str) -> bool:
+        """Check if a route has data waiting to be replayed.
+
+        Args:
+            route_key: Route key.
+
+        Returns:
+            `True` if new data for the route should be added to the buffer.
+        """
+        return route_key in self._routes
+
+    def add(self, route_key: str, packet: Packet) -> None:
+        """Buffer session data which couldn't be sent.
+
+        Args:
+            route_key: Route key.
+            packet: Session data packet.
+        """
+        route = self._routes.get(route_key)
+        if route is None:
+            route = self._routes[route_key] = RouteReplay()
+        if not route.overflowed:
+            route.add(packet, self.max_bytes, self.max_age)
+            if route.overflowed:
+                self.overflow_count += 1
+            else:
+                self.buffered_count += 1
+                self.buffered_bytes += len(packet[2])
+        self.log_summary()
+
+    def add_unsent(self, unsent: Iterable[tuple[str | None, Packet]]) -> None:
+        """Handle packets which were queued, but not written.
+
+        Unsent packets for a route which is already buffering were written while replaying,
+        so they go before the packets which are still waiting.
+
+        Args:
+            unsent: Pairs of route key (if known) and packet, in the order they were queued.
+        """
+        replaying: dict[str, list[Packet]] = {
+            route_key: [] for route_key in self._routes
+        }
+        for route_key, packet in unsent:
+            if route_key is None or packet.type not in REPAINTABLE:
+                self.drop(packet)
+            elif route_key in replaying:
+                replaying[route_key].append(packet)
+            else:
+                self.add(route_key, packet)
+        for route_key, packets in replaying.items():
+            if packets:
+                route = self._routes[route_key]
+                overflowed = route.overflowed
+                route.prepend(packets, self.max_bytes)
+                if route.overflowed and not overflowed:
+                    self.overflow_count += 1
+
+    def drop(self, packet: Packet) -> None:
+        """Count a packet which could not be sent, and won't be replayed.
+
+        Args:
+            packet: Packet.
+        """
+        self.drop_count += 1
+        log.debug("Failed to send %r", packet)
+        self.log_summary()
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard buffered data for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self._routes.pop(route_key, None)
+
+    def take_route(self, route_key: str) -> RouteReplay | None:
+        """Take a route's buffer, to replay it.
+
+        New data for the route should continue to be added to the buffer, until it is
+        empty, which keeps it in order.
+
+        Args:
+            route_key: Route key.
+
+        Returns:
+            Buffered data, or `None` if the route has no buffered data.
+        """
+        route = self._routes.get(route_key)
+        if route is not None and not route.overflowed:
+            route.expire(self.max_age)
+            if route.overflowed:
+                self.overflow_count += 1
+        return route
+
+    def done_route(self, route_key: str) -> None:
+        """Called when a route's buffer has been replayed.
+
+        Args:
+            route_key: Route key.
+        """
+        route = self._routes.get(route_key)
+        if route is not None and not route.packets:
+            del self._routes[route_key]
+
+    @property
+    def route_keys(self) -> list[str]:
+        """Routes with buffered data."""
+        return list(self._routes)
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get replay metrics.
+
+        Returns:
+            A dict of metrics.
+        """
+        return {
+            "routes": len(self._routes),
+            "buffered": self.buffered_count,
+            "buffered_bytes": self.buffered_bytes,
+            "replayed": self.replayed_count,
+            "overflows": self.overflow_count,
+            "repaints": self.repaint_count,
+            "dropped": self.drop_count,
+        }
+
+    def log_summary(self, force: bool = False) -> None:
+        """Log a summary of buffered and dropped packets, at most every SUMMARY_INTERVAL.
+
+        Args:
+            force: Log now, if anything has changed since the last summary.
+        """
+        now = monotonic()
+        if not force and now - self._last_summary_time < SUMMARY_INTERVAL:
+            return
+        counts = (self.buffered_count, self.overflow_count, self.drop_count)
+        if counts == self._summary_counts:
+            return
+        self._last_summary_time = now
+        buffered, overflowed, dropped = (
+            count - last_count
+            for count, last_count in zip(counts, self._summary_counts)
+        )
+        self._summary_counts = counts
+        log.warning(
+            "Unable to send to Ganglion; %d packet(s) buffered, %d route(s) overflowed, %d packet(s) dropped",
+            buffered,
+            overflowed,
+            dropped,
+        )
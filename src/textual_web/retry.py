@@ -1,53 +1,218 @@
 from __future__ import annotations
 
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Mapping
 from asyncio import Event, TimeoutError, wait_for
-from random import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from random import random, uniform
+from time import monotonic
 import logging
 
 log = logging.getLogger("textual-web")
 
+MAX_RETRY_AFTER = 300.0
+"""Maximum delay (in seconds) accepted from a server's retry-after hint."""
+RETRY_AFTER_PREFIX = "retry-after:"
+"""Prefix of an Info message from the server, with a retry-after hint."""
+CONNECT_RATE = 1.0
+"""Connection attempts permitted per second (on average), by each client."""
+CONNECT_BURST = 4
+"""Connection attempts permitted at once, by each client."""
+
+
+def parse_retry_after(value: str) -> float | None:
+    """Parse a retry-after hint, as in the HTTP `Retry-After` header.
+
+    Args:
+        value: A delay in seconds, or an HTTP date.
+
+    Returns:
+        Delay in seconds, or `None` if the value couldn't be parsed.
+    """
+    value = value.strip()
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_time = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_time.tzinfo is None:
+            retry_time = retry_time.replace(tzinfo=timezone.utc)
+        delay = (retry_time - datetime.now(timezone.utc)).total_seconds()
+    if delay != delay:
+        # NaN
+        return None
+    return min(MAX_RETRY_AFTER, max(0.0, delay))
+
+
+def get_retry_after(headers: Mapping[str, str] | None) -> float | None:
+    """Get the retry-after hint from the headers of a refused websocket handshake.
+
+    Args:
+        headers: Response headers.
+
+    Returns:
+        Delay in seconds, or `None` if there is no hint.
+    """
+    if not headers:
+        return None
+    value = headers.get("Retry-After")
+    return None if value is None else parse_retry_after(value)
+
+
+def get_info_retry_after(message: str) -> float | None:
+    """Get the retry-after hint from an Info message, such as "Retry-After: 30".
+
+    Args:
+        message: Info message.
+
+    Returns:
+        Delay in seconds, or `None` if the message isn't a retry-after hint.
+    """
+    if message[: len(RETRY_AFTER_PREFIX)].lower() != RETRY_AFTER_PREFIX:
+        return None
+    return parse_retry_after(message[len(RETRY_AFTER_PREFIX) :])
+
+
+class TokenBucket:
+    """Limits the rate of an action (connection attempts), while permitting bursts."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Args:
+            rate: Tokens added per second.
+            capacity: Maximum number of tokens (the largest burst).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._update_time = monotonic()
+        self.wait_count = 0
+        """Number of times an action waited for a token."""
+
+    def _update(self) -> float:
+        """Add the tokens accumulated since the last update.
+
+        Returns:
+            Number of tokens.
+        """
+        now = monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._update_time) * self.rate
+        )
+        self._update_time = now
+        return self._tokens
+
+    def take(self) -> float:
+        """Take a token.
+
+        Returns:
+            Time (in seconds) to wait before acting, which is 0 if a token was available.
+        """
+        tokens = self._update() - 1.0
+        self._tokens = tokens
+        if tokens >= 0:
+            return 0.0
+        self.wait_count += 1
+        return -tokens / self.rate
+
 
 class Retry:
-    """Manage exponential backoff."""
+    """Manage exponential backoff, with decorrelated jitter.
+
+    The first retry waits a random time up to the minimum delay. After that, each delay
+    is chosen at random between the minimum delay and three times the previous delay
+    (up to the maximum), so that clients which failed at the same time don't retry in
+    waves. A server may ask for a longer delay with a retry-after hint.
+    """
 
     def __init__(
         self,
         done_event: Event | None = None,
         min_wait: float = 2.0,
         max_wait: float = 16.0,
+        bucket: TokenBucket | None = None,
     ) -> None:
         """
         Args:
             done_event: An event to exit the retry loop.
             min_wait: Minimum delay in seconds.
             max_wait: Maximum delay in seconds.
+            bucket: Token bucket to limit the rate of attempts, or `None` for no limit.
         """
         self.min_wait = min_wait
         self.max_wait = max_wait
+        self.bucket = bucket
         self._done_event = Event() if done_event is None else done_event
         self.retry_count = 0
+        self._wait = 0.0
+        self._retry_after: float | None = None
 
     def success(self) -> None:
         """Call when connection was successful."""
         self.retry_count = 0
+        self._wait = 0.0
 
     def done(self) -> None:
         """Exit retry loop."""
         self._done_event.set()
 
+    def retry_after(self, delay: float) -> None:
+        """Set the server's hint for the delay before the next attempt.
+
+        Args:
+            delay: Minimum delay in seconds.
+        """
+        self._retry_after = min(MAX_RETRY_AFTER, delay)
+
+    def get_delay(self) -> float:
+        """Get the delay before the next attempt.
+
+        Returns:
+            Delay in seconds.
+        """
+        retry_after = self._retry_after
+        if retry_after is not None:
+            # Spread the attempts of clients given the same hint
+            self._retry_after = None
+            delay = uniform(retry_after, retry_after * 2)
+        elif self._wait:
+            delay = min(self.max_wait, uniform(self.min_wait, self._wait * 3))
+        else:
+            delay = random() * self.min_wait
+        self._wait = max(delay, self.min_wait)
+        return delay
+
+    async def _sleep(self, delay: float) -> None:
+        """Sleep, unless the done event is set.
+
+        Args:
+            delay: Delay in seconds.
+        """
+        try:
+            await wait_for(self._done_event.wait(), delay)
+        except TimeoutError:
+            pass
+
     async def __aiter__(self) -> AsyncGenerator[int, object]:
         """Async iterator to manage timeouts."""
         while not self._done_event.is_set():
+            if self.bucket is not None:
+                bucket_delay = self.bucket.take()
+                if bucket_delay:
+                    log.debug(
+                        "Connection attempts limited; waiting %dms",
+                        int(bucket_delay * 1000.0),
+                    )
+                    await self._sleep(bucket_delay)
+                    if self._done_event.is_set():
+                        break
             self.retry_count = self.retry_count + 1
             yield self.retry_count
 
-            retry_squared = self.retry_count**2
-            sleep_for = random() * max(self.min_wait, min(self.max_wait, retry_squared))
+            sleep_for = self.get_delay()
 
             log.debug("Retrying after %dms", int(sleep_for * 1000.0))
 
-            try:
-                await wait_for(self._done_event.wait(), sleep_for)
-            except TimeoutError:
-                pass
+            await self._sleep(sleep_for)
@@ -4,6 +4,9 @@ from abc import ABC, abstractmethod
 import asyncio
 from .types import Meta
 
+KILL_TIMEOUT = 3.0
+"""Time (in seconds) to wait for a session to end after SIGTERM, before SIGKILL."""
+
 
 class SessionConnector:
     """Connect a session with a client."""
@@ -36,6 +39,9 @@ class SessionConnector:
 class Session(ABC):
     """Virtual base class for a session."""
 
+    pid: int | None = None
+    """Process ID of the session, or `None` if there is no process."""
+
     def __init__(self) -> None:
         self._connector = SessionConnector()
 
@@ -57,6 +63,17 @@ class Session(ABC):
     async def close(self) -> None:
         """Close the session."""
 
+    @abstractmethod
+    async def kill(self, timeout: float = KILL_TIMEOUT) -> None:
+        """Kill the session's process, without writing to it.
+
+        Sends SIGTERM, then SIGKILL if the session hasn't ended after `timeout` seconds.
+        Unlike `close`, won't block if the process has stopped reading its input.
+
+        Args:
+            timeout: Time (in seconds) to wait before sending SIGKILL.
+        """
+
     @abstractmethod
     async def wait(self) -> None:
         """Wait for session to end."""
@@ -71,6 +88,12 @@ class Session(ABC):
         """
         ...
 
+    async def repaint(self) -> None:
+        """Ask the session to redraw its output, after some of its output was lost.
+
+        The base class does nothing.
+        """
+
     @abstractmethod
     async def send_bytes(self, data: bytes) -> bool:
         """Send bytes to the process.
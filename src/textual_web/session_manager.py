@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+from collections import deque
 import logging
+import os
 from pathlib import Path
 import platform
 
@@ -20,13 +22,46 @@ WINDOWS = platform.system() == "Windows"
 
 log = logging.getLogger("textual-web")
 
+HANDLE_QUARANTINE = 64
+"""Number of released route handles to hold, before a handle is reused."""
+
 
 if not WINDOWS:
     from .terminal_session import TerminalSession
 
 
+def get_process_rss(pid: int) -> int:
+    """Get the resident memory of a process and its descendants.
+
+    Args:
+        pid: Process ID.
+
+    Returns:
+        Resident memory in bytes, or 0 if it couldn't be read (i.e. there is no /proc).
+    """
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    rss = 0
+    pids = [pid]
+    while pids:
+        pid = pids.pop()
+        try:
+            with open(f"/proc/{pid}/statm", "rb") as statm_file:
+                rss += int(statm_file.read().split()[1]) * page_size
+            with open(f"/proc/{pid}/task/{pid}/children", "rb") as children_file:
+                pids.extend(int(child) for child in children_file.read().split())
+        except (OSError, ValueError, IndexError):
+            continue
+    return rss
+
+
 class SessionManager:
-    """Manage sessions (Textual apps or terminals)."""
+    """Manage sessions (Textual apps or terminals).
+
+    Each route is assigned a small integer handle, which indexes a table of sessions, so
+    that packets addressed by handle don't need a lookup by route key. Released handles
+    are held for a while before they are reused, so that packets still in flight for a
+    closed route don't reach another session.
+    """
 
     def __init__(self, poller: Poller, path: Path, apps: list[config.App]) -> None:
         self.poller = poller
@@ -35,6 +70,11 @@ class SessionManager:
         self.apps_by_slug = {app.slug: app for app in apps}
         self.sessions: dict[SessionID, Session] = {}
         self.routes: TwoWayDict[RouteKey, SessionID] = TwoWayDict()
+        self.route_handles: dict[RouteKey, int] = {}
+        """Maps route keys on to their handle."""
+        self._handle_sessions: list[Session | None] = []
+        self._handle_routes: list[RouteKey | None] = []
+        self._released_handles: deque[int] = deque()
 
     def add_app(
         self, name: str, command: str, slug: str, terminal: bool = False
@@ -53,12 +93,47 @@ class SessionManager:
         self.apps.append(new_app)
         self.apps_by_slug[slug] = new_app
 
+    def _add_route(self, route_key: RouteKey, session: Session) -> int:
+        """Assign a handle to a route.
+
+        Args:
+            route_key: Route key.
+            session: The route's session.
+
+        Returns:
+            Route handle.
+        """
+        released_handles = self._released_handles
+        if len(released_handles) > HANDLE_QUARANTINE:
+            handle = released_handles.popleft()
+            self._handle_sessions[handle] = session
+            self._handle_routes[handle] = route_key
+        else:
+            handle = len(self._handle_sessions)
+            self._handle_sessions.append(session)
+            self._handle_routes.append(route_key)
+        self.route_handles[route_key] = handle
+        return handle
+
+    def _remove_route(self, route_key: RouteKey) -> None:
+        """Release a route's handle.
+
+        Args:
+            route_key: Route key.
+        """
+        handle = self.route_handles.pop(route_key, None)
+        if handle is not None:
+            self._handle_sessions[handle] = None
+            self._handle_routes[handle] = None
+            self._released_handles.append(handle)
+
     def on_session_end(self, session_id: SessionID) -> None:
         """Called by sessions."""
         self.sessions.pop(session_id)
         route_key = self.routes.get_key(session_id)
         if route_key is not None:
             del self.routes[route_key]
+            self._remove_route(route_key)
 
     async def close_all(self, timeout: float = 3.0) -> None:
         """Close app sessions.
@@ -139,6 +214,7 @@ class SessionManager:
             )
         self.sessions[session_id] = session_process
         self.routes[route_key] = session_id
+        self._add_route(route_key, session_process)
 
         await session_process.open(*size)
 
@@ -155,6 +231,50 @@ class SessionManager:
             return
         await session_process.close()
 
+    async def reap_sessions(
+        self, session_ids: list[SessionID], timeout: float = 3.0
+    ) -> None:
+        """Close sessions which no longer have a route on the server.
+
+        Args:
+            session_ids: Session identities.
+            timeout: Time (in seconds) to wait for the sessions to end.
+        """
+        sessions = [
+            session
+            for session in (self.sessions.get(session_id) for session_id in session_ids)
+            if session is not None
+        ]
+        if not sessions:
+            return
+        # Measured before closing, as the memory is freed when the process exits
+        rss = {
+            session: get_process_rss(session.pid) if session.pid else 0
+            for session in sessions
+        }
+
+        async def close_wait(session: Session) -> Session:
+            await session.close()
+            await session.wait()
+            return session
+
+        done, remaining = await asyncio.wait(
+            [asyncio.create_task(close_wait(session)) for session in sessions],
+            timeout=timeout,
+        )
+        reclaimed = sum(rss[task.result()] for task in done if not task.exception())
+        log.info(
+            "Reaped %d orphaned session(s), reclaimed %.1f MiB",
+            len(done),
+            reclaimed / (1024 * 1024),
+        )
+        if remaining:
+            log.warning(
+                "%s orphaned session(s) didn't close after %s seconds",
+                len(remaining),
+                timeout,
+            )
+
     def get_session(self, session_id: SessionID) -> Session | None:
         """Get a session from a session ID.
 
@@ -181,3 +301,31 @@ class SessionManager:
             return self.sessions.get(session_id)
         else:
             return None
+
+    def get_session_by_handle(self, handle: int) -> Session | None:
+        """Get a session from a route handle.
+
+        Args:
+            handle: A route handle.
+
+        Returns:
+            A session or `None` if the handle isn't assigned.
+        """
+        sessions = self._handle_sessions
+        if 0 <= handle < len(sessions):
+            return sessions[handle]
+        return None
+
+    def get_route_key_by_handle(self, handle: int) -> RouteKey | None:
+        """Get a route key from a route handle.
+
+        Args:
+            handle: A route handle.
+
+        Returns:
+            A route key or `None` if the handle isn't assigned.
+        """
+        routes = self._handle_routes
+        if 0 <= handle < len(routes):
+            return routes[handle]
+        return None
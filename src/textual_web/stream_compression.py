@@ -0,0 +1,302 @@
+"""
+Per-route Zstandard compression of session data.
+
+Textual output is very repetitive, both from frame to frame and between sessions of the same
+app. Each route gets its own compression stream, so that frames may reference earlier frames,
+and streams are primed with a dictionary trained from recorded sessions of the app.
+
+Requires the optional `zstandard` package.
+
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from .packets import CompressionDictionary
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+if TYPE_CHECKING:
+    from .config import App
+
+log = logging.getLogger("textual-web")
+
+ZSTD_LEVEL = 3
+"""Zstandard compression level."""
+DICTIONARY_SIZE = 112640
+"""Default size of a trained dictionary (the zstd default)."""
+RECORDING_EXTENSION = ".frames"
+"""Extension of recorded session files."""
+
+
+class AppCompressionStats:
+    """Counters for compressed session data of an app."""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        """Number of frames compressed."""
+        self.bytes_in = 0
+        """Bytes before compression."""
+        self.bytes_out = 0
+        """Bytes after compression."""
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get the counters.
+
+        Returns:
+            A dict of metrics.
+        """
+        frames = self.frames
+        return {
+            "frames": frames,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_per_frame": self.bytes_out / frames if frames else 0.0,
+            "ratio": self.bytes_out / self.bytes_in if self.bytes_in else 1.0,
+        }
+
+
+class RouteStream:
+    """A Zstandard compression stream for a single route."""
+
+    def __init__(
+        self, compressor: zstandard.ZstdCompressor, stats: AppCompressionStats
+    ) -> None:
+        self._compressobj = compressor.compressobj()
+        self._stats = stats
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a frame.
+
+        The stream is flushed to a block boundary, so the server can decompress each frame
+        as it arrives, while keeping the context for the next frame.
+
+        Args:
+            data: Session data.
+
+        Returns:
+            Compressed data.
+        """
+        compressobj = self._compressobj
+        compressed = compressobj.compress(data) + compressobj.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        stats = self._stats
+        stats.frames += 1
+        stats.bytes_in += len(data)
+        stats.bytes_out += len(compressed)
+        return compressed
+
+
+class StreamCompression:
+    """Manages compression dictionaries, and the compression streams for each route.
+
+    Dictionaries are declared to the server after connecting. A route is only compressed
+    once the server has accepted the dictionary for its app.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        Args:
+            path: Base path for dictionaries.
+        """
+        self.path = path
+        self._compressors: dict[str, zstandard.ZstdCompressor] = {}
+        self._dictionaries: dict[str, zstandard.ZstdCompressionDict] = {}
+        self._accepted: set[str] = set()
+        self._streams: dict[str, RouteStream] = {}
+        self._stats: dict[str, AppCompressionStats] = {}
+
+    def get_declarations(self, apps: Iterable[App]) -> list[CompressionDictionary]:
+        """Load dictionaries, and get the packets to declare them to the server.
+
+        Args:
+            apps: Apps which may have a compression dictionary.
+
+        Returns:
+            A list of packets to send.
+        """
+        declarations: list[CompressionDictionary] = []
+        for app in apps:
+            if not app.compression_dictionary:
+                continue
+            dictionary = self._load_dictionary(app)
+            if dictionary is not None:
+                declarations.append(
+                    CompressionDictionary(
+                        app.slug, dictionary.dict_id(), dictionary.as_bytes()
+                    )
+                )
+        return declarations
+
+    def _load_dictionary(self, app: App) -> zstandard.ZstdCompressionDict | None:
+        """Load (or get cached) dictionary for an app.
+
+        Args:
+            app: An app with a compression dictionary.
+
+        Returns:
+            A dictionary, or `None` if it couldn't be loaded.
+        """
+        dictionary = self._dictionaries.get(app.slug)
+        if dictionary is not None:
+            return dictionary
+        if zstandard is None:
+            log.warning(
+                "Compression dictionary for %r requires the 'zstandard' package",
+                app.name,
+            )
+            return None
+        dictionary_path = self.path / Path(app.compression_dictionary).expanduser()
+        try:
+            dictionary_data = dictionary_path.read_bytes()
+        except OSError as error:
+            log.warning("Unable to load compression dictionary; %s", error)
+            return None
+        dictionary = zstandard.ZstdCompressionDict(dictionary_data)
+        self._dictionaries[app.slug] = dictionary
+        return dictionary
+
+    def accept(self, slug: str, dictionary_id: int) -> None:
+        """Called when the server accepts a dictionary.
+
+        Args:
+            slug: App slug.
+            dictionary_id: ID of the accepted dictionary.
+        """
+        dictionary = self._dictionaries.get(slug)
+        if dictionary is None or dictionary.dict_id() != dictionary_id:
+            log.warning(
+                "Server accepted an unknown compression dictionary for %r", slug
+            )
+            return
+        if slug not in self._compressors:
+            self._compressors[slug] = zstandard.ZstdCompressor(
+                dict_data=dictionary, level=ZSTD_LEVEL
+            )
+        self._accepted.add(slug)
+        log.debug("compression dictionary for %r accepted", slug)
+
+    def reset(self) -> None:
+        """Reset streams when the connection is lost.
+
+        The server won't have the context for existing streams, so routes must start new
+        streams (after the dictionary is accepted again).
+        """
+        self._accepted.clear()
+        self._streams.clear()
+
+    def forget_route(self, route_key: str) -> None:
+        """Discard the stream for a route which has closed.
+
+        Args:
+            route_key: Route key.
+        """
+        self._streams.pop(route_key, None)
+
+    def compress(self, route_key: str, slug: str, data: bytes) -> bytes | None:
+        """Compress session data for a route.
+
+        Args:
+            route_key: Route key.
+            slug: Slug of the route's app.
+            data: Session data.
+
+        Returns:
+            Compressed data, or `None` if the route isn't compressed.
+        """
+        stream = self._streams.get(route_key)
+        if stream is None:
+            if slug not in self._accepted:
+                return None
+            stats = self._stats.get(slug)
+            if stats is None:
+                stats = self._stats[slug] = AppCompressionStats()
+            stream = self._streams[route_key] = RouteStream(
+                self._compressors[slug], stats
+            )
+        return stream.compress(data)
+
+    def get_metrics(self) -> dict[str, object]:
+        """Get compression metrics per app.
+
+        Returns:
+            A dict of metrics, keyed by app slug.
+        """
+        return {slug: stats.get_metrics() for slug, stats in self._stats.items()}
+
+
+class SessionRecorder:
+    """Records session data, to train a compression dictionary."""
+
+    def __init__(self, path: Path) -> None:
+        """
+        Args:
+            path: Path of the recording file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("ab")
+
+    def record(self, data: bytes) -> None:
+        """Record a frame of session data.
+
+        Args:
+            data: Session data.
+        """
+        self._file.write(len(data).to_bytes(4, "big"))
+        self._file.write(data)
+
+    def close(self) -> None:
+        """Close the recording."""
+        self._file.close()
+
+
+def read_recordings(path: Path) -> list[bytes]:
+    """Read the frames from recorded sessions.
+
+    Args:
+        path: Directory containing recordings.
+
+    Returns:
+        A list of frames.
+    """
+    frames: list[bytes] = []
+    for recording_path in sorted(path.glob(f"*{RECORDING_EXTENSION}")):
+        recording = recording_path.read_bytes()
+        position = 0
+        while position + 4 <= len(recording):
+            size = int.from_bytes(recording[position : position + 4], "big")
+            position += 4
+            frames.append(recording[position : position + size])
+            position += size
+    return frames
+
+
+def train_dictionary(path: Path, size: int = DICTIONARY_SIZE) -> Path:
+    """Train a compression dictionary from recorded sessions.
+
+    Args:
+        path: Directory containing recordings of an app.
+        size: Maximum size of the dictionary.
+
+    Raises:
+        RuntimeError: If the dictionary could not be trained.
+
+    Returns:
+        Path to the dictionary, which is the recording directory with a `.zdict` extension.
+    """
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary requires the 'zstandard' package")
+    frames = read_recordings(path)
+    if not frames:
+        raise RuntimeError(f"No recordings found in {str(path)!r}")
+    dictionary = zstandard.train_dictionary(size, frames)
+    dictionary_path = path.with_suffix(".zdict")
+    dictionary_path.write_bytes(dictionary.as_bytes())
+    return dictionary_path
@@ -13,11 +13,12 @@ from importlib_metadata import version
 import rich.repr
 
 from .poller import Poller
-from .session import Session, SessionConnector
+from .session import KILL_TIMEOUT, Session, SessionConnector
 from .types import Meta, SessionID
 
 log = logging.getLogger("textual-web")
 
+
 @rich.repr.auto
 class TerminalSession(Session):
     """A session that manages a terminal."""
@@ -62,6 +63,16 @@ class TerminalSession(Session):
     async def set_terminal_size(self, width: int, height: int) -> None:
         self._set_terminal_size(width, height)
 
+    async def repaint(self) -> None:
+        """Redraw the terminal, by briefly changing its size (which sends SIGWINCH)."""
+        if self.master_fd is None:
+            return
+        buf = array.array("h", [0, 0, 0, 0])
+        fcntl.ioctl(self.master_fd, termios.TIOCGWINSZ, buf)
+        height, width = buf[0], buf[1]
+        self._set_terminal_size(width, height + 1)
+        self._set_terminal_size(width, height)
+
     async def start(self, connector: SessionConnector) -> asyncio.Task:
         self._connector = connector
         assert self.master_fd is not None
@@ -71,21 +82,25 @@ class TerminalSession(Session):
 
     async def run(self) -> None:
         assert self.master_fd is not None
-        queue = self.poller.add_file(self.master_fd)
+        master_fd = self.master_fd
+        self.poller.add_file(master_fd)
+        read = self.poller.read
         on_data = self._connector.on_data
         on_close = self._connector.on_close
         try:
             while True:
-                data = await queue.get() or None
+                data = await read(master_fd) or None
                 if data is None:
                     break
+                # Waits while the route is over the writer's high watermark; the poller
+                # stops reading the pty once its queue is full, which blocks the process.
                 await on_data(data)
         except Exception:
             log.exception("error in terminal.run")
         finally:
             await on_close()
-            os.close(self.master_fd)
-            self.poller.remove_file(self.master_fd)
+            self.poller.remove_file(master_fd)
+            os.close(master_fd)
             self.master_fd = None
 
     async def send_bytes(self, data: bytes) -> bool:
@@ -101,6 +116,19 @@ class TerminalSession(Session):
         if self.pid is not None:
             os.kill(self.pid, signal.SIGHUP)
 
+    async def kill(self, timeout: float = KILL_TIMEOUT) -> None:
+        if self.pid is None or self._task is None:
+            return
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                log.warning("%r didn't exit after SIGTERM; sending SIGKILL", self)
+                os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
     async def wait(self) -> None:
         if self._task is not None:
             await self._task
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import socket
+import ssl
+
+import aiohttp
+
+DNS_CACHE_TTL = 300
+"""Time (in seconds) to cache DNS results, so that reconnecting doesn't resolve the host again."""
+UNIX_SCHEME = "unix://"
+"""URL scheme of a Ganglion server listening on a Unix domain socket."""
+UNIX_WEBSOCKET_URL = "ws://localhost/app-service/"
+"""URL requested from a Ganglion server listening on a Unix domain socket."""
+
+
+def get_unix_path(url: str) -> str | None:
+    """Get the socket path from a `unix://` URL.
+
+    Args:
+        url: A URL, such as "unix:///run/ganglion.sock".
+
+    Returns:
+        Path to the socket, or `None` if the URL is not a `unix://` URL.
+    """
+    if not url.startswith(UNIX_SCHEME):
+        return None
+    return url[len(UNIX_SCHEME) :]
+
+
+def is_unix_websocket(websocket: aiohttp.ClientWebSocketResponse) -> bool:
+    """Check if a websocket is connected over a Unix domain socket.
+
+    Args:
+        websocket: A connected websocket.
+
+    Returns:
+        `True` if the websocket is local to this host.
+    """
+    sock = websocket.get_extra_info("socket")
+    return sock is not None and sock.family == getattr(socket, "AF_UNIX", None)
+
+
+def abort_websocket(websocket: aiohttp.ClientWebSocketResponse) -> None:
+    """Shut down a websocket's socket, without the closing handshake.
+
+    A peer which has stopped responding won't answer the closing handshake, and closing
+    would wait for the close timeout.
+
+    Args:
+        websocket: A connected websocket.
+    """
+    sock = websocket.get_extra_info("socket")
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """An SSL context which resumes TLS sessions.
+
+    The session of the last connection to each host (see `save_tls_session`) is offered
+    when connecting to the host again, so a reconnect may skip the full handshake. If the
+    server doesn't accept the session, a full handshake is made as usual.
+    """
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT) -> None:
+        super().__init__()
+        self._tls_sessions: dict[str, ssl.SSLSession] = {}
+
+    def wrap_bio(
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: str | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> ssl.SSLObject:
+        # Called by asyncio for each new connection
+        if session is None and not server_side and server_hostname is not None:
+            session = self._tls_sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+    def save_session(self, ssl_object: ssl.SSLObject) -> None:
+        """Save the session of a connection, to resume with the next connection to the host.
+
+        Args:
+            ssl_object: The SSL object of a connection which has completed its handshake.
+        """
+        session = ssl_object.session
+        if session is not None and ssl_object.server_hostname is not None:
+            self._tls_sessions[ssl_object.server_hostname] = session
+
+
+def create_ssl_context() -> ResumingSSLContext:
+    """Create the SSL context used to connect to Ganglion.
+
+    Has the same settings as `ssl.create_default_context()`, and resumes TLS sessions.
+
+    Returns:
+        An SSL context.
+    """
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_default_certs()
+    return context
+
+
+def save_tls_session(websocket: aiohttp.ClientWebSocketResponse) -> bool:
+    """Save the TLS session of a newly connected websocket, so the next connection to the
+    same host may resume it.
+
+    Args:
+        websocket: A connected websocket.
+
+    Returns:
+        `True` if the websocket resumed a previous TLS session.
+    """
+    ssl_object = websocket.get_extra_info("ssl_object")
+    if ssl_object is None:
+        return False
+    context = ssl_object.context
+    if isinstance(context, ResumingSSLContext):
+        context.save_session(ssl_object)
+    return ssl_object.session_reused
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create the HTTP session used to open websockets.
+
+    The session is kept for the lifetime of the client, so that reconnects reuse the
+    cached DNS results and the SSL context (loading the certificate store is slow), and
+    resume TLS sessions.
+
+    Returns:
+        A client session.
+    """
+    connector = aiohttp.TCPConnector(
+        ssl=create_ssl_context(),
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+class HTTPSessions:
+    """The HTTP sessions used to open websockets.
+
+    TCP endpoints share a single session. Each `unix://` endpoint has a session of its own,
+    as the socket path is a property of the connector.
+    """
+
+    def __init__(self) -> None:
+        self._tcp_session: aiohttp.ClientSession | None = None
+        self._unix_sessions: dict[str, aiohttp.ClientSession] = {}
+
+    async def __aenter__(self) -> HTTPSessions:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    def get(self, url: str) -> tuple[aiohttp.ClientSession, str]:
+        """Get the session to open a websocket to an endpoint.
+
+        Args:
+            url: The endpoint URL.
+
+        Returns:
+            A session, and the URL to request with it.
+        """
+        unix_path = get_unix_path(url)
+        if unix_path is not None:
+            session = self._unix_sessions.get(unix_path)
+            if session is None:
+                session = self._unix_sessions[unix_path] = aiohttp.ClientSession(
+                    connector=aiohttp.UnixConnector(unix_path)
+                )
+            return session, UNIX_WEBSOCKET_URL
+        if self._tcp_session is None:
+            self._tcp_session = create_http_session()
+        return self._tcp_session, url
+
+    async def close(self) -> None:
+        """Close all sessions."""
+        sessions = list(self._unix_sessions.values())
+        if self._tcp_session is not None:
+            sessions.append(self._tcp_session)
+        self._tcp_session = None
+        self._unix_sessions.clear()
+        for session in sessions:
+            await session.close()
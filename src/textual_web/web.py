@@ -5,28 +5,114 @@ Note: Currently just a stub.
 
 """
 
+from __future__ import annotations
+
 import logging
 
 import asyncio
-from aiohttp import web
+import hmac
+import ipaddress
+from typing import Awaitable, Callable
 
+from aiohttp import web
 
 log = logging.getLogger("textual-web")
 
+DIRECT_PATH = "/app-service/"
+"""Path of the websocket which browsers connect to, in direct-serve mode."""
+DEFAULT_HOST = "0.0.0.0"
+"""Address the web interface listens on, by default."""
+LOOPBACK_HOST = "127.0.0.1"
+"""Address of the loopback interface."""
+DEFAULT_PORT = 8080
+"""Port the web interface listens on, by default."""
+
+
+def is_loopback(host: str) -> bool:
+    """Check if an address is only reachable from this host.
+
+    Args:
+        host: Host name or IP address.
+
+    Returns:
+        `True` if the address is a loopback address, otherwise `False`.
+    """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
 
-async def run_web_interface(connected_event: asyncio.Event) -> web.Application:
-    """Run the web interface."""
+def has_api_key(request: web.Request, api_key: str) -> bool:
+    """Check if a request supplies the API key.
+
+    The key may be in a `GANGLIONAPIKEY` header, or a `key` query parameter (browsers
+    can't set websocket headers).
+
+    Args:
+        request: A request.
+        api_key: The API key.
+
+    Returns:
+        `True` if the request supplied the API key, otherwise `False`.
+    """
+    supplied_key = request.headers.get("GANGLIONAPIKEY", request.query.get("key", ""))
+    return hmac.compare_digest(supplied_key.encode(), api_key.encode())
+
+
+async def run_web_interface(
+    connected_event: asyncio.Event,
+    get_metrics: Callable[[], dict[str, object]],
+    direct_handler: (
+        Callable[[web.Request], Awaitable[web.StreamResponse]] | None
+    ) = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    api_key: str | None = None,
+) -> web.Application:
+    """Run the web interface.
+
+    Args:
+        connected_event: Event set when connected to the Ganglion server.
+        get_metrics: Callable which returns metrics to be served as JSON.
+        direct_handler: Handler for websockets from browsers (direct-serve mode),
+            or `None` to not accept websockets.
+        host: Address to listen on.
+        port: Port to listen on.
+        api_key: API key required to read metrics, or `None` to only serve metrics to
+            this host.
+    """
 
     async def health_check(request) -> web.Response:
         await asyncio.wait_for(connected_event.wait(), 5.0)
         return web.Response(text="Hello, world")
 
+    async def metrics(request: web.Request) -> web.Response:
+        # Metrics include route keys and peer addresses
+        if api_key:
+            if not has_api_key(request, api_key):
+                log.warning("Refused metrics request from %s", request.remote)
+                raise web.HTTPUnauthorized()
+        elif not is_loopback(request.remote or ""):
+            log.warning("Refused metrics request from %s", request.remote)
+            raise web.HTTPForbidden()
+        return web.json_response(get_metrics())
+
     app = web.Application()
-    app.add_routes([web.get("/health-check/", health_check)])
+    app.add_routes(
+        [
+            web.get("/health-check/", health_check),
+            web.get("/metrics/", metrics),
+        ]
+    )
+    if direct_handler is not None:
+        app.add_routes([web.get(DIRECT_PATH, direct_handler)])
 
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", 8080)
+    site = web.TCPSite(runner, host, port)
     await site.start()
-    log.info("Web interface started on port 8080")
+    log.info("Web interface started on %s port %d", host, port)
     return app